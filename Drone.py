@@ -1,7 +1,7 @@
 import math
-import utils
 import time
 from simple_pid import PID
+from flight_logger import FlightLogger
 
 STEP_FLIGHT_TIME = 1.5
 MIN_HEIGHT = 0.10
@@ -14,24 +14,47 @@ PIXEL_TO_METER = 10e-5
 AREA_TO_METER = 10e-7
 
 DEBUG_ANGLE = 0
+STALE_RETRY_TIME = 0.1 # seconds to wait for a new detection after rejecting a stale one
+
+# streaming control: setpoints at CONTROL_RATE, block controllers updated with every detection
+CONTROL_RATE = 20 # Hz
+STREAMING_GAIN = 4 # the loop is closed at the detection rate instead of every step, so it tolerates more gain
+MAX_SPEED = 0.25 # m/s
+SETPOINT_HORIZON = 0.3 # seconds a detection keeps moving the setpoint
+DETECTION_TIMEOUT = 2.0 # seconds without detection before backing off like update_block(None)
 
 
 class Drone():
-    def __init__(self, cf, starting_pos=(0,0), starting_height=0.4):
+    def __init__(self, cf, starting_pos=(0,0), starting_height=0.4, clock=time.time):
         self.cf = cf
+        self.clock = clock
 
         self.block_pid_x = PID(3, 0.05, 0.01, setpoint=0)
         self.block_pid_y = PID(3, 0.05, 0.01, setpoint=0)
         self.block_pid_z = PID(1.5, 0.05, 0.01, setpoint=IMAGE_CAPTURE_MIN_AREA)
         self.logger = None
         if LOG_TRACKING:
-            self.logger = utils.LOGGER(str(int(time.time())) + "_" + str(cf))
+            self.logger = FlightLogger("cf" + str(getattr(cf, "id", "")), clock=clock)
    
         self.max_iter = 8
         self.found_target = False
         self.last_area = None
         self.angle = 0
 
+        # time the last goTo was issued, detections captured before are outdated
+        self.last_command_time = None
+        self.block_iterations = 0
+        self.stale_detections = 0
+
+        # streamed setpoint, its velocity and until when the last detection drives it
+        self.streaming = False
+        self.setpoint = None
+        self.velocity = [0, 0, 0]
+        self.velocity_until = 0
+        self.last_setpoint_time = None
+        self.last_detection_time = None
+        self.last_capture_time = None
+
     def get_position(self):
         return self.cf.position()
     
@@ -121,7 +144,7 @@ class Drone():
 
     def move(self, x, y, height, angle, flight_time):
         print("GoTo", x, y, height, angle, flight_time)
-        self.cf.goTo([x, y, height], math.radians(angle), flight_time)
+        self.go_to([x, y, height], math.radians(angle), flight_time)
         return flight_time
     
     def move_sideways(self, dist_x, dist_y, flight_time):
@@ -139,16 +162,13 @@ class Drone():
         if _height < MIN_HEIGHT:
             _height = MIN_HEIGHT
 
-        # log everything
-        if self.logger is not None:
-            self.logger .log_drone_values(_x, _y, _height, math.degrees(_angle), flight_time)
-        
         # move to position absolute and angle absolute
-        self.cf.goTo([_x, _y, _height], _angle, flight_time)
+        self.go_to([_x, _y, _height], _angle, flight_time)
         return flight_time
 
     def reset_target_condition(self, max_iter=9):
         self.max_iter = max_iter
+        self.block_iterations = 0
         self.found_target = False
         self.last_area = None
 
@@ -169,7 +189,7 @@ class Drone():
             return diff < AREA_MAX_DIFF
 
     def update_target_condition(self, angle, dist, height, area):
-        if angle == 0 and dist == 0 and (height == 0 or height <= MIN_HEIGHT) or area > IMAGE_CAPTURE_MIN_AREA:
+        if angle == 0 and dist == 0 and (height == 0 or height <= MIN_HEIGHT) or (area is not None and area > IMAGE_CAPTURE_MIN_AREA):
             self.found_target = True
 
     def update_pallet(self, pallet_offset):
@@ -183,7 +203,7 @@ class Drone():
             self.max_iter -= 1
             _angle = math.radians((8 - self.max_iter) * angle)
         else:
-            offset_x, offset_y, area, _, _ = pallet_offset
+            offset_x, offset_y, area = pallet_offset[:3]
             angle, height, dist = self.adjust_drone_position(offset_x, offset_y, area)
             _angle += math.radians(angle)
             print("Angle: " + str(angle) + " Height: " + str(height) + " Distance: " + str(dist),
@@ -204,12 +224,8 @@ class Drone():
         if _height < MIN_HEIGHT:
             _height = MIN_HEIGHT
 
-        # log everything
-        if self.logger is not None:
-            self.logger.log_drone_values(_x, _y, _height, math.degrees(_angle), flight_time)
-        
         # move to position absolute and angle absolute
-        self.cf.goTo([_x, _y, _height], _angle, flight_time)
+        self.go_to([_x, _y, _height], _angle, flight_time)
         return flight_time
 
     def update_block_search(self, num_pallet_blocks):
@@ -243,17 +259,38 @@ class Drone():
         if _height < MIN_HEIGHT:
             _height = 0.1
 
-        # log everything
-        if self.logger is not None:
-            self.logger.log_drone_values(_x, _y, _height, math.degrees(_angle), flight_time)
-        
         # move to position absolute and angle absolute
-        self.cf.goTo([_x, _y, _height], _angle, flight_time)
+        self.go_to([_x, _y, _height], _angle, flight_time)
         return flight_time 
 
-    def update_block(self, block_offset):
+    def is_stale(self, capture_time):
+        return capture_time is not None and self.last_command_time is not None and capture_time < self.last_command_time
+
+    def go_to(self, position, angle, flight_time):
+        if self.streaming:
+            self.stop_streaming()
+        self.last_command_time = self.clock()
+        self.cf.goTo(position, angle, flight_time)
+        if self.logger is not None:
+            self.logger.log_setpoint(*position, math.degrees(angle), flight_time)
+            self.logger.log_position(*self.cf.position(), math.degrees(self.cf.yaw()))
+
+    def close(self):
+        if self.logger is not None:
+            self.logger.close()
+            self.logger = None
+
+    def update_block(self, block_offset, capture_time=None):
         if not self.update():
             return None
+        if block_offset is not None and self.is_stale(capture_time):
+            # the frame still shows the scene before the last movement, acting on it overshoots
+            print("Detection is " + str(round(self.last_command_time - capture_time, 2)) + "s older than the last command. Waiting for a new one")
+            self.stale_detections += 1
+            return STALE_RETRY_TIME
+        self.block_iterations += 1
+        if self.logger is not None:
+            self.logger.log_detection(block_offset, capture_time)
         if block_offset is None:
             print("No bounding box found. Moving back")
             dist_side, height, dist_front, area = 0, 0, -0.1, 0
@@ -269,7 +306,7 @@ class Drone():
             #           - the differnence in size should give some idea of the angle
             #           - PROBLEM: how to move the drone that it is then orthogonal based on the information
 
-            offset_x, offset_y, area, _, _ = block_offset
+            offset_x, offset_y, area = block_offset[:3]
 
             # if self.check_area_size(area):
             #     print("This bounding box is at least " + str(AREA_MAX_DIFF*100) + "\% smaller than the previous one...")
@@ -277,6 +314,8 @@ class Drone():
             #     flight_time = STEP_FLIGHT_TIME
             # else:
             dist_side, height, dist_front, flight_time = self.adjust_drone_position_block(offset_x, offset_y, area)
+            if self.logger is not None:
+                self.logger.log_pid(self.block_pid_x, self.block_pid_y, self.block_pid_z)
             
         print("Distance in x: " + str(dist_side) + " Height: " + str(height) + " Distance in z: " + str(dist_front),
                     "Time: " + str(flight_time),
@@ -302,14 +341,95 @@ class Drone():
         if _height < MIN_HEIGHT:
             _height = MIN_HEIGHT
 
-        # log everything
-        if self.logger is not None:
-            self.logger.log_drone_values(_x, _y, _height, math.degrees(_angle), flight_time)
-        
         # move to position absolute and angle absolute
-        self.cf.goTo([_x, _y, _height], _angle, flight_time)
+        self.go_to([_x, _y, _height], _angle, flight_time)
         return flight_time
 
+    def start_streaming(self):
+        now = self.clock()
+        self.streaming = True
+        self.setpoint = list(self.cf.position())
+        self.velocity = [0, 0, 0]
+        self.velocity_until = 0
+        self.last_setpoint_time = now
+        self.last_detection_time = now
+        self.last_capture_time = None
+
+    def stop_streaming(self):
+        # hand control back to the high level commander (goTo, land)
+        self.streaming = False
+        self.cf.notifySetpointsStop()
+
+    def update_block_streaming(self, block_offset, capture_time=None):
+        """
+        One tick of the streaming control mode, called at CONTROL_RATE with the newest detection
+        or None if none arrived since the last tick. A detection updates the block controllers
+        with the real time between two detections and sets the velocity of the setpoint, which
+        is advanced and sent with cmdPosition on every tick.
+
+        returns: seconds until the next tick or None if the target was lost
+        """
+        if not self.update():
+            return None
+        if not self.streaming:
+            self.start_streaming()
+        now = self.clock()
+        _angle = math.radians(DEBUG_ANGLE)
+
+        if block_offset is not None and not self.is_stale(capture_time):
+            self.block_iterations += 1
+            detection_time = capture_time if capture_time is not None else now
+            dt = detection_time - self.last_capture_time if self.last_capture_time is not None else 1.0 / CONTROL_RATE
+            dt = max(dt, 1e-3)
+            self.last_capture_time = detection_time
+            self.last_detection_time = now
+
+            offset_x, offset_y, area = block_offset[:3]
+            # same controllers as the step mode, their output is a step for STEP_FLIGHT_TIME
+            speed_side = -1 * self.block_pid_x(offset_x, dt=dt) * PIXEL_TO_METER / STEP_FLIGHT_TIME
+            speed_up = -1 * self.block_pid_y(offset_y, dt=dt) * PIXEL_TO_METER / STEP_FLIGHT_TIME
+            speed_front = self.block_pid_z(area, dt=dt) * AREA_TO_METER / STEP_FLIGHT_TIME
+            if area >= IMAGE_CAPTURE_MIN_AREA:
+                speed_front = min(0, speed_front)
+            self.update_target_condition(round(speed_side * STEP_FLIGHT_TIME, 2), round(speed_front * STEP_FLIGHT_TIME, 2),
+                                         round(speed_up * STEP_FLIGHT_TIME, 2), area)
+            self.set_velocity(speed_side, speed_up, speed_front, _angle, now)
+            if self.logger is not None:
+                self.logger.log_detection(block_offset, capture_time)
+                self.logger.log_pid(self.block_pid_x, self.block_pid_y, self.block_pid_z)
+                self.logger.log_position(*self.cf.position(), math.degrees(self.cf.yaw()))
+        elif block_offset is None and now - self.last_detection_time > DETECTION_TIMEOUT:
+            print("No bounding box found. Moving back")
+            self.max_iter -= 1
+            self.last_detection_time = now
+            self.set_velocity(0, 0, -0.1 / STEP_FLIGHT_TIME, _angle, now)
+        elif block_offset is not None:
+            self.stale_detections += 1
+
+        # advance the setpoint along the velocity of the last detection
+        dt = now - self.last_setpoint_time
+        self.last_setpoint_time = now
+        if now < self.velocity_until:
+            self.setpoint = [pos + vel * dt for pos, vel in zip(self.setpoint, self.velocity)]
+            self.setpoint[2] = max(self.setpoint[2], MIN_HEIGHT)
+        self.cf.cmdPosition(self.setpoint, _angle)
+        if self.logger is not None:
+            self.logger.log_setpoint(*self.setpoint, math.degrees(_angle), 1.0 / CONTROL_RATE)
+        return 1.0 / CONTROL_RATE
+
+    def set_velocity(self, speed_side, speed_up, speed_front, _angle, now):
+        scale = STREAMING_GAIN
+        speed = math.sqrt(speed_side**2 + speed_up**2 + speed_front**2) * scale
+        if speed > MAX_SPEED:
+            scale *= MAX_SPEED / speed
+        side_angle = _angle + math.radians(90) # drone angle to the left
+        self.velocity = [
+            scale * (speed_front * math.cos(_angle) + speed_side * math.cos(side_angle)),
+            scale * (speed_front * math.sin(_angle) + speed_side * math.sin(side_angle)),
+            scale * speed_up
+        ]
+        self.velocity_until = now + SETPOINT_HORIZON
+
     def update(self):
         if self.max_iter == 0:
             print("Found no pallet rtb...")
@@ -1,56 +1,124 @@
-from threading import Thread
-import paho.mqtt.client as mqtt
+from threading import Condition
 import json
 from time import time
 
-class MQTTClient(Thread):
-    def __init__(self, ip, port, topics = [], publish_topic="image_detection"):
-        Thread.__init__(self)
-        self.client = mqtt.Client("Demo_runner")
+from reid_demo.aideck import wire_format
+from reid_demo.aideck.mqtt_async import shared_loop
+from reid_demo.aideck.publish_policy import PolicyPublisher
+
+class MQTTClient():
+    '''
+    Detections and mission events for the mission loops. Messages are received on the shared
+    asyncio MQTT loop of the process, get_bb and wait_for are called from the mission thread.
+    '''
+    def __init__(self, ip, port, topics = [], publish_topic="image_detection", mqtt_client=None, name="Demo_runner"):
         self.topics = topics
-        self.client.on_message = self.on_message
-        self.client.on_connect = self.subscribe
-        self.client.connect(ip, port)
 
         self.topic_infos = {}
         self.publish_topic = publish_topic
         self.message_ready = {key: False for key in topics}
+        # number of messages received per topic and the latest message, also after get_bb
+        self.seq = {key: 0 for key in topics}
+        self.latest = {}
+        # capture time stamp of the latest message (None for JSON messages) and rejected stale messages per topic
+        self.capture_times = {}
+        self.stale = {key: 0 for key in topics}
+        # notified on every message, used by wait_for
+        self.condition = Condition()
+        # mqtt_client: optional paho like client, e.g. a LoopbackClient for tests without broker
+        self.loop_thread = shared_loop()
+        self.async_client = self.loop_thread.client(ip, port, name, mqtt_client=mqtt_client)
+        self.loop_thread.call(self.subscribe)
+        self.client = self.async_client.client
+        # QoS, coalescing, rate cap and logging per topic, see publish_policy.POLICIES
+        self.publisher = PolicyPublisher(self.client)
 
-        self.start()
+    def subscribe(self):
+        # runs on the loop, the capture time of binary messages is kept
+        for topic in self.topics:
+            self.async_client.subscribe(topic, qos=2, decode=wire_format.decode_message)
+            self.async_client.add_listener(topic, lambda timestamp, message, topic=topic: self.on_message(topic, message))
 
-    def on_message(self, client, userdata, msg):
-        data = json.loads(msg.payload.decode())
-        self.topic_infos[msg.topic] = data
-        self.message_ready[msg.topic] = True
+    def on_message(self, topic, message):
+        data, _, timestamp = message
+        with self.condition:
+            self.capture_times[topic] = timestamp
+            self.topic_infos[topic] = data
+            self.message_ready[topic] = True
+            self.latest[topic] = data
+            self.seq[topic] = self.seq.get(topic, 0) + 1
+            self.condition.notify_all()
 
     def is_message_ready(self, topic):
         if topic not in self.message_ready:
             self.message_ready[topic] = False
             return False
         return self.message_ready[topic]
-                
-    def subscribe(self, a, b, c, d):
-        for topic in self.topics:
-            self.client.subscribe(topic, qos=2)
 
     def publish(self, message):
-        print("Published", message, "on", self.publish_topic)
-        self.client.publish(self.publish_topic, json.dumps(message), qos=2)
+        self.publisher.publish(self.publish_topic, json.dumps(message), qos=2)
 
     def publish_on_topic(self, topic, message, qos=2):
-        print("Published", message, "on", topic)
-        self.client.publish(topic, json.dumps(message), qos=qos)
+        self.publisher.publish(topic, json.dumps(message), qos=qos)
 
-    def run(self):
-        self.client.loop_forever()
+    def get_bb(self, topic, captured_after=None, with_capture_time=False):
+        '''
+        Takes the latest message of topic, None if there is none or it was captured before captured_after.
+        With with_capture_time (message, capture time) is returned, both read under the same lock.
+        '''
+        with self.condition:
+            res = self.topic_infos.get(topic)
+            capture_time = self.capture_times.get(topic) if res is not None else None
+            if topic in self.topic_infos:
+                self.take(topic)
+            if res is not None and self.is_stale(topic, captured_after):
+                self.stale[topic] = self.stale.get(topic, 0) + 1
+                res, capture_time = None, None
+            return (res, capture_time) if with_capture_time else res
 
-    def get_bb(self, topic):
-        if topic not in self.topic_infos:
-            return None
-        res = self.topic_infos[topic]
+    def is_stale(self, topic, captured_after):
+        '''
+        True if the latest message was captured before captured_after, messages without time stamp are never stale
+        '''
+        timestamp = self.capture_times.get(topic)
+        return captured_after is not None and timestamp is not None and timestamp < captured_after
+
+    def take(self, topic):
         self.topic_infos[topic] = None
         self.message_ready[topic] = False
-        return res
+
+    def wait_for(self, topic, timeout=None, newer_than=None, captured_after=None):
+        '''
+        Block until a message arrives on topic, returns immediately if one is already there.
+        Without newer_than any message not yet taken by get_bb/wait_for counts,
+        otherwise the first message with a sequence number above newer_than.
+        Messages captured before captured_after are dropped and counted in stale.
+        The message is taken like with get_bb.
+
+        returns: (seq, message, capture time of message), message is None on timeout
+        '''
+        deadline = None if timeout is None else time() + timeout
+        with self.condition:
+            while True:
+                if newer_than is None:
+                    ready = self.message_ready.get(topic, False)
+                else:
+                    ready = self.seq.get(topic, 0) > newer_than
+                if ready:
+                    self.take(topic)
+                    if not self.is_stale(topic, captured_after):
+                        return self.seq[topic], self.latest[topic], self.capture_times.get(topic)
+                    # captured before the drone started its last movement
+                    self.stale[topic] = self.stale.get(topic, 0) + 1
+                    newer_than = None if newer_than is None else self.seq[topic]
+                    continue
+                remaining = None if deadline is None else deadline - time()
+                if remaining is not None and remaining <= 0:
+                    return self.seq.get(topic, 0), None, None
+                self.condition.wait(remaining)
 
     def close(self):
-        self.client.disconnect()
\ No newline at end of file
+        self.publisher.flush()
+        self.publisher.close()
+        # the loop is shared with the other clients of the process and keeps running
+        self.loop_thread.submit(self.async_client.close())
\ No newline at end of file
@@ -0,0 +1,53 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import fleet
+
+# Sweep wall time against fake_crazyflie_tools.py: the former one by one loop vs. the fleet sweep
+FAKE_TOOL = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_crazyflie_tools.py")]
+
+
+def legacy_sweep(crazyflies, timeout):
+    '''
+    The former check_all_batteries loop, with a timeout so unreachable Crazyflies end at all
+    '''
+    voltages = []
+    for crazyflie in crazyflies:
+        uri = fleet.crazyflie_uri(crazyflie["id"], crazyflie["channel"])
+        try:
+            voltages.append(float(subprocess.check_output(FAKE_TOOL + ["battery", "--uri", uri], timeout=timeout, stderr=subprocess.DEVNULL)))
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            voltages.append(None)
+    return voltages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Battery sweep wall time with a simulated radio")
+    parser.add_argument("--crazyflies", type=int, default=12)
+    parser.add_argument("--channels", type=int, default=4)
+    parser.add_argument("--unreachable", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per reachable Crazyflie")
+    parser.add_argument("--timeout", type=float, default=1.5, help="seconds per Crazyflie")
+    args = parser.parse_args()
+
+    crazyflies = [{"id": 100 + i, "channel": 80 + 2 * (i % args.channels)} for i in range(args.crazyflies)]
+    os.environ["FAKE_CF_LATENCY"] = str(args.latency)
+    os.environ["FAKE_CF_UNREACHABLE"] = ",".join("{:02X}".format(crazyflie["id"]) for crazyflie in crazyflies[-args.unreachable:]) if args.unreachable else ""
+
+    start_time = time.time()
+    legacy = legacy_sweep(crazyflies, args.timeout)
+    legacy_time = time.time() - start_time
+
+    start_time = time.time()
+    results = fleet.check_batteries(crazyflies, timeout=args.timeout, tool=FAKE_TOOL)
+    sweep_time = time.time() - start_time
+    assert legacy == [result.voltage for result in results]
+
+    print("{} Crazyflies on {} channels, {} unreachable: one by one {:.2f} s, fleet sweep {:.2f} s ({:.1f}x)".format(
+        args.crazyflies, args.channels, args.unreachable, legacy_time, sweep_time, legacy_time / sweep_time))
+    for result in results:
+        print("  {:3d} {} {:>11} {:>5} {:.2f} s {}".format(result.id, result.uri, result.status,
+              "-" if result.voltage is None else result.voltage, result.duration, result.error or ""))
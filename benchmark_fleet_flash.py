@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+import time
+
+import fake_crazyflie_tools
+import fleet
+
+# Flashing a fleet with fake_crazyflie_tools.py: one by one like the former chooser vs. parallel across channels, both with retries
+FAKE_TOOL = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_crazyflie_tools.py")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fleet flash wall time and retries with a simulated radio")
+    parser.add_argument("--crazyflies", type=int, default=12)
+    parser.add_argument("--channels", type=int, default=4)
+    parser.add_argument("--flaky", type=int, default=3, help="Crazyflies whose first flash fails")
+    parser.add_argument("--flash-time", type=float, default=1.0, help="seconds per flash")
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds per flash attempt")
+    args = parser.parse_args()
+
+    crazyflies = [{"id": 100 + i, "channel": 80 + 2 * (i % args.channels)} for i in range(args.crazyflies)]
+    os.environ["FAKE_CF_FLASH_TIME"] = str(args.flash_time)
+    os.environ["FAKE_CF_FLAKY"] = ",".join("{:02X}".format(crazyflie["id"]) for crazyflie in crazyflies[:args.flaky])
+    os.environ["FAKE_CF_UNREACHABLE"] = "{:02X}".format(crazyflies[-1]["id"])
+    os.environ["FAKE_CF_UNREACHABLE_TIME"] = str(args.timeout * 2)
+
+    fake_crazyflie_tools.reset()
+    start_time = time.time()
+    one_by_one = fleet.flash(crazyflies, "stm32", "cf2.bin", timeout=args.timeout, workers=1, tool=FAKE_TOOL)
+    one_by_one_time = time.time() - start_time
+
+    fake_crazyflie_tools.reset()
+    progress = []
+    start_time = time.time()
+    results = fleet.flash(crazyflies, "stm32", "cf2.bin", timeout=args.timeout, tool=FAKE_TOOL,
+                          on_progress=lambda id, attempt: progress.append((id, attempt)))
+    parallel_time = time.time() - start_time
+
+    print(fleet.result_table(results))
+    print("{} Crazyflies on {} channels, {} flaky, 1 unreachable:".format(args.crazyflies, args.channels, args.flaky))
+    print("  one by one {:.1f} s, {} ok".format(one_by_one_time, sum(result.ok for result in one_by_one)))
+    print("  parallel   {:.1f} s, {} ok, {} attempts with up to {} retries".format(parallel_time, sum(result.ok for result in results), len(progress), fleet.RETRIES))
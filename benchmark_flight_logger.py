@@ -0,0 +1,61 @@
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from flight_logger import FlightLogger, load
+
+
+class FakePID():
+    components = (1.2, 0.05, -0.01)
+
+
+def csv_logging(folder, iterations):
+    '''
+    The former utils.LOGGER: one csv row per command, setpoints only
+    '''
+    with open(os.path.join(folder, "csv_log"), "w") as f:
+        writer = csv.writer(f)
+        durations = np.empty(iterations)
+        for i in range(iterations):
+            start_time = time.perf_counter()
+            writer.writerow([1.0 + i, 2.0, 0.4, 90.0, 1.5])
+            durations[i] = time.perf_counter() - start_time
+    return durations
+
+
+def columnar_logging(folder, iterations):
+    '''
+    FlightLogger with everything of a block iteration: setpoint, position, detection and PID terms
+    '''
+    logger = FlightLogger("benchmark", folder=folder)
+    pid = FakePID()
+    durations = np.empty(iterations)
+    for i in range(iterations):
+        start_time = time.perf_counter()
+        logger.log_setpoint(1.0 + i, 2.0, 0.4, 90.0, 1.5)
+        logger.log_position(1.0, 2.0, 0.4, 90.0)
+        logger.log_detection((-34, 12, 5280, 128, 134, 3), time.time())
+        logger.log_pid(pid, pid, pid)
+        durations[i] = time.perf_counter() - start_time
+    logger.close()
+    data = load(logger.path)
+    print("columnar rows dropped:", logger.dropped, "of", 4 * iterations)
+    size = sum(os.path.getsize(os.path.join(logger.path, f)) for f in os.listdir(logger.path))
+    print("columnar log: {} chunks, {:.1f} kB, {} setpoints read back".format(len(os.listdir(logger.path)), size / 1e3, len(data["setpoint"])))
+    return durations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Control loop cost of the csv logger vs. the buffered columnar flight logger")
+    parser.add_argument("--iterations", type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        for name, function in [("csv (setpoint)", csv_logging), ("columnar (4 channels)", columnar_logging)]:
+            durations = function(folder, args.iterations) * 1e6
+            print("{:>22}: mean {:6.2f} us, p99 {:6.2f} us, max {:8.2f} us per iteration".format(
+                name, durations.mean(), np.percentile(durations, 99), durations.max()))
@@ -0,0 +1,63 @@
+import argparse
+import json
+import time
+from threading import Thread
+
+import numpy as np
+
+from MQTTClient import MQTTClient
+from reid_demo.aideck.mqtt_loopback import LoopbackBroker, LoopbackClient
+
+TOPIC = "palletBlock_bb"
+POLL_PERIOD = 0.1 # sleep of the former message_ready loop in reid_demo_v2
+
+
+def publish_detections(broker, messages, rate):
+    '''
+    Detector stand-in: publishes at random points in time, every message carries its send time
+    '''
+    publisher = LoopbackClient(broker, "Benchmark Publisher")
+    rng = np.random.default_rng(0)
+    for _ in range(messages):
+        time.sleep(rng.uniform(0.5, 1.5) / rate)
+        publisher.publish(TOPIC, json.dumps([[0, 0, 1000, 162, 122, time.time()]]), qos=2)
+
+
+def wait_polling(client, timeout):
+    deadline = time.time() + timeout
+    while not client.message_ready[TOPIC] and time.time() < deadline:
+        time.sleep(POLL_PERIOD)
+    return client.get_bb(TOPIC)
+
+
+def wait_event(client, timeout):
+    _, message, _ = client.wait_for(TOPIC, timeout)
+    return message
+
+
+def measure(wait, messages, rate):
+    broker = LoopbackBroker()
+    client = MQTTClient(None, None, [TOPIC], mqtt_client=LoopbackClient(broker, "Benchmark Runner"))
+    publisher = Thread(target=publish_detections, args=(broker, messages, rate))
+    publisher.start()
+
+    latencies = []
+    while publisher.is_alive() or client.message_ready[TOPIC]:
+        message = wait(client, 1.0)
+        if message is not None:
+            latencies.append(time.time() - message[0][5])
+    publisher.join()
+    client.close()
+    return np.array(latencies) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wake-up latency of the mission loop after a detection arrives")
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=10, help="detections per second")
+    args = parser.parse_args()
+
+    for name, wait in [("polling", wait_polling), ("wait_for", wait_event)]:
+        latencies = measure(wait, args.messages, args.rate)
+        print("{:>8}: {}/{} messages, wake-up latency p50 {:.2f} ms, p99 {:.2f} ms, max {:.2f} ms".format(
+            name, len(latencies), args.messages, np.percentile(latencies, 50), np.percentile(latencies, 99), np.max(latencies)))
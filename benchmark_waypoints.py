@@ -0,0 +1,87 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+import waypoints as waypoint_engine
+
+
+def legacy_waypoints(width, height, min_dist, height_dist, num_waypoints_per_side):
+    waypoints = []
+    for val in [-1, 1]: # left and right
+        y = val * (height/2 + min_dist)
+        x_0 = -width/2
+        x_offset = width/(num_waypoints_per_side - 1)
+        for i in range(-1, num_waypoints_per_side + 1):
+            waypoints.append([-val * (x_0 + i * x_offset), y, height_dist])
+    return waypoints
+
+
+def legacy_angle(waypointA, waypointB):
+    return math.atan2(waypointB[1] - waypointA[1], waypointB[0] - waypointA[0]) * 180 / math.pi + 90
+
+
+def legacy_live(local_waypoints, rotation, position, width, cf_position):
+    '''
+    The former ViconObject.order_waypoints + get_next_waypoint_live for one object
+    '''
+    rotation_matrix = np.matrix(rotation)
+    waypoints = [np.array(np.dot(rotation_matrix, waypoint))[0] for waypoint in local_waypoints]
+    true_waypoints = [pos + np.array(position) for pos in np.array(waypoints)]
+    distances = [np.linalg.norm([np.array(waypoint)] - np.array(cf_position)) for waypoint in true_waypoints]
+    shortest_index = np.argmin(distances, axis=0)
+    order = [i % len(waypoints) for i in range(shortest_index, shortest_index + len(waypoints))]
+    head, back = (np.array(np.dot(rotation_matrix, [-x * width/2, 0, 0]))[0] for x in (-1, 1))
+    return position + waypoints[order[0]], legacy_angle(head, back)
+
+
+def vectorized_live(local_waypoints, rotations, positions, cf_position):
+    '''
+    All objects at once: one matmul, one norm, one argmin
+    '''
+    world = waypoint_engine.transform(local_waypoints, rotations, positions)
+    order = waypoint_engine.nearest_order(world, cf_position)
+    return world[np.arange(len(world)), order[:, 0]], waypoint_engine.object_angle(rotations)
+
+
+def random_rotations(rng, count):
+    yaw = rng.uniform(-math.pi, math.pi, count)
+    rotations = np.zeros((count, 3, 3))
+    rotations[:, 0, 0] = np.cos(yaw)
+    rotations[:, 0, 1] = -np.sin(yaw)
+    rotations[:, 1, 0] = np.sin(yaw)
+    rotations[:, 1, 1] = np.cos(yaw)
+    rotations[:, 2, 2] = 1
+    return rotations
+
+
+def timed(function, repeats):
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        result = function()
+    return (time.perf_counter() - start_time) / repeats * 1e3, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Waypoint transform and ordering: per waypoint np.matrix code vs. the vectorized engine")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    width, height = 1.2, 0.8
+    cf_position = np.array([0.3, -1.5, 0.5])
+    for num_per_side in [3, 50, 250]:
+        local_list = legacy_waypoints(width, height, 0.2, 0.3, num_per_side)
+        local = waypoint_engine.object_waypoints(width, height, 0.2, 0.3, num_per_side)
+        assert np.allclose(local, local_list)
+        for objects in [1, 10]:
+            rotations = random_rotations(rng, objects)
+            positions = rng.uniform(-2, 2, (objects, 3))
+
+            legacy_ms, legacy = timed(lambda: [legacy_live(local_list, r, p, width, cf_position) for r, p in zip(rotations, positions)], args.repeats)
+            vectorized_ms, (targets, angles) = timed(lambda: vectorized_live(local, rotations, positions, cf_position), args.repeats)
+            assert np.allclose([target for target, _ in legacy], targets)
+            assert np.allclose([angle for _, angle in legacy], angles)
+            print("{:4d} waypoints x {:2d} objects: legacy {:8.3f} ms, vectorized {:6.3f} ms ({:.0f}x)".format(
+                len(local), objects, legacy_ms, vectorized_ms, legacy_ms / vectorized_ms))
@@ -1,24 +1,22 @@
-import subprocess
+import argparse
 
-cfs = [(114, 85), (99, 94), (115, 88), (110, 91)]
+import fleet
+import fleet_config
 
+parser = argparse.ArgumentParser(description="Battery voltage of the selected Crazyflies (crazyflies.yaml)")
+parser.add_argument("--configpath", type=str, default=fleet_config.CONFIG_PATH, help="Path to the configuration *.yaml files")
+parser.add_argument("--ids", type=int, nargs="+", help="Crazyflies to check instead of the selected ones")
+args = parser.parse_args()
 
-batteryVoltageWarning = 3.8  # V
-batteryVoltateCritical = 3.7 # V
+if not fleet_config.exists(args.configpath):
+    print("ERROR: Could not find all yaml configuration files in configpath ({}).".format(args.configpath))
+    exit()
 
-for i, c in cfs:
-    id = "{0:02X}".format(i)
-    uri = "radio://0/{}/1M/E7E7E7E7{}".format(c, id) # 2M
-    try:
-        voltage = subprocess.check_output(["rosrun crazyflie_tools battery --uri " + uri], shell=True)
-        voltage = float(voltage)
-        status = "Normal"
-        if voltage < batteryVoltateCritical:
-            status = "Critical"
-        elif voltage < batteryVoltageWarning:
-            status = "Warning"
-    except:
-        print(i, uri, "not reachable...")
+config = fleet_config.FleetConfig(args.configpath)
+
+for result in fleet.check_batteries(config.targets(args.ids)):
+    if result.voltage is None:
+        print(result.id, result.uri, "not reachable...", result.error)
         continue
 
-    print(i, uri, voltage, status)
+    print(result.id, result.uri, result.voltage, result.status)
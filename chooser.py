@@ -1,12 +1,13 @@
 import argparse
-import Tkinter
-import yaml
+import tkinter as Tkinter
+import queue
 import os
-import subprocess
 import re
-import time
 import threading
 
+import fleet
+import fleet_config
+
 if __name__ == '__main__':
 	parser = argparse.ArgumentParser()
 	parser.add_argument(
@@ -24,11 +25,14 @@ if __name__ == '__main__':
 		type=str,
 		default=os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../../../crazyflie2-nrf-firmware/cf2_nrf.bin"),
 		help="Path to cf2_nrf.bin")
+	parser.add_argument(
+		"--batteryInterval",
+		type=float,
+		default=0,
+		help="Check the batteries of the selected Crazyflies every batteryInterval seconds, 0 disables it")
 	args = parser.parse_args()
 
-	if not os.path.exists(os.path.join(args.configpath, "allCrazyflies.yaml")) or \
-		not os.path.exists(os.path.join(args.configpath, "crazyflieTypes.yaml")) or \
-		not os.path.exists(os.path.join(args.configpath, "crazyflies.yaml")):
+	if not fleet_config.exists(args.configpath):
 		print("ERROR: Could not find all yaml configuration files in configpath ({}).".format(args.configpath))
 		exit()
 
@@ -38,30 +42,16 @@ if __name__ == '__main__':
 	if not os.path.exists(args.nrf51Fw):
 		print("WARNING: Could not find NRF51 firmware ({}).".format(args.nrf51Fw))
 
-	# read a yaml file
-	def read_by_id(path):
-		by_id = {}
-		with open(path, 'r') as ymlfile:
-			root = yaml.load(ymlfile)
-			for node in root["crazyflies"]:
-				id = int(node["id"])
-				by_id[id] = node
-		return by_id
-
-	def selected_cfs():
-		nodes = [node for id, node in allCrazyflies.items() if widgets[id].checked.get()]
-		return nodes
+	def selected_ids():
+		return [id for id in allCrazyflies if widgets[id].checked.get()]
 
 	def save():
-		nodes = selected_cfs()
-		with open(os.path.join(args.configpath, "crazyflies.yaml"), 'w') as outfile:
-			yaml.dump({"crazyflies": nodes}, outfile)
+		# written debounced, dragging over many checkboxes saves once
+		config.save_selection(selected_ids())
 
-	allCrazyflies = read_by_id(os.path.join(args.configpath, "allCrazyflies.yaml"))
-	enabled = read_by_id(os.path.join(args.configpath, "crazyflies.yaml")).keys()
-	with open(os.path.join(args.configpath, "crazyflieTypes.yaml"), 'r') as ymlfile:
-		data = yaml.load(ymlfile)
-		cfTypes = data["crazyflieTypes"]
+	config = fleet_config.FleetConfig(args.configpath)
+	allCrazyflies = config.crazyflies
+	enabled = config.selected
 
 	# compute absolute pixel coordinates from the initial positions
 	positions = [node["initialPosition"] for node in allCrazyflies.values()]
@@ -96,6 +86,8 @@ if __name__ == '__main__':
 			self.batteryLabel.grid(row=1, column=0, columnspan=2, sticky='E')
 			self.versionLabel = Tkinter.Label(self, text="", fg="#999999", padx=0, pady=0)
 			self.versionLabel.grid(row=2, column=0, columnspan=2, sticky='E')
+			self.statusLabel = Tkinter.Label(self, text="", fg="#999999", padx=0, pady=0)
+			self.statusLabel.grid(row=3, column=0, columnspan=2, sticky='E')
 
 	# construct all the checkboxes
 	widgets = {}
@@ -166,61 +158,102 @@ if __name__ == '__main__':
 	mkbutton(buttons, "Fill", fill)
 
 	# construct bottom buttons for utility scripts
+	# fleet commands run in a background thread, one at a time since they share the radio,
+	# and their results are shown by the Tk thread
+	updates = queue.Queue()
+	commandThread = None
+	# a battery check requested while another command runs, started by processUpdates when it is finished
+	batteryQueued = False
+
+	def commandRunning():
+		return commandThread is not None and commandThread.is_alive()
+
+	def startCommand(target):
+		global commandThread
+		if commandRunning():
+			return False
+		commandThread = threading.Thread(target=target)
+		commandThread.daemon = True # so it exits when the main thread exit
+		commandThread.start()
+		return True
+
+	def processUpdates():
+		while True:
+			try:
+				update = updates.get_nowait()
+			except queue.Empty:
+				break
+			update()
+		if batteryQueued and not commandRunning():
+			checkBattery()
+		top.after(100, processUpdates)
+
+	def showStatus(id, text, color):
+		widgets[id].statusLabel.config(foreground=color, text=text)
+
+	def runOperation(name, operation, *operationArgs):
+		nodes = config.targets(selected_ids())
+
+		def showProgress(id, attempt):
+			text = name if attempt == 1 else "{} ({})".format(name, attempt)
+			updates.put(lambda: showStatus(id, text, '#999999'))
+
+		def showResult(result):
+			text = name + (" ok" if result.ok else " failed")
+			updates.put(lambda: showStatus(result.id, text, '#000000' if result.ok else '#FF0000'))
+
+		def run():
+			results = operation(nodes, *operationArgs, on_progress=showProgress, on_result=showResult)
+			print(fleet.result_table(results))
+
+		if not startCommand(run):
+			print("Wait until the running command is finished")
+
 	def sysOff():
-		nodes = selected_cfs()
-		for crazyflie in nodes:
-			id = "{0:02X}".format(crazyflie["id"])
-			uri = "radio://0/{}/1M/E7E7E7E7{}".format(crazyflie["channel"], id) # 2M
-			subprocess.call(["rosrun crazyflie_tools reboot --uri " + uri + " --mode sysoff"], shell=True)
+		runOperation("sysOff", fleet.reboot, True)
 
 	def reboot():
-		nodes = selected_cfs()
-		for crazyflie in nodes:
-			id = "{0:02X}".format(crazyflie["id"])
-			uri = "radio://0/{}/1M/E7E7E7E7{}".format(crazyflie["channel"], id) # 2M
-			print(crazyflie["id"])
-			subprocess.call(["rosrun crazyflie_tools reboot --uri " + uri], shell=True)
+		runOperation("reboot", fleet.reboot)
 
 	def flashSTM():
-		nodes = selected_cfs()
-		for crazyflie in nodes:
-			id = "{0:02X}".format(crazyflie["id"])
-			uri = "radio://0/{}/1M/E7E7E7E7{}".format(crazyflie["channel"], id) # 2M
-			print("Flash STM32 FW to {}".format(uri))
-			subprocess.call(["rosrun crazyflie_tools flash --uri " + uri + " --target stm32 --filename " + args.stm32Fw], shell=True)
+		print("Flash STM32 FW {}".format(args.stm32Fw))
+		runOperation("flash STM", fleet.flash, "stm32", args.stm32Fw)
 
 	def flashNRF():
-		nodes = selected_cfs()
-		for crazyflie in nodes:
-			id = "{0:02X}".format(crazyflie["id"])
-			uri = "radio://0/{}/1M/E7E7E7E7{}".format(crazyflie["channel"], id) # 2M
-			print("Flash NRF51 FW to {}".format(uri))
-			subprocess.call(["rosrun crazyflie_tools flash --uri " + uri + " --target nrf51 --filename " + args.nrf51Fw], shell=True)
+		print("Flash NRF51 FW {}".format(args.nrf51Fw))
+		runOperation("flash NRF", fleet.flash, "nrf51", args.nrf51Fw)
+
+	def showBattery(result):
+		if result.voltage is None:
+			print(result.id, result.uri, "not reachable...", result.error)
+			widgets[result.id].batteryLabel.config(foreground='#999999', text="n/a")
+			return
+		color = '#000000'
+		if result.status == "Warning":
+			color = '#FF8800'
+		if result.status == "Critical":
+			color = '#FF0000'
+		widgets[result.id].batteryLabel.config(foreground=color, text="{:.2f} v".format(result.voltage))
 
 	def checkBattery():
+		global batteryQueued
+		nodes = config.targets(selected_ids())
+
+		def run():
+			fleet.check_batteries(nodes, on_result=lambda result: updates.put(lambda: showBattery(result)))
+
+		if startCommand(run):
+			batteryQueued = False
+		elif batteryQueued:
+			return
+		else:
+			# the radio is busy, e.g. flashing, check once it is finished
+			batteryQueued = True
+			print("Battery check queued until the running command is finished")
 		# reset color
 		for id, w in widgets.items():
 			w.batteryLabel.config(foreground='#999999')
 
-		# query each CF
-		nodes = selected_cfs()
-		for crazyflie in nodes:
-			id = "{0:02X}".format(crazyflie["id"])
-			uri = "radio://0/{}/1M/E7E7E7E7{}".format(crazyflie["channel"], id) #2M
-			cfType = crazyflie["type"]
-			bigQuad = cfTypes[cfType]["bigQuad"]
-			if not bigQuad:
-				voltage = subprocess.check_output(["rosrun crazyflie_tools battery --uri " + uri], shell=True)
-			else:
-				voltage = subprocess.check_output(["rosrun crazyflie_tools battery --uri " + uri + " --external 1"], shell=True)
-			voltage = float(voltage)
-			color = '#000000'
-			if voltage < cfTypes[cfType]["batteryVoltageWarning"]:
-				color = '#FF8800'
-			if voltage < cfTypes[cfType]["batteryVoltateCritical"]:
-				color = '#FF0000'
-			widgets[crazyflie["id"]].batteryLabel.config(foreground=color, text="{:.2f} v".format(voltage))
-
 	# def checkVersion():
 	# 	for id, w in widgets.items():
 	# 		w.versionLabel.config(foreground='#999999')
@@ -262,18 +295,17 @@ if __name__ == '__main__':
 	mkbutton(scriptButtons, "flash (STM)", flashSTM)
 	mkbutton(scriptButtons, "flash (NRF)", flashNRF)
 
-	# start background threads
+	# start background loops
 	def checkBatteryLoop():
-		while True:
-			# rely on GIL
-			checkBattery()
-			time.sleep(10.0) # seconds
-	# checkBatteryThread = threading.Thread(target=checkBatteryLoop)
-	# checkBatteryThread.daemon = True # so it exits when the main thread exit
-	# checkBatteryThread.start()
+		checkBattery()
+		top.after(int(args.batteryInterval * 1000), checkBatteryLoop)
+	processUpdates()
+	if args.batteryInterval > 0:
+		checkBatteryLoop()
 
 	# place the widgets in the window and start
 	buttons.pack()
 	frame.pack(padx=10, pady=10)
 	scriptButtons.pack()
 	top.mainloop()
+	config.flush()
@@ -0,0 +1,73 @@
+import argparse
+import fcntl
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Stand-in for "rosrun crazyflie_tools" without radio, e.g. CRAZYFLIE_TOOLS="python fake_crazyflie_tools.py"
+# Like a Crazyradio, only one command talks on a channel at a time.
+LATENCY = float(os.environ.get("FAKE_CF_LATENCY", 0.3)) # seconds per command when reachable
+FLASH_TIME = float(os.environ.get("FAKE_CF_FLASH_TIME", 2.0)) # seconds per flash
+UNREACHABLE = os.environ.get("FAKE_CF_UNREACHABLE", "") # comma separated ids in hex, e.g. "72,5B"
+UNREACHABLE_TIME = float(os.environ.get("FAKE_CF_UNREACHABLE_TIME", 10.0)) # seconds until the tool gives up
+FLAKY = os.environ.get("FAKE_CF_FLAKY", "") # comma separated ids in hex whose first command fails
+FAILURE_RATE = float(os.environ.get("FAKE_CF_FAILURE_RATE", 0.0)) # probability that any command fails
+STATE_FOLDER = os.path.join(tempfile.gettempdir(), "fake_crazyradio")
+
+
+def parse_uri(uri):
+    # radio://0/85/1M/E7E7E7E772
+    parts = uri.split("/")
+    return int(parts[3]), parts[-1][-2:].upper()
+
+
+def id_list(ids):
+    return [i.strip().upper() for i in ids.split(",") if i.strip()]
+
+
+def occupy_channel(channel, duration):
+    with open(os.path.join(STATE_FOLDER, str(channel)), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        time.sleep(duration)
+
+
+def reset():
+    '''
+    Lets the flaky Crazyflies fail again
+    '''
+    if os.path.isdir(STATE_FOLDER):
+        for name in os.listdir(STATE_FOLDER):
+            if name.startswith("flaky_"):
+                os.remove(os.path.join(STATE_FOLDER, name))
+
+
+def first_attempt(id):
+    marker = os.path.join(STATE_FOLDER, "flaky_" + id)
+    if os.path.exists(marker):
+        return False
+    open(marker, "w").close()
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["battery", "reboot", "flash", "version"])
+    parser.add_argument("--uri", required=True)
+    parser.add_argument("--external", type=int, default=0)
+    parser.add_argument("--mode", default="reboot")
+    parser.add_argument("--target", choices=["stm32", "nrf51"])
+    parser.add_argument("--filename")
+    args = parser.parse_args()
+
+    os.makedirs(STATE_FOLDER, exist_ok=True)
+    channel, id = parse_uri(args.uri)
+    if id in id_list(UNREACHABLE):
+        occupy_channel(channel, UNREACHABLE_TIME)
+        sys.exit("Could not connect to " + args.uri)
+    occupy_channel(channel, FLASH_TIME if args.command == "flash" else LATENCY)
+    if (id in id_list(FLAKY) and first_attempt(id)) or random.random() < FAILURE_RATE:
+        sys.exit("Communication with " + args.uri + " lost")
+    if args.command == "battery":
+        print("{:.2f}".format(random.Random(args.uri).uniform(3.6, 4.2) * (3 if args.external else 1)))
@@ -0,0 +1,181 @@
+import os
+import shlex
+import subprocess
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Runs crazyflie_tools commands (battery, reboot, flash) for many Crazyflies at once. Crazyflies on the
+# same radio channel are handled one after another by the same worker, different channels in parallel.
+
+TOOL = shlex.split(os.environ.get("CRAZYFLIE_TOOLS", "rosrun crazyflie_tools")) # e.g. "python fake_crazyflie_tools.py"
+MAX_WORKERS = 4 # channels queried at the same time
+TIMEOUT = 5.0 # seconds per Crazyflie
+FLASH_TIMEOUT = 180.0 # seconds per Crazyflie and firmware
+RETRIES = 2 # further attempts of a failed reboot or flash
+
+BATTERY_WARNING = 3.8 # V
+BATTERY_CRITICAL = 3.7 # V
+
+QueryResult = namedtuple("QueryResult", ["id", "uri", "channel", "ok", "output", "error", "duration", "attempts"])
+BatteryResult = namedtuple("BatteryResult", ["id", "uri", "voltage", "status", "error", "duration"])
+
+
+def crazyflie_uri(id, channel, radio=0, datarate="1M"):
+    return "radio://{}/{}/{}/E7E7E7E7{:02X}".format(radio, channel, datarate, int(id))
+
+
+def run_tool(arguments, timeout=TIMEOUT, tool=None):
+    '''
+    Runs one crazyflie_tools command, the process is killed after timeout seconds
+
+    returns: (ok, stdout, error message)
+    '''
+    try:
+        output = subprocess.run((tool or TOOL) + arguments, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                timeout=timeout, universal_newlines=True)
+    except subprocess.TimeoutExpired:
+        return False, "", "timeout after {:.1f} s".format(timeout)
+    except OSError as e:
+        return False, "", str(e)
+    if output.returncode != 0:
+        return False, output.stdout, output.stderr.strip().splitlines()[-1] if output.stderr.strip() else "exit code {}".format(output.returncode)
+    return True, output.stdout, None
+
+
+def group_by_channel(crazyflies):
+    groups = OrderedDict()
+    for crazyflie in crazyflies:
+        groups.setdefault(crazyflie["channel"], []).append(crazyflie)
+    return groups
+
+
+def sweep(crazyflies, command, timeout=TIMEOUT, workers=MAX_WORKERS, tool=None, on_result=None, retries=0, on_progress=None):
+    '''
+    crazyflies: dicts with at least id and channel, e.g. the nodes of crazyflies.yaml
+    command: function(crazyflie, uri) returning the crazyflie_tools arguments
+    on_result: called with every QueryResult as soon as it is available, from a worker thread
+    retries: further attempts for a Crazyflie whose command failed or timed out
+    on_progress: called with (id, attempt) before every attempt, from a worker thread
+
+    returns: QueryResults in the order of crazyflies
+    '''
+    crazyflies = list(crazyflies)
+    results = {}
+    lock = threading.Lock()
+
+    def query_channel(group):
+        # failed Crazyflies are retried after the others of the channel, durations add up over attempts
+        pending = deque((crazyflie, 1, 0.0) for crazyflie in group)
+        while pending:
+            crazyflie, attempt, duration = pending.popleft()
+            uri = crazyflie.get("uri") or crazyflie_uri(crazyflie["id"], crazyflie["channel"])
+            if on_progress is not None:
+                on_progress(crazyflie["id"], attempt)
+            start_time = time.time()
+            ok, output, error = run_tool(command(crazyflie, uri), timeout, tool)
+            duration += time.time() - start_time
+            if not ok and attempt <= retries:
+                pending.append((crazyflie, attempt + 1, duration))
+                continue
+            result = QueryResult(crazyflie["id"], uri, crazyflie["channel"], ok, output, error, duration, attempt)
+            with lock:
+                results[crazyflie["id"]] = result
+            if on_result is not None:
+                on_result(result)
+
+    groups = group_by_channel(crazyflies)
+    if len(groups) > 0:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(groups)))) as executor:
+            for future in [executor.submit(query_channel, group) for group in groups.values()]:
+                future.result()
+    return [results[crazyflie["id"]] for crazyflie in crazyflies]
+
+
+def battery_command(crazyflie, uri):
+    arguments = ["battery", "--uri", uri]
+    if crazyflie.get("bigQuad", False):
+        arguments += ["--external", "1"]
+    return arguments
+
+
+def battery_status(voltage, warning=BATTERY_WARNING, critical=BATTERY_CRITICAL):
+    if voltage < critical:
+        return "Critical"
+    elif voltage < warning:
+        return "Warning"
+    return "Normal"
+
+
+def to_battery_result(result, warning=BATTERY_WARNING, critical=BATTERY_CRITICAL):
+    voltage, status, error = None, "Unreachable", result.error
+    if result.ok:
+        try:
+            voltage = float(result.output)
+            status = battery_status(voltage, warning, critical)
+        except ValueError:
+            error = "unexpected output: " + result.output.strip()
+    return BatteryResult(result.id, result.uri, voltage, status, error, result.duration)
+
+
+def check_batteries(crazyflies, timeout=TIMEOUT, workers=MAX_WORKERS, tool=None, on_result=None):
+    '''
+    Battery voltage of every Crazyflie. The thresholds are taken from the keys
+    batteryVoltageWarning/batteryVoltateCritical of a crazyflie, else the defaults.
+
+    on_result: called with every BatteryResult as soon as it is available, from a worker thread
+    returns: BatteryResults in the order of crazyflies
+    '''
+    crazyflies = list(crazyflies)
+    by_id = {crazyflie["id"]: crazyflie for crazyflie in crazyflies}
+
+    def convert(result):
+        crazyflie = by_id[result.id]
+        return to_battery_result(result, crazyflie.get("batteryVoltageWarning", BATTERY_WARNING),
+                                 crazyflie.get("batteryVoltateCritical", BATTERY_CRITICAL))
+
+    callback = None if on_result is None else (lambda result: on_result(convert(result)))
+    return [convert(result) for result in sweep(crazyflies, battery_command, timeout, workers, tool, callback)]
+
+
+def reboot_command(crazyflie, uri):
+    return ["reboot", "--uri", uri]
+
+
+def sysoff_command(crazyflie, uri):
+    return ["reboot", "--uri", uri, "--mode", "sysoff"]
+
+
+def flash_command(target, filename):
+    '''
+    target: stm32 or nrf51
+    '''
+    return lambda crazyflie, uri: ["flash", "--uri", uri, "--target", target, "--filename", filename]
+
+
+def reboot(crazyflies, sysoff=False, timeout=TIMEOUT, retries=RETRIES, **kwargs):
+    '''
+    Reboots or powers off (sysoff) every Crazyflie, kwargs as for sweep
+    '''
+    return sweep(crazyflies, sysoff_command if sysoff else reboot_command, timeout, retries=retries, **kwargs)
+
+
+def flash(crazyflies, target, filename, timeout=FLASH_TIMEOUT, retries=RETRIES, **kwargs):
+    '''
+    Flashes filename to the stm32 or nrf51 of every Crazyflie, kwargs as for sweep
+    '''
+    return sweep(crazyflies, flash_command(target, filename), timeout, retries=retries, **kwargs)
+
+
+def result_table(results):
+    '''
+    One line per Crazyflie for printing, e.g. after reboot or flash
+    '''
+    lines = ["{:>4} {:<28} {:<6} {:>8} {:>9}  {}".format("id", "uri", "result", "attempts", "duration", "error")]
+    for result in results:
+        lines.append("{:>4} {:<28} {:<6} {:>8} {:>7.1f} s  {}".format(result.id, result.uri, "ok" if result.ok else "FAILED",
+                                                                     result.attempts, result.duration, result.error or ""))
+    failed = sum(1 for result in results if not result.ok)
+    lines.append("{}/{} ok".format(len(results) - failed, len(results)))
+    return "\n".join(lines)
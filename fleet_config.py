@@ -0,0 +1,159 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+import fleet
+
+# The crazyswarm configuration: allCrazyflies.yaml (every Crazyflie), crazyflies.yaml (the selected ones)
+# and crazyflieTypes.yaml. Files are parsed once and again only after they changed on disk.
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../launch/")
+ALL_CRAZYFLIES = "allCrazyflies.yaml"
+SELECTED_CRAZYFLIES = "crazyflies.yaml"
+CRAZYFLIE_TYPES = "crazyflieTypes.yaml"
+SAVE_DELAY = 0.5 # seconds, saves of the selection within this time are combined
+TYPE_KEYS = ["bigQuad", "batteryVoltageWarning", "batteryVoltateCritical"] # copied into the fleet targets
+
+_cache = {} # path -> ((mtime, size), data)
+_cache_lock = threading.Lock()
+
+
+def file_version(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_yaml(path):
+    '''
+    Parsed yaml file, cached until the file changes
+    '''
+    version = file_version(path)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    with open(path, 'r') as ymlfile:
+        data = yaml.load(ymlfile, Loader=SafeLoader)
+    with _cache_lock:
+        _cache[path] = (version, data)
+    return data
+
+
+def write_yaml(path, data):
+    '''
+    Writes to a temporary file next to path and replaces path with it, readers never see half a file
+    '''
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".", suffix=".yaml")
+    try:
+        with os.fdopen(handle, 'w') as outfile:
+            yaml.dump(data, outfile, Dumper=SafeDumper)
+        os.chmod(temp_path, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    with _cache_lock:
+        _cache[path] = (file_version(path), data)
+
+
+def exists(path=CONFIG_PATH):
+    return all(os.path.exists(os.path.join(path, name)) for name in [ALL_CRAZYFLIES, SELECTED_CRAZYFLIES, CRAZYFLIE_TYPES])
+
+
+class FleetConfig():
+    '''
+    All Crazyflies indexed by id, channel and type with their URIs, and the selection
+    '''
+    def __init__(self, path=CONFIG_PATH, save_delay=SAVE_DELAY):
+        self.path = path
+        self.save_delay = save_delay
+        self.versions = None
+        self.pending_save = None
+        self.save_lock = threading.Lock()
+        self.reload()
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def reload(self):
+        '''
+        Rebuilds the indexes if a file changed since the last call
+
+        returns: True if something was reloaded
+        '''
+        names = [ALL_CRAZYFLIES, SELECTED_CRAZYFLIES, CRAZYFLIE_TYPES]
+        versions = [file_version(self.file(name)) for name in names]
+        if versions == self.versions:
+            return False
+        all_data, selected_data, types_data = [load_yaml(self.file(name)) for name in names]
+
+        self.crazyflies = OrderedDict((int(node["id"]), node) for node in all_data["crazyflies"])
+        self.types = types_data["crazyflieTypes"]
+        if self.pending_save is None: # else keep the selection that is not written yet
+            self.selected = [int(node["id"]) for node in (selected_data or {}).get("crazyflies") or []]
+        self.uris = {id: fleet.crazyflie_uri(id, node["channel"]) for id, node in self.crazyflies.items()}
+        self.ids_by_channel = OrderedDict()
+        self.ids_by_type = OrderedDict()
+        for id, node in self.crazyflies.items():
+            self.ids_by_channel.setdefault(node["channel"], []).append(id)
+            self.ids_by_type.setdefault(node["type"], []).append(id)
+        self.versions = versions
+        return True
+
+    def uri(self, id):
+        return self.uris[id]
+
+    def crazyflie_type(self, id):
+        return self.types[self.crazyflies[id]["type"]]
+
+    def by_channel(self, channel):
+        return [self.crazyflies[id] for id in self.ids_by_channel.get(channel, [])]
+
+    def by_type(self, type):
+        return [self.crazyflies[id] for id in self.ids_by_type.get(type, [])]
+
+    def targets(self, ids=None):
+        '''
+        Crazyflies for the fleet commands with their uri and battery settings, the selected ones if ids is None
+        '''
+        self.reload()
+        targets = []
+        for id in self.selected if ids is None else ids:
+            target = dict(self.crazyflies[id], uri=self.uris[id])
+            cf_type = self.crazyflie_type(id)
+            target.update((key, cf_type[key]) for key in TYPE_KEYS if key in cf_type)
+            targets.append(target)
+        return targets
+
+    def save_selection(self, ids):
+        '''
+        Selects the Crazyflies with ids, crazyflies.yaml is written after save_delay seconds
+        without another call, or by flush
+        '''
+        ids = set(ids)
+        with self.save_lock:
+            self.selected = [id for id in self.crazyflies if id in ids]
+            if self.pending_save is not None:
+                self.pending_save.cancel()
+            self.pending_save = threading.Timer(self.save_delay, self.flush)
+            self.pending_save.start()
+
+    def flush(self):
+        '''
+        Writes a pending selection now
+        '''
+        with self.save_lock:
+            if self.pending_save is None:
+                return
+            self.pending_save.cancel()
+            self.pending_save = None
+            path = self.file(SELECTED_CRAZYFLIES)
+            write_yaml(path, {"crazyflies": [self.crazyflies[id] for id in self.selected]})
+            self.versions[1] = file_version(path)
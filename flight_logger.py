@@ -0,0 +1,166 @@
+import argparse
+import csv
+import glob
+import os
+import queue
+import time
+from threading import Lock, Thread
+
+import numpy as np
+
+LOGGING_FOLDER = "logs"
+CHUNK_SIZE = 512 # rows per channel and chunk
+FLUSH_INTERVAL = 1.0 # seconds, partially filled chunks are written at least this often
+MAX_PENDING_CHUNKS = 64 # chunks waiting for the writer, newer ones are dropped instead of blocking the control loop
+
+# columns of every channel, the time of the entry is always the first column
+CHANNELS = {
+    "setpoint": ["x", "y", "z", "yaw", "flight_time"], # m, deg, s
+    "position": ["x", "y", "z", "yaw"], # measured when the setpoint was sent
+    "detection": ["capture_time", "offset_x", "offset_y", "area", "track_id"], # nan if no detection was used
+    "pid": ["x_p", "x_i", "x_d", "y_p", "y_i", "y_d", "z_p", "z_i", "z_d"], # terms of the block controllers
+}
+
+
+class FlightLogger():
+    '''
+    Records timestamped values into preallocated column buffers per channel. A full or
+    FLUSH_INTERVAL old buffer is swapped for an empty one and written by a background
+    thread as an .npz chunk, so log() only copies one row in the control loop. Chunks are not
+    compressed, compressing holds the GIL long enough to delay the control loop.
+
+    A flight is a folder of chunks, read it with load() or export it with export_csv().
+    '''
+    def __init__(self, name, folder=LOGGING_FOLDER, channels=CHANNELS, clock=time.time):
+        self.clock = clock
+        self.channels = channels
+        self.path = os.path.join(folder, "{}_{}".format(time.strftime("%Y%m%d_%H%M%S"), name))
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        self.lock = Lock()
+        self.buffers = {channel: self.new_buffer(channel) for channel in channels}
+        self.rows = {channel: 0 for channel in channels}
+        self.chunks = queue.Queue(MAX_PENDING_CHUNKS)
+        self.chunk_index = 0
+        self.dropped = 0
+        self.last_flush = clock()
+
+        self.running = True
+        self.writer = Thread(target=self.run, daemon=True)
+        self.writer.start()
+
+    def new_buffer(self, channel):
+        return np.full((CHUNK_SIZE, len(self.channels[channel]) + 1), np.nan)
+
+    def log(self, channel, *values):
+        '''
+        Appends one row, missing trailing values and None are stored as nan
+        '''
+        with self.lock:
+            row = self.rows[channel]
+            buffer = self.buffers[channel]
+            buffer[row, 0] = self.clock()
+            buffer[row, 1:len(values) + 1] = values
+            self.rows[channel] = row + 1
+            if row + 1 == CHUNK_SIZE:
+                self.swap()
+
+    def log_setpoint(self, x, y, z, yaw, flight_time=None):
+        self.log("setpoint", x, y, z, yaw, flight_time)
+
+    def log_position(self, x, y, z, yaw=None):
+        self.log("position", x, y, z, yaw)
+
+    def log_detection(self, offset, capture_time=None):
+        if offset is None:
+            self.log("detection", capture_time)
+        else:
+            self.log("detection", capture_time, *offset[:3], offset[5] if len(offset) > 5 else None)
+
+    def log_pid(self, *pids):
+        self.log("pid", *[term for pid in pids for term in pid.components])
+
+    def swap(self):
+        '''
+        Hands all filled buffers to the writer, must be called with the lock held
+        '''
+        chunk = {}
+        for channel, rows in self.rows.items():
+            if rows > 0:
+                chunk[channel] = self.buffers[channel][:rows]
+                self.buffers[channel] = self.new_buffer(channel)
+                self.rows[channel] = 0
+        self.last_flush = self.clock()
+        if len(chunk) == 0:
+            return
+        try:
+            self.chunks.put_nowait(chunk)
+        except queue.Full:
+            self.dropped += sum(len(values) for values in chunk.values())
+
+    def run(self):
+        while self.running or not self.chunks.empty():
+            try:
+                chunk = self.chunks.get(timeout=FLUSH_INTERVAL / 2)
+            except queue.Empty:
+                if self.clock() - self.last_flush >= FLUSH_INTERVAL:
+                    with self.lock:
+                        self.swap()
+                continue
+            np.savez(os.path.join(self.path, "chunk_{:05d}.npz".format(self.chunk_index)), **chunk)
+            self.chunk_index += 1
+
+    def flush(self):
+        with self.lock:
+            self.swap()
+
+    def close(self):
+        self.flush()
+        self.running = False
+        self.writer.join()
+        if self.dropped > 0:
+            print("Flight logger dropped", self.dropped, "rows, the disk could not keep up")
+
+
+def load(path, channels=CHANNELS):
+    '''
+    returns: {channel: (rows, 1 + columns) array}, the first column is the time
+    '''
+    data = {}
+    for chunk_path in sorted(glob.glob(os.path.join(path, "chunk_*.npz"))):
+        with np.load(chunk_path) as chunk:
+            for channel in chunk.files:
+                data.setdefault(channel, []).append(chunk[channel])
+    return {channel: np.concatenate(data[channel]) if channel in data else np.empty((0, len(channels[channel]) + 1))
+            for channel in channels}
+
+
+def export_csv(path, out_folder=None, channels=CHANNELS):
+    '''
+    Writes one CSV file per channel next to the chunks or into out_folder
+    '''
+    out_folder = path if out_folder is None else out_folder
+    if not os.path.exists(out_folder):
+        os.makedirs(out_folder)
+    paths = []
+    for channel, values in load(path, channels).items():
+        csv_path = os.path.join(out_folder, channel + ".csv")
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["time"] + channels[channel])
+            writer.writerows(values.tolist())
+        paths.append(csv_path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export flight logs to CSV")
+    parser.add_argument("flights", nargs="+", help="flight log folders")
+    parser.add_argument("--out", default=None, help="output folder, default: the flight folder")
+    args = parser.parse_args()
+
+    for flight in args.flights:
+        out_folder = None if args.out is None else os.path.join(args.out, os.path.basename(os.path.normpath(flight)))
+        for csv_path in export_csv(flight, out_folder):
+            print("Exported", csv_path)
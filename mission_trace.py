@@ -0,0 +1,87 @@
+import json
+import os
+import time
+
+TRACE_FOLDER = "traces"
+
+
+class MissionTrace():
+    '''
+    Machine readable trace of one flight, one JSON object per line:
+        {"type": "phase", "t": .., "phase": "BLOCK"}
+        {"type": "iteration", "t": .., "phase": .., "wait": .., "flight": .., "detected": .., "detection_age": ..}
+        {"type": "event", "t": .., "phase": .., "event": "rtb"|"retry"|"block_done"|...}
+        {"type": "flight", "t": .., "duration": .., "phases": {name: {"duration", "iterations", "wait", "flight", ...}}}
+    t is relative to the start of the trace. Lines are flushed right away, so an aborted
+    flight still leaves a usable trace. Summarize traces with summarize_traces.py.
+    '''
+    def __init__(self, name, folder=TRACE_FOLDER, clock=time.time):
+        self.clock = clock
+        self.start_time = clock()
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self.path = os.path.join(folder, "{}_{}.jsonl".format(time.strftime("%Y%m%d_%H%M%S"), name))
+        self.file = open(self.path, "w")
+
+        self.phase_name = None
+        self.phase_start = None
+        self.phases = {}
+        self.events = {}
+
+    def write(self, record):
+        record["t"] = round(self.clock() - self.start_time, 4)
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def phase_stats(self, name):
+        if name not in self.phases:
+            self.phases[name] = {"duration": 0, "iterations": 0, "wait": 0, "flight": 0, "detections": 0, "detection_ages": []}
+        return self.phases[name]
+
+    def phase(self, mode):
+        '''
+        Start a new mission phase, mode is a utils.Mode or a name
+        '''
+        name = mode.name if hasattr(mode, "name") else str(mode)
+        if name == self.phase_name:
+            return
+        self.end_phase()
+        self.phase_name = name
+        self.phase_start = self.clock()
+        self.phase_stats(name)
+        self.write({"type": "phase", "phase": name})
+
+    def end_phase(self):
+        if self.phase_name is not None:
+            self.phase_stats(self.phase_name)["duration"] += self.clock() - self.phase_start
+            self.phase_name = None
+
+    def iteration(self, wait=0, flight=None, detected=None, capture_time=None):
+        '''
+        One control iteration: seconds spent waiting for a detection, commanded flight time,
+        whether a detection was used and when it was captured, its age at use is derived from it
+        '''
+        detection_age = None if capture_time is None else self.clock() - capture_time
+        stats = self.phase_stats(self.phase_name)
+        stats["iterations"] += 1
+        stats["wait"] += wait
+        stats["flight"] += flight if flight is not None else 0
+        if detected:
+            stats["detections"] += 1
+        if detection_age is not None:
+            stats["detection_ages"].append(detection_age)
+        self.write({"type": "iteration", "phase": self.phase_name, "wait": round(wait, 4), "flight": flight,
+                    "detected": detected, "detection_age": None if detection_age is None else round(detection_age, 4)})
+
+    def event(self, event, **data):
+        self.events[event] = self.events.get(event, 0) + 1
+        record = {"type": "event", "phase": self.phase_name, "event": event}
+        record.update(data)
+        self.write(record)
+
+    def close(self, **data):
+        self.end_phase()
+        record = {"type": "flight", "duration": round(self.clock() - self.start_time, 4), "phases": self.phases, "events": self.events}
+        record.update(data)
+        self.write(record)
+        self.file.close()
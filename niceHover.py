@@ -3,18 +3,20 @@
 import numpy as np
 from pycrazyswarm import *
 import time
+from telemetry import TelemetryRecorder, session_path
 
 Z = 0.3
 
-def print_position(cfs):
-    for cf in allcfs.crazyflies:
-        pos = cf.position()
-        print(pos)
+def print_telemetry(recorder, start_time):
+    for name in recorder.names:
+        times, poses = recorder.window(name, start_time)
+        print(name, "samples:", len(times), "position:", poses[-1][:3] if len(times) > 0 else None, "velocity:", recorder.velocity(name))
 
 if __name__ == "__main__":
     swarm = Crazyswarm()
     timeHelper = swarm.timeHelper
     allcfs = swarm.allcfs
+    recorder = TelemetryRecorder.for_swarm(allcfs, path=session_path("niceHover")).start()
 
     #allcfs.takeoff(targetHeight=Z, duration=3.0+Z)
     allcfs.takeoff2(targetHeight=Z, yaw=0, useCurrentYaw=True, duration=3.0+Z)
@@ -26,8 +28,8 @@ if __name__ == "__main__":
     start_time = time.time()
 
     while time.time() < start_time + 3:
-        print_position(allcfs.crazyflies)
-        timeHelper.sleep(0.1)
+        print_telemetry(recorder, start_time)
+        timeHelper.sleep(0.5)
 
     
 
@@ -37,3 +39,5 @@ if __name__ == "__main__":
     #allcfs.land(targetHeight=0.00, duration=2.0+Z)
     allcfs.land2(targetHeight=0.00, yaw=0.0, useCurrentYaw=True, duration=2.0+Z)
     timeHelper.sleep(1.0+Z)
+    recorder.stop()
+    print("Telemetry saved in", recorder.path)
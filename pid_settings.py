@@ -6,7 +6,7 @@ def choose_closest_bb(pallet_offsets):
         return None
 
     best_bb, best_bb_score = None, 1000
-    for offset_x, offset_y, area, center_x, center_y in pallet_offsets:
+    for offset_x, offset_y, area, center_x, center_y, *_ in pallet_offsets:
         score = abs(offset_x)
         if score < best_bb_score:
             best_bb = (offset_x, offset_y, area, center_x, center_y)
@@ -27,11 +27,10 @@ area_to_meter = 10e-7
 
 
 while True:
-    pallet_block_offsets = client.get_bb(PALLET_BLOCK_OFFSET_TOPIC)
-    if pallet_block_offsets is None:
-        continue
+    # sleeps until the next detection instead of spinning on get_bb
+    _, pallet_block_offsets, _ = client.wait_for(PALLET_BLOCK_OFFSET_TOPIC)
     target_offset = choose_closest_bb(pallet_block_offsets)
-    offset_x, offset_y, area, _, _ = target_offset
+    offset_x, offset_y, area = target_offset[:3]
     
     dist_side = round(-1 * block_pid_x(offset_x) * pixel_to_meter, 2)
 
@@ -1,12 +1,18 @@
-import subprocess
-
-cfs = [(114, 85), (115, 88), (99, 94)]
-
-for i, c in cfs:
-    id = "{0:02X}".format(i)
-    uri = "radio://0/{}/1M/E7E7E7E7{}".format(c, id) # 2M
-    print(uri)
-    try:
-        subprocess.call(["rosrun crazyflie_tools reboot --uri " + uri], shell=True)
-    except:
-        print(uri, "not reachable...")
\ No newline at end of file
+import argparse
+
+import fleet
+import fleet_config
+
+parser = argparse.ArgumentParser(description="Reboots the selected Crazyflies (crazyflies.yaml)")
+parser.add_argument("--configpath", type=str, default=fleet_config.CONFIG_PATH, help="Path to the configuration *.yaml files")
+parser.add_argument("--ids", type=int, nargs="+", help="Crazyflies to reboot instead of the selected ones")
+args = parser.parse_args()
+
+if not fleet_config.exists(args.configpath):
+    print("ERROR: Could not find all yaml configuration files in configpath ({}).".format(args.configpath))
+    exit()
+
+config = fleet_config.FleetConfig(args.configpath)
+
+results = fleet.reboot(config.targets(args.ids), on_progress=lambda id, attempt: print(id, "reboot, attempt", attempt))
+print(fleet.result_table(results))
@@ -1,8 +1,9 @@
 #!/usr/bin/env python
 from pycrazyswarm import Crazyswarm
 from MQTTClient import MQTTClient
-from utils import choose_best_bb, choose_middle_bb, choose_closest_bb,  Mode
+from utils import choose_best_bb, choose_middle_bb, choose_closest_bb, choose_tracked_bb, get_track_id, Mode
 from Drone import Drone
+from mission_trace import MissionTrace
 import time
 
 LOG_TRACKING = True
@@ -28,18 +29,25 @@ def main():
     drone = Drone(cf, (0, 0), STARTING_HEIGHT)
     current_mode = Mode.PALLET
     blocks_passed = 0
+    # track id of the block the drone is approaching, keeps the choice stable between frames
+    target_track_id = None
 
     flight_time = drone.move(drone.x, drone.y, drone.height, drone.angle, 3)
     timeHelper.sleep(flight_time)
 
+    trace = MissionTrace("reid_demo")
     flight_start_time = time.time()
 
     while running:
+        trace.phase(current_mode)
+        # detection used in this iteration, for the trace
+        detected, capture_time = None, None
 
         # we are looking for the pallet
         if current_mode == Mode.PALLET:
             # get pallet_offset (offset_x, offset_y, area, center_x, center_y)
-            pallet_offsets = client.get_bb(PALLET_OFFSET_TOPIC)
+            pallet_offsets, capture_time = client.get_bb(PALLET_OFFSET_TOPIC, with_capture_time=True)
+            detected = pallet_offsets is not None
             # choose best bb (Problem: Alternating choices)
             target_offset = choose_best_bb(pallet_offsets)
             # drone updates position, angle => flighs to position
@@ -53,7 +61,8 @@ def main():
                 drone.reset_target_condition()
 
         elif current_mode == Mode.BLOCK_SEARCH:
-            pallet_block_offsets = client.get_bb(PALLET_BLOCK_OFFSET_TOPIC)
+            pallet_block_offsets, capture_time = client.get_bb(PALLET_BLOCK_OFFSET_TOPIC, with_capture_time=True)
+            detected = pallet_block_offsets is not None
 
             # calculate number of found pallet blocks else None
             num_pallet_blocks = len(pallet_block_offsets) if pallet_block_offsets is not None else None
@@ -67,18 +76,24 @@ def main():
                 drone.reset_target_condition(max_iter=4)
 
         elif current_mode == Mode.BLOCK:
-            pallet_block_offsets = client.get_bb(PALLET_BLOCK_OFFSET_TOPIC)
+            # detections captured before the last command was issued are dropped
+            pallet_block_offsets, capture_time = client.get_bb(PALLET_BLOCK_OFFSET_TOPIC, captured_after=drone.last_command_time, with_capture_time=True)
+            detected = pallet_block_offsets is not None
             # pallet_block_offsets = filter_pallet_bbs(pallet_block_offsets)
 
-            target_offset = None
-            if pallet_block_offsets is not None and len(pallet_block_offsets) >= 3:
-                target_offset = choose_middle_bb(pallet_block_offsets)
-            else:
-                target_offset = choose_closest_bb(pallet_block_offsets)
+            target_offset = choose_tracked_bb(pallet_block_offsets, target_track_id)
+            if target_offset is None:
+                if pallet_block_offsets is not None and len(pallet_block_offsets) >= 3:
+                    target_offset = choose_middle_bb(pallet_block_offsets)
+                else:
+                    target_offset = choose_closest_bb(pallet_block_offsets)
+                target_track_id = get_track_id(target_offset)
             
             if client.get_bb(PALLET_BLOCK_CONTINUE_TOPIC) is not None:
                 print("Found block", str(blocks_passed), "moving to next...")
                 blocks_passed += 1
+                target_track_id = None
+                trace.event("block_done", block=blocks_passed, iterations=drone.block_iterations)
                 # reset drone search settings
                 drone.reset_target_condition()
                 if blocks_passed >= 3:
@@ -95,7 +110,7 @@ def main():
                     movement = [(0.47, -0.1, 3), (-1.00, -0.1, 5)]
                     flight_time = drone.move_sideways(*movement[blocks_passed-1])
             else:
-                flight_time = drone.update_block(target_offset)
+                flight_time = drone.update_block(target_offset, capture_time)
 
 
         elif current_mode == Mode.FINISHED:
@@ -104,22 +119,30 @@ def main():
 
         if flight_time is None:
             print("Found no pallet rtb...")
+            trace.event("rtb")
+            trace.phase("RTB")
             current_mode = Mode.PALLET
             drone.reset_target_condition()
             flight_time = drone.move(0, 0, STARTING_HEIGHT, 0, 4)
             timeHelper.sleep(flight_time)
             print("Nothing found. Press Enter to try again...")
             swarm.input.waitUntilButtonPressed()
+            trace.event("retry")
             flight_start_time = time.time()
             flight_time = 2
 
+        trace.iteration(flight=flight_time, detected=detected, capture_time=capture_time if detected else None)
         timeHelper.sleep(flight_time)
 
+    trace.phase(Mode.FINISHED)
+
     flight_time = drone.move(0, 0, STARTING_HEIGHT, 0, 5)
     timeHelper.sleep(flight_time)
     allcfs.land(targetHeight=0.05, duration=3.0)
     timeHelper.sleep(4)
 
+    trace.close(flight_time=flight_duration, stale_rejected=client.stale.get(PALLET_BLOCK_OFFSET_TOPIC, 0))
+    drone.close()
     client.close()
 
 if __name__ == "__main__":
@@ -1 +1,7 @@
-from aideck import Connector, Detector
\ No newline at end of file
+# Mission scripts in the repository root import the shared modules as reid_demo.aideck.*,
+# Connector and Detector are only loaded when they are used
+def __getattr__(name):
+    if name in ("Connector", "Detector"):
+        from . import aideck
+        return getattr(aideck, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
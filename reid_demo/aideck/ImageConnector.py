@@ -4,9 +4,12 @@ import numpy as np
 import os
 import cv2
 import threading
-import pyvirtualcam
+from collections import deque
 
-from aideck import utils
+from . import utils
+from .frame_receiver import FrameReceiver
+from .frame_queue import LatestFrameQueue
+from .frame_bus import FrameBusPublisher
 
 IP = '192.168.2.95'
 PORT = 5000
@@ -15,14 +18,21 @@ WIDTH = 324
 HEIGHT = 244
 FPS = 20
 
+PIPELINED = True
+# shared memory frame bus for the detectors, None to only use the virtual cams
+FRAME_BUS_NAME = "aideck_frames"
+FRAME_AGE_WINDOW = 200
+
 DEBUG = True
 RECORD = False
 
 class Connector(threading.Thread):
 
-    def __init__(self):
+    def __init__(self, ip=IP, port=PORT, device_numbers=DEVICE_NUMBERS, pipelined=PIPELINED, frame_bus_name=FRAME_BUS_NAME):
         threading.Thread.__init__(self)
         self.factors = [1.8648577393897736, 1.2606252586922309, 1.4528872589128194]
+        # the factors are fixed for the session, the virtual cams expect RGB
+        self.rgb_lut = utils.createColorLUT(self.factors, rgb=True)
 
         if RECORD:
             self.recording_folder_name = f"recording_{int(time.time())}"
@@ -31,23 +41,41 @@ class Connector(threading.Thread):
         
 
         self.timer_period = 0.05  # seconds
+        self.pipelined = pipelined
 
-        print("Connecting to socket on {}:{}...".format(IP, PORT))
+        print("Connecting to socket on {}:{}...".format(ip, port))
         self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.client_socket.connect((IP, PORT))
+        self.client_socket.connect((ip, port))
         print("Socket connected")
+        self.receiver = FrameReceiver(self.client_socket)
 
         self.cams = []
-        for device_id in DEVICE_NUMBERS:
+        if len(device_numbers) > 0:
+            # only needed for the virtual cams, detectors on the frame bus and offline tools run without it
+            import pyvirtualcam
+        for device_id in device_numbers:
             self.cams.append(pyvirtualcam.Camera(width=WIDTH, height=HEIGHT, fps=FPS, device="/dev/video{}".format(device_id)))
 
+        self.frame_bus = None
+        if frame_bus_name is not None:
+            self.frame_bus = FrameBusPublisher(frame_bus_name, shape=(HEIGHT, WIDTH, 3))
+
         self.count = 0
         self.startTime = time.time()
 
+        # newest received frame, waiting to be processed in pipelined mode
+        self.frame_queue = LatestFrameQueue()
+        # age of the last published frames in seconds (publish time - receive time)
+        self.frame_ages = deque(maxlen=FRAME_AGE_WINDOW)
+
         self.running = True
         self.start()
 
     def run(self):
+        if self.pipelined:
+            self.run_pipelined()
+            return
+
         while self.running:
             try:
                 self.timer_callback()
@@ -56,55 +84,105 @@ class Connector(threading.Thread):
                 self.client_socket.close()
         
         self.client_socket.close()
+        self.close_frame_bus()
+
+    def run_pipelined(self):
+        receive_thread = threading.Thread(target=self.receive_loop, daemon=True)
+        receive_thread.start()
+
+        while self.running:
+            item = self.frame_queue.get(timeout=1.0)
+            if item is None:
+                continue
+            capture_time, img = item
+            self.process_image(img, capture_time)
+
+        receive_thread.join()
+        self.close_frame_bus()
+
+    def receive_loop(self):
+        '''
+        Drain the socket as fast as the AI-deck sends, only the newest frame gets processed
+        '''
+        try:
+            while self.running:
+                frmt, imgs = self.getImage(self.client_socket)
+                if imgs is not None and frmt == 0:
+                    # the bayer image is a view into the receive ring, only hand over the color image
+                    self.frame_queue.put((time.time(), imgs[-1]))
+        except (OSError, ConnectionError) as e:
+            print("Lost connection to the AI-deck:", e)
+            self.running = False
+        finally:
+            self.frame_queue.close()
+            self.client_socket.close()
 
     def timer_callback(self):
         
         frmt, imgs = self.getImage(self.client_socket)
 
         if imgs is not None and frmt == 0:
-            img = imgs[-1]
-            img = utils.colorCorrectBayer(img,self.factors)
+            self.process_image(imgs[-1], time.time())
 
-            # push image to virtual cam
-            img = cv2.cvtColor(img,cv2.COLOR_BGR2RGB)
-            for cam in self.cams:
-                cam.send(img)
+    def process_image(self, img, capture_time):
+        '''
+        Publish a color corrected RGB image
+        '''
+        if RECORD:
+            cv2.imwrite(os.path.join("recordings", self.recording_folder_name, f"{capture_time}.jpg"), cv2.cvtColor(img,cv2.COLOR_RGB2BGR))
+
+        # push image to virtual cam
+        for cam in self.cams:
+            cam.send(img)
+
+        if self.frame_bus is not None:
+            # detectors expect BGR like from cv2.VideoCapture, convert directly into shared memory
+            cv2.cvtColor(img, cv2.COLOR_RGB2BGR, dst=self.frame_bus.next_frame())
+            self.frame_bus.commit(capture_time)
+
+        self.frame_ages.append(time.time() - capture_time)
+
+    def close_frame_bus(self):
+        if self.frame_bus is not None:
+            self.frame_bus.close()
+            self.frame_bus = None
+
+    def frame_age_stats(self):
+        '''
+        Statistics of the age of the last published frames in seconds
+        '''
+        if len(self.frame_ages) == 0:
+            return None
+        ages = np.array(self.frame_ages)
+        return {
+            "mean": float(np.mean(ages)),
+            "p95": float(np.percentile(ages, 95)),
+            "max": float(np.max(ages)),
+            "dropped": self.frame_queue.dropped,
+        }
 
     def getImage(self, client_socket):
         '''
         Function to receive an image from the socket
         '''
-        # First get the info
-        packetInfoRaw = utils.rx_bytes(4, client_socket)
-        [length, routing, function] = struct.unpack('<HBB', packetInfoRaw)
-        imgHeader = utils.rx_bytes(length - 2, client_socket)
-        [magic, width, height, depth, format, size] = struct.unpack('<BHHBBI', imgHeader)
+        format, width, height, frame = self.receiver.receive()
 
         imgs = None
 
-        if magic == 0xBC:
-
-            # Now we start rx the image, this will be split up in packages of some size
-            imgStream = bytearray()
-
-            while len(imgStream) < size:
-                packetInfoRaw = utils.rx_bytes(4, client_socket)
-                [length, dst, src] = struct.unpack('<HBB', packetInfoRaw)
-                chunk = utils.rx_bytes(length - 2, client_socket)
-                imgStream.extend(chunk)
-            
+        if frame is not None:
 
             if DEBUG:
                 self.count = self.count + 1
                 meanTimePerImage = (time.time()-self.startTime) / self.count
 
                 # TODO: CHange to debug and rclpy
-                print("FPS: {}; Mean time per Image: {}s".format(int(1/meanTimePerImage), meanTimePerImage))
+                print("FPS: {}; Mean time per Image: {}s; Dropped: {}".format(int(1/meanTimePerImage), meanTimePerImage, self.frame_queue.dropped))
 
             if format == 0:
-                bayer_img = np.frombuffer(imgStream, dtype=np.uint8)   
-                bayer_img.shape = (244, 324)
-                color_img = cv2.cvtColor(bayer_img, cv2.COLOR_BayerBG2BGR)
+                # view into the receive ring, no copy
+                bayer_img = frame.reshape((height, width))
+                # demosaic, white balance and BGR->RGB in one go
+                color_img = utils.demosaicColorCorrect(bayer_img, self.rgb_lut, rgb=True)
                 # k = cv2.waitKey(1)
                 # if k == ord('b'):
                 #     _,self.factors = utils.colorBalance(color_img)
@@ -114,9 +192,7 @@ class Connector(threading.Thread):
                 # k=cv2.waitKey(1)
                 # if k == ord('q'):
                 #     self.running = False
-                
-                if RECORD:
-                    cv2.imwrite(os.path.join("recordings", self.recording_folder_name, f"{time.time()}.jpg"), utils.colorCorrectBayer(color_img,self.factors))
+
                 
                 imgs = [bayer_img,color_img]
 
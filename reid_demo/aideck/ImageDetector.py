@@ -3,9 +3,15 @@ import numpy as np
 from . import utils
 import json
 from threading import Thread
+from collections import deque
 import os
 
-from aideck.mqtt_client import MQTTClient
+from .mqtt_client import MQTTClient
+from .multiscale import MultiScaleDetector
+from .visualizer import DetectionVisualizer, SCALE_COLORS
+from .scheduler import InferenceScheduler, DEMAND_TOPIC, PALLET_PHASES, BLOCK_PHASES
+from .tracking import DetectTrackPipeline
+from . import wire_format
 import time
 
 MQTT_BROKER = "localhost"
@@ -14,12 +20,22 @@ DET_THRESHOLD = 0.3
 NMS_THRESHOLD = 0.3
 IMAGE_CAPTURE_MIN_AREA = 11000
 IMAGE_CAPTURE_SLEEP = 4.5 # has to be bigger than the movement time of the drone from block to block (3s)
+PARALLEL_SCALES = True # run the inference of the different input sizes in parallel threads
+TIMING_WINDOW = 100
+HEADLESS = False
+VISUALIZATION_RATE = 5 # Hz, overlay rate in headless mode, 0 disables the window
+DEMAND_DRIVEN = True # follow the detection demand published by the mission loop
+TRACKING = True # blocks: full detection every REDETECT_INTERVAL frames, optical flow tracking in between
+REDETECT_INTERVAL = 5
+TRACK_COLOR = (0, 200, 255)
+BINARY_WIRE_FORMAT = True # publish boxes in the binary wire format with frame seq and time stamp, else JSON
 
 RECORD = False
 
 
 class Detector(Thread):
-    def __init__(self, model_config, model_weights, topic_name, client_name="Default Publisher", video_device=0):
+    def __init__(self, model_config, model_weights, topic_name, client_name="Default Publisher", video_device=0,
+                 headless=HEADLESS, visualization_rate=VISUALIZATION_RATE, client=None, frame_stats=None):
         Thread.__init__(self)
 
         self.topicName = topic_name
@@ -31,32 +47,34 @@ class Detector(Thread):
         self.detection_count = 0
         self.cooldown_timer = 0
         self.save_counter = 0
+        # sequence number and read time of the frame the published boxes belong to
+        self.frame_seq = 0
+        self.frame_time = None
 
         if RECORD:
             self.recording_folder_name = f"recording_{topic_name}_{int(time.time())}"
             if not os.path.exists(os.path.join("recordings", self.recording_folder_name)):
                 os.mkdir(os.path.join("recordings", self.recording_folder_name))
 
-        self.client = MQTTClient(MQTT_BROKER, PORT, client_name, [])
+        self.client = client if client is not None else MQTTClient(MQTT_BROKER, PORT, client_name, [DEMAND_TOPIC] if DEMAND_DRIVEN else [])
+        # optional list receiving (read time, inference seconds, number of detections) per frame
+        self.frame_stats = frame_stats
 
-        self.device = cv2.VideoCapture(video_device)
+        # webcam number or a capture like object, e.g. a FrameBusSubscriber
+        if isinstance(video_device, int):
+            self.device = cv2.VideoCapture(video_device)
+        else:
+            self.device = video_device
         self.conf_threshold = DET_THRESHOLD
         self.nms_threshold = NMS_THRESHOLD
 
-        net = cv2.dnn.readNet(model_weights, model_config)
-        net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
-        net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
-
-        factor_model=4
-        self.model = cv2.dnn_DetectionModel(net)
-        self.model.setInputParams(size=(factor_model*128, factor_model*128), scale=1/255, swapRB=True, crop=False)
-
-        if "Block" in self.topicName:
-            factor_model=2
-            self.model_close = cv2.dnn_DetectionModel(net)
-            self.model_close.setInputParams(size=(factor_model*128, factor_model*128), scale=1/255, swapRB=True, crop=False)
-        else:
-            self.model_close = None
+        # blocks are additionally detected on a smaller input to also find close blocks
+        sizes = [4*128, 2*128] if "Block" in self.topicName else [4*128]
+        self.multi_scale = MultiScaleDetector(model_config, model_weights, sizes, parallel=PARALLEL_SCALES)
+        self.model = self.multi_scale.models[0]
+        self.model_close = self.multi_scale.models[1] if len(sizes) > 1 else None
+        # seconds spent per loop stage of the last TIMING_WINDOW frames
+        self.timings = {}
 
         # self.model.setInputParams(size=(416, 416), scale=1/255, swapRB=True, crop=False)
 
@@ -68,6 +86,23 @@ class Detector(Thread):
         if RECORD:
             print("Saving to", self.recording_folder_name)
 
+        # headless: no drawing in the detection loop, overlays are optionally rendered
+        # at visualization_rate on a separate thread
+        self.headless = headless
+        self.visualizer = None
+        if headless and visualization_rate > 0:
+            self.visualizer = DetectionVisualizer("Frame " + str(self.topicName), visualization_rate, on_quit=self.stop)
+
+        # run inference at full rate only near the decision points of the mission loop
+        self.scheduler = None
+        if DEMAND_DRIVEN:
+            self.scheduler = InferenceScheduler(BLOCK_PHASES if "Block" in self.topicName else PALLET_PHASES)
+
+        # blocks hardly move between two frames, follow them with a tracker and give them stable ids
+        self.tracker = None
+        if TRACKING and "Block" in self.topicName:
+            self.tracker = DetectTrackPipeline(REDETECT_INTERVAL)
+
         self.running = True
 
     def run(self):
@@ -75,35 +110,123 @@ class Detector(Thread):
         current_frame = None
         while self.running:
             start_time = time.time()
+            stage_time = time.perf_counter()
             ret, frame = self.device.read()
-            if np.shape(frame) != ():
+            stage_time = self.record_timing("read", stage_time)
+            if not ret and not self.device.isOpened():
+                # end of a replayed recording
+                break
+            if np.shape(frame) != () and self.should_detect():
                 # store current frame for later use
                 current_frame = frame
-                # resize for faster detection/inference time
-                frame = utils.resize_frame(current_frame)
-                # draw cross hair for drone vision
-                frame = utils.draw_crosshair(frame, (0,0,frame.shape[1], frame.shape[0]), length=20)
-                # detect box
-                boxes, frame = utils.detect_box(frame, self.model, self.conf_threshold, self.nms_threshold)
+                # capture sequence and time stamp of the Connector if the device provides them (frame bus)
+                self.frame_seq = getattr(self.device, "last_seq", self.frame_seq + 1)
+                self.frame_time = getattr(self.device, "last_timestamp", None) or start_time
+                if not self.headless:
+                    # resize for faster detection/inference time
+                    frame = utils.resize_frame(current_frame)
+                    # draw cross hair for drone vision
+                    frame = utils.draw_crosshair(frame, (0,0,frame.shape[1], frame.shape[0]), length=20)
+                stage_time = self.record_timing("preprocess", stage_time)
+                tracks = None
+                inference_time = 0
+                if self.tracker is not None and not self.tracker.needs_detection():
+                    # follow the boxes of the last detection instead of running the model
+                    tracks = self.tracker.track(current_frame)
+                    box_results = [[box for _, box in tracks]]
+                    stage_time = self.record_timing("track", stage_time)
+                    if not self.headless:
+                        frame = utils.draw_results(frame, box_results[0], TRACK_COLOR)
+                else:
+                    box_results, frame = self.detect_boxes(frame)
+                    inference_time = self.multi_scale.timings["total"]
+                    stage_time = time.perf_counter()
+
+                boxes = box_results[0]
                 if "Block" in self.topicName:
-                    boxes_tiny, frame = utils.detect_box(frame, self.model_close, self.conf_threshold, self.nms_threshold, color=(255,0,0))
-                    boxes = self.merge_bounding_boxes(boxes, boxes_tiny)
-                    self.publish_both(boxes, None)
+                    track_ids = None
+                    if tracks is None:
+                        boxes = self.merge_bounding_boxes(boxes, box_results[1])
+                        if self.tracker is not None:
+                            tracks = self.tracker.update(current_frame, boxes)
+                            stage_time = self.record_timing("track", stage_time)
+                    if tracks is not None:
+                        boxes = [box for _, box in tracks]
+                        track_ids = [track_id for track_id, _ in tracks]
+                    self.publish_both(boxes, None, track_ids)
 
                 elif "pallet" in self.topicName:
                     self.publish(boxes)
                     self.publish_true_bb(boxes)
-                    
-                cv2.imshow("Frame " + str(self.topicName), frame)
-            k=cv2.waitKey(1)
-            if k == ord('q'):
-                break
+                stage_time = self.record_timing("publish", stage_time)
+                if self.frame_stats is not None:
+                    self.frame_stats.append((start_time, inference_time, 0 if boxes is None else len(boxes)))
+
+                if self.visualizer is not None:
+                    self.visualizer.submit(current_frame, box_results)
+                elif not self.headless:
+                    cv2.imshow("Frame " + str(self.topicName), frame)
+            if not self.headless:
+                k=cv2.waitKey(1)
+                if k == ord('q'):
+                    break
 
             if RECORD:
                 cv2.imwrite(os.path.join("recordings", self.recording_folder_name, f"{self.save_counter}.jpg"), frame)
                 self.save_counter += 1
 
+        self.running = False
+        if self.visualizer is not None:
+            self.visualizer.stop()
         self.device.release()
+        self.multi_scale.close()
+
+    def stop(self):
+        self.running = False
+
+    def detect_boxes(self, frame):
+        '''
+        Run the model on all scales, returns the [x, y, w, h, score] results per scale and the frame
+        '''
+        # detect boxes on all scales at once
+        detections = self.multi_scale.detect(frame, self.conf_threshold, self.nms_threshold)
+        for stage, seconds in self.multi_scale.timings.items():
+            self.add_timing("inference_" + stage, seconds)
+        stage_time = time.perf_counter()
+        if self.headless:
+            # detect on the raw frame without drawing anything
+            box_results = [utils.to_box_results(*detection) for detection in detections]
+        else:
+            box_results = []
+            for detection, color in zip(detections, SCALE_COLORS):
+                results, frame = utils.draw_box_results(frame, *detection, color=color)
+                box_results.append(results)
+        self.record_timing("draw", stage_time)
+        return box_results, frame
+
+    def should_detect(self):
+        if self.scheduler is None:
+            return True
+        demand = self.client.get_bb(DEMAND_TOPIC)
+        if demand is not None:
+            self.scheduler.update(demand)
+        return self.scheduler.should_run()
+
+    def add_timing(self, stage, seconds):
+        if stage not in self.timings:
+            self.timings[stage] = deque(maxlen=TIMING_WINDOW)
+        self.timings[stage].append(seconds)
+
+    def record_timing(self, stage, start_time):
+        now = time.perf_counter()
+        self.add_timing(stage, now - start_time)
+        return now
+
+    def timing_report(self):
+        '''
+        Mean milliseconds per stage over the last TIMING_WINDOW frames
+        '''
+        return {stage: 1000 * sum(values) / len(values) for stage, values in self.timings.items() if len(values) > 0}
 
     def merge_bounding_boxes(self, bbs, bbs_tiny):
         if bbs is None:
@@ -131,13 +254,24 @@ class Detector(Thread):
             
         return merges_bbs
 
+    def encode(self, kind, rows, message=None):
+        '''
+        Payload for publish: binary rows tagged with the current frame or the JSON message
+        '''
+        if BINARY_WIRE_FORMAT:
+            return wire_format.encode(kind, rows, self.frame_seq, self.frame_time)
+        return message if message is not None else list(list(rows))
+
     def publish_true_bb(self, bbs):
         if bbs is not None and len(bbs) > 0:
             # print(f"Publishing to {self.true_bb_topicName} in {time.time()}")
             bbs = [[int(el) for el in box] for box in bbs]
-            self.client.publish(self.true_bb_topicName, {"type": "bb", "content": list(list(bbs))}, qos=2)
+            self.client.publish(self.true_bb_topicName, self.encode(wire_format.KIND_TRUE_BB, bbs, {"type": "bb", "content": list(list(bbs))}), qos=2)
 
-    def publish_both(self, bbs_far, bbs_close):
+    def publish_both(self, bbs_far, bbs_close, track_ids=None):
+        '''
+        track_ids: optional track id per box of bbs_far, published as sixth element
+        '''
         offsets_with_center_far, offsets_with_center_close = None, None
         if bbs_far is not None:
             bbs_far = [[int(el) for el in box] for box in bbs_far]
@@ -153,15 +287,18 @@ class Detector(Thread):
 
         bbs_to_publish = []
         if offsets_with_center_far is not None:
-            for offset_x, offset_y, area, center_x, center_y in offsets_with_center_far:
-                for (_, _, _, center_x_b, center_y_b) in bbs_to_publish:
+            for i, (offset_x, offset_y, area, center_x, center_y) in enumerate(offsets_with_center_far):
+                for (_, _, _, center_x_b, center_y_b, *_) in bbs_to_publish:
                     if center_x_b - 50 < center_x < center_x_b + 50 and center_y_b - 50 < center_y < center_y_b + 50:
                         continue 
-                bbs_to_publish.append([offset_x, offset_y, area, center_x, center_y])
+                if track_ids is not None:
+                    bbs_to_publish.append([offset_x, offset_y, area, center_x, center_y, int(track_ids[i])])
+                else:
+                    bbs_to_publish.append([offset_x, offset_y, area, center_x, center_y])
         
 
         if len(bbs_to_publish) > 0:
-            self.client.publish(self.topicName, list(list(bbs_to_publish)), qos=2)
+            self.client.publish(self.topicName, self.encode(wire_format.KIND_OFFSETS, bbs_to_publish), qos=2)
 
     def publish_close(self, bbs):
         if bbs is not None:
@@ -175,7 +312,7 @@ class Detector(Thread):
                     # print(json.dumps(list(list([[int(el) for el in box] for box in boxes]))))
             if len(bbs_to_publish) > 0:
                 # print(f"Publishing to {self.topicName} in {time.time()}")
-                self.client.publish(self.topicName, list(list(bbs_to_publish)), qos=2)
+                self.client.publish(self.topicName, self.encode(wire_format.KIND_OFFSETS, bbs_to_publish), qos=2)
 
     def publish(self, bbs):
         if bbs is not None:
@@ -186,7 +323,7 @@ class Detector(Thread):
                 bbs_to_publish.append([offset_x, offset_y, area, center_x, center_y])
             if len(bbs_to_publish) > 0:
                 # print(f"Publishing to {self.topicName} in {time.time()}")
-                self.client.publish(self.topicName, list(list(bbs_to_publish)), qos=2)
+                self.client.publish(self.topicName, self.encode(wire_format.KIND_OFFSETS, bbs_to_publish), qos=2)
 
 
     def save_current_image(self, img, bb):
@@ -4,7 +4,8 @@ import numpy as np
 import os
 import cv2
 
-from aideck import utils
+from . import utils
+from .frame_receiver import FrameReceiver
 
 IP = '192.168.2.195'
 PORT = 5000
@@ -19,6 +20,7 @@ class Recorder():
 
     def __init__(self):
         self.factors = [1.8648577393897736, 1.2606252586922309, 1.4528872589128194]
+        self.lut = utils.createColorLUT(self.factors)
 
         if RECORD:
             self.recording_folder_name = f"recording_{int(time.time())}"
@@ -32,6 +34,7 @@ class Recorder():
         self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.client_socket.connect((IP, PORT))
         print("Socket connected")
+        self.receiver = FrameReceiver(self.client_socket)
 
         self.count = 0
         self.save_counter = 0
@@ -50,25 +53,11 @@ class Recorder():
         '''
         Function to receive an image from the socket
         '''
-        # First get the info
-        packetInfoRaw = utils.rx_bytes(4, client_socket)
-        [length, routing, function] = struct.unpack('<HBB', packetInfoRaw)
-        imgHeader = utils.rx_bytes(length - 2, client_socket)
-        [magic, width, height, depth, format, size] = struct.unpack('<BHHBBI', imgHeader)
+        format, width, height, frame = self.receiver.receive()
 
         imgs = None
 
-        if magic == 0xBC:
-
-            # Now we start rx the image, this will be split up in packages of some size
-            imgStream = bytearray()
-
-            while len(imgStream) < size:
-                packetInfoRaw = utils.rx_bytes(4, client_socket)
-                [length, dst, src] = struct.unpack('<HBB', packetInfoRaw)
-                chunk = utils.rx_bytes(length - 2, client_socket)
-                imgStream.extend(chunk)
-            
+        if frame is not None:
 
             if DEBUG:
                 self.count = self.count + 1
@@ -78,14 +67,15 @@ class Recorder():
                 # print("FPS: {}; Mean time per Image: {}s".format(int(1/meanTimePerImage), meanTimePerImage))
 
             if format == 0:
-                bayer_img = np.frombuffer(imgStream, dtype=np.uint8)   
-                bayer_img.shape = (244, 324)
+                # view into the receive ring, no copy
+                bayer_img = frame.reshape((height, width))
                 color_img = cv2.cvtColor(bayer_img, cv2.COLOR_BayerBG2BGR)
                 # k = cv2.waitKey(1)
                 # if k == ord('b'):
                 #     _,self.factors = utils.colorBalance(color_img)
 
-                cv2.imshow('Color', utils.colorCorrectBayer(color_img,self.factors))
+                corrected_img = utils.applyColorLUT(color_img, self.lut)
+                cv2.imshow('Color', corrected_img)
                 
                 k=cv2.waitKey(1)
                 if k == ord('q'):
@@ -94,7 +84,7 @@ class Recorder():
                     # print(f"Saved pallet: p{self.save_counter//3}A{self.save_counter%3}.jpg")
                     # cv2.imwrite(os.path.join("recordings", self.recording_folder_name, f"p{self.save_counter//3}A{self.save_counter%3}.jpg"), utils.colorCorrectBayer(color_img, self.factors))
                     print(f"Saved pallet: {self.save_counter}.jpg")
-                    cv2.imwrite(os.path.join("recordings", self.recording_folder_name, f"{self.save_counter}.jpg"), utils.colorCorrectBayer(color_img, self.factors))
+                    cv2.imwrite(os.path.join("recordings", self.recording_folder_name, f"{self.save_counter}.jpg"), corrected_img)
                     self.save_counter += 1
 
                 imgs = [bayer_img,color_img]
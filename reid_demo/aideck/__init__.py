@@ -1,4 +1,16 @@
-from aideck.ImageConnector import Connector
-from aideck.ImageDetector import Detector
-from aideck.mqtt_client import MQTTClient
-from aideck.ImageRecorder import Recorder
\ No newline at end of file
+import importlib
+
+# The classes are imported on first use, so e.g. frame_bus works without the
+# dependencies of the Connector (pyvirtualcam) or the Detector (paho, the detection models)
+_EXPORTS = {
+    "Connector": "ImageConnector",
+    "Detector": "ImageDetector",
+    "MQTTClient": "mqtt_client",
+    "Recorder": "ImageRecorder",
+}
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module("." + _EXPORTS[name], __name__), name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -0,0 +1,69 @@
+import socket
+import struct
+import time
+from threading import Thread
+
+import numpy as np
+
+from .frame_receiver import WIDTH, HEIGHT, IMAGE_MAGIC
+
+CHUNK_SIZE = 1020
+
+
+def build_image_stream(width=WIDTH, height=HEIGHT, format=0, chunk_size=CHUNK_SIZE, seed=0):
+    '''
+    Encode one random image exactly like the AI-deck streamer does: a CPX packet with the
+    image header followed by CPX packets carrying chunks of the raw image
+
+    returns: (stream, image, image_offset) with image_offset being the position of the
+             first image byte in the stream
+    '''
+    image = np.random.default_rng(seed).integers(0, 256, width * height, dtype=np.uint8).tobytes()
+    header = struct.pack('<BHHBBI', IMAGE_MAGIC, width, height, 1, format, len(image))
+    stream = bytearray(struct.pack('<HBB', len(header) + 2, 0x09, 0x00))
+    stream.extend(header)
+    image_offset = len(stream) + 4
+    for offset in range(0, len(image), chunk_size):
+        chunk = image[offset:offset + chunk_size]
+        stream.extend(struct.pack('<HBB', len(chunk) + 2, 0x09, 0x00))
+        stream.extend(chunk)
+    return stream, image, image_offset
+
+
+class FakeAIDeck(Thread):
+    '''
+    Local TCP stand-in for the AI-deck image streamer. Serves a single client with the
+    given number of frames (fps=0 sends as fast as possible) and closes the connection.
+    With stamp=True the send time is written as float64 into the first 8 image bytes.
+    '''
+    def __init__(self, host="127.0.0.1", port=0, frames=100, fps=0, width=WIDTH, height=HEIGHT, stamp=False):
+        Thread.__init__(self)
+        self.daemon = True
+        self.frames = frames
+        self.fps = fps
+        self.stamp = stamp
+        self.stream, self.image, self.image_offset = build_image_stream(width, height)
+
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind((host, port))
+        self.server_socket.listen(1)
+        self.address = self.server_socket.getsockname()
+
+    def run(self):
+        client_socket, _ = self.server_socket.accept()
+        try:
+            start_time = time.time()
+            for i in range(self.frames):
+                if self.fps > 0:
+                    delay = start_time + i / self.fps - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+                if self.stamp:
+                    struct.pack_into('<d', self.stream, self.image_offset, time.time())
+                client_socket.sendall(self.stream)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            client_socket.close()
+            self.server_socket.close()
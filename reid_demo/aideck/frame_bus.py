@@ -0,0 +1,178 @@
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+import cv2
+import numpy as np
+
+FRAME_BUS_NAME = "aideck_frames"
+WIDTH = 324
+HEIGHT = 244
+FPS = 20
+SLOTS = 8
+POLL_PERIOD = 0.002 # seconds
+
+# int64 header: magic, slots, height, width, channels, latest sequence number
+HEADER_FIELDS = 6
+MAGIC = 0xAD1DEC
+LATEST = 5
+WRITING = -1
+
+
+def _layout(buffer, slots, shape):
+    '''
+    Create the numpy views onto the shared memory block
+    '''
+    header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=buffer)
+    offset = header.nbytes
+    slot_seqs = np.ndarray((slots,), dtype=np.int64, buffer=buffer, offset=offset)
+    offset += slot_seqs.nbytes
+    slot_times = np.ndarray((slots,), dtype=np.float64, buffer=buffer, offset=offset)
+    offset += slot_times.nbytes
+    frames = np.ndarray((slots, *shape), dtype=np.uint8, buffer=buffer, offset=offset)
+    return header, slot_seqs, slot_times, frames
+
+
+def _close(shm):
+    try:
+        shm.close()
+    except BufferError:
+        # frames handed out are still referenced, the mapping is freed with the process
+        pass
+
+
+def _size(slots, shape):
+    return 8 * HEADER_FIELDS + 16 * slots + slots * int(np.prod(shape))
+
+
+class FrameBusPublisher():
+    '''
+    Publishes frames into a ring of slots in shared memory. Every slot carries the sequence
+    number and time stamp of its frame, so any number of subscribers in other processes
+    can read the newest frame without copying it and without virtual webcams.
+    '''
+    def __init__(self, name=FRAME_BUS_NAME, shape=(HEIGHT, WIDTH, 3), slots=SLOTS):
+        self.name = name
+        self.shape = tuple(shape)
+        self.slots = slots
+        size = _size(slots, self.shape)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # left over from a publisher which did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self.header, self.slot_seqs, self.slot_times, self.frames = _layout(self.shm.buf, slots, self.shape)
+        self.slot_seqs[:] = WRITING
+        self.header[:] = [MAGIC, slots, self.shape[0], self.shape[1], self.shape[2], 0]
+        self.seq = 0
+
+    def next_frame(self):
+        '''
+        Writable view of the slot for the next frame, publish it with commit()
+        '''
+        index = (self.seq + 1) % self.slots
+        self.slot_seqs[index] = WRITING
+        return self.frames[index]
+
+    def commit(self, timestamp=None):
+        self.seq += 1
+        index = self.seq % self.slots
+        self.slot_times[index] = time.time() if timestamp is None else timestamp
+        self.slot_seqs[index] = self.seq
+        self.header[LATEST] = self.seq
+        return self.seq
+
+    def publish(self, frame, timestamp=None):
+        np.copyto(self.next_frame(), frame)
+        return self.commit(timestamp)
+
+    def close(self):
+        del self.header, self.slot_seqs, self.slot_times, self.frames
+        self.shm.unlink()
+        _close(self.shm)
+
+
+class FrameBusSubscriber():
+    '''
+    Reads the newest frame of a FrameBusPublisher. Mimics the parts of cv2.VideoCapture
+    used by the Detector, so it can be passed as its video device.
+
+    The frame returned by read() is a view into shared memory and stays valid until the
+    publisher wrapped around the ring, which can be checked with is_valid().
+    '''
+    def __init__(self, name=FRAME_BUS_NAME, timeout=1.0, fps=FPS):
+        self.name = name
+        self.timeout = timeout
+        self.fps = fps
+        self.shm = self._attach(name)
+        magic, slots, height, width, channels = [int(v) for v in np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)[:5]]
+        if magic != MAGIC:
+            raise ValueError("Shared memory {} is no frame bus".format(name))
+        self.slots = slots
+        self.header, self.slot_seqs, self.slot_times, self.frames = _layout(self.shm.buf, slots, (height, width, channels))
+
+        self.last_seq = 0
+        self.last_timestamp = None
+        self.missed = 0
+        self.opened = True
+
+    @staticmethod
+    def _attach(name):
+        try:
+            return shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # python < 3.13 registers attached blocks and would unlink them at exit
+            shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(shm._name, "shared_memory")
+            return shm
+
+    def read(self):
+        '''
+        Wait for a frame newer than the last one read
+
+        returns: (True, frame) or (False, None) if no new frame arrived within the timeout
+        '''
+        deadline = time.time() + self.timeout
+        while self.opened:
+            seq = int(self.header[LATEST])
+            if seq > self.last_seq:
+                index = seq % self.slots
+                if int(self.slot_seqs[index]) == seq:
+                    if self.last_seq > 0:
+                        self.missed += seq - self.last_seq - 1
+                    self.last_seq = seq
+                    self.last_timestamp = float(self.slot_times[index])
+                    return True, self.frames[index]
+            if time.time() > deadline:
+                break
+            time.sleep(POLL_PERIOD)
+        return False, None
+
+    def is_valid(self, seq=None):
+        '''
+        Check if the frame with the given (default last read) sequence number was not overwritten yet
+        '''
+        seq = self.last_seq if seq is None else seq
+        return int(self.slot_seqs[seq % self.slots]) == seq
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.frames.shape[2]
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.frames.shape[1]
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return 0
+
+    def isOpened(self):
+        return self.opened
+
+    def release(self):
+        if not self.opened:
+            return
+        self.opened = False
+        del self.header, self.slot_seqs, self.slot_times, self.frames
+        _close(self.shm)
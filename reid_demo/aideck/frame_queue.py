@@ -0,0 +1,45 @@
+from threading import Condition
+
+
+class LatestFrameQueue():
+    '''
+    Bounded queue holding only the newest item. Putting an item while the previous one
+    has not been consumed yet replaces it and counts the old one as dropped.
+    '''
+    def __init__(self):
+        self.condition = Condition()
+        self.item = None
+        self.has_item = False
+        self.closed = False
+        self.dropped = 0
+        self.count = 0
+
+    def put(self, item):
+        with self.condition:
+            if self.has_item:
+                self.dropped += 1
+            self.item = item
+            self.has_item = True
+            self.count += 1
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        '''
+        Wait for the newest item
+
+        returns: the item or None if the timeout exceeded or the queue was closed
+        '''
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.has_item or self.closed, timeout):
+                return None
+            if not self.has_item:
+                return None
+            item = self.item
+            self.item = None
+            self.has_item = False
+            return item
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
@@ -0,0 +1,80 @@
+import struct
+import numpy as np
+
+from . import utils
+
+WIDTH = 324
+HEIGHT = 244
+RING_SIZE = 3
+MAX_PACKET_SIZE = 0xFFFF
+IMAGE_MAGIC = 0xBC
+
+PACKET_INFO = struct.Struct('<HBB')
+IMAGE_HEADER = struct.Struct('<BHHBBI')
+
+
+class FrameReceiver():
+    '''
+    Receives images of the AI-deck CPX stream into a preallocated ring of frame buffers.
+    Every chunk is written with recv_into directly to its final place in the current slot,
+    so a frame is copied exactly once from the socket and handed out as a NumPy view.
+
+    A returned frame stays valid until ring_size - 1 further frames have been received.
+    '''
+    def __init__(self, client_socket, ring_size=RING_SIZE, frame_size=WIDTH * HEIGHT):
+        self.client_socket = client_socket
+        self.slots = [bytearray(frame_size) for _ in range(ring_size)]
+        self.slot_index = -1
+
+        self.packet_info = memoryview(bytearray(PACKET_INFO.size))
+        self.packet = memoryview(bytearray(MAX_PACKET_SIZE))
+
+        self.count = 0
+
+    def rx_packet_info(self):
+        utils.rx_bytes_into(self.packet_info, self.client_socket)
+        return PACKET_INFO.unpack_from(self.packet_info)
+
+    def next_slot(self, size):
+        self.slot_index = (self.slot_index + 1) % len(self.slots)
+        if len(self.slots[self.slot_index]) < size:
+            # only happens if the AI-deck sends bigger images than expected
+            self.slots[self.slot_index] = bytearray(size)
+        return memoryview(self.slots[self.slot_index])
+
+    def receive(self):
+        '''
+        Receive the next image from the socket
+
+        returns: (format, width, height, frame) with frame being a flat uint8 view into the ring
+                 or None as frame if the packet was no image header
+        '''
+        [length, routing, function] = self.rx_packet_info()
+        header = utils.rx_bytes_into(self.packet[:length - 2], self.client_socket)
+        [magic, width, height, depth, format, size] = IMAGE_HEADER.unpack_from(header)
+
+        if magic != IMAGE_MAGIC:
+            return format, width, height, None
+
+        slot = self.next_slot(size)
+        offset = 0
+        [length, dst, src] = self.rx_packet_info()
+        while offset < size:
+            chunk_size = length - 2
+            if offset + chunk_size > len(slot):
+                # never expected, keep the stream in sync by reading the surplus into the scratch buffer
+                overflow = offset + chunk_size - len(slot)
+                utils.rx_bytes_scatter([slot[offset:], self.packet[:overflow]], self.client_socket)
+                break
+            chunk = slot[offset:offset + chunk_size]
+            offset += chunk_size
+            if offset < size:
+                # read the chunk together with the info of the next packet in one go
+                utils.rx_bytes_scatter([chunk, self.packet_info], self.client_socket)
+                [length, dst, src] = PACKET_INFO.unpack_from(self.packet_info)
+            else:
+                utils.rx_bytes_into(chunk, self.client_socket)
+
+        self.count += 1
+        frame = np.frombuffer(slot, dtype=np.uint8, count=size)
+        return format, width, height, frame
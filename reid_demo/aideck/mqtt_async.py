@@ -0,0 +1,266 @@
+import asyncio
+import json
+import socket
+import threading
+from collections import deque
+
+import paho.mqtt.client as mqtt
+
+from .wire_format import decode
+
+QUEUE_SIZE = 16 # messages buffered per channel for stream(), the oldest are dropped first
+MISC_PERIOD = 1.0 # seconds between paho's keepalive/retry housekeeping calls
+
+
+class TopicChannel():
+    '''
+    Messages of one subscription. Payloads are stored raw and only decoded when they are read,
+    so high rate topics like Vicon poses cost nothing until somebody looks at them.
+
+    latest(): newest message, never blocks
+    stream(): async iterator over the buffered messages, with at most maxsize messages in
+              flight, a slow consumer loses the oldest ones (counted in dropped)
+    '''
+    def __init__(self, topic, maxsize=QUEUE_SIZE, decode=decode):
+        self.topic = topic
+        self.decode = decode
+        self.queue = deque(maxlen=maxsize)
+        self.seq = 0
+        self.dropped = 0
+        self.timestamp = None
+        self._latest_raw = None
+        self._latest = None
+        self._decoded_seq = 0
+        self._event = asyncio.Event()
+
+    def put(self, payload, timestamp):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.seq += 1
+        self.timestamp = timestamp
+        self._latest_raw = payload
+        self.queue.append((self.seq, payload))
+        self._event.set()
+
+    def latest(self):
+        if self._latest_raw is None:
+            return None
+        if self._decoded_seq != self.seq:
+            # decoded once per message, also when read from another thread
+            seq, raw = self.seq, self._latest_raw
+            self._latest = self.decode(raw)
+            self._decoded_seq = seq
+        return self._latest
+
+    async def wait(self, newer_than=0, timeout=None):
+        '''
+        Wait until a message with a sequence number above newer_than arrived
+
+        returns: (seq, message), message is None on timeout
+        '''
+        try:
+            while self.seq <= newer_than:
+                self._event.clear()
+                await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return self.seq, None
+        return self.seq, self.latest()
+
+    async def stream(self):
+        while True:
+            while len(self.queue) == 0:
+                self._event.clear()
+                await self._event.wait()
+            _, payload = self.queue.popleft()
+            yield self.decode(payload)
+
+
+class AsyncMQTTClient():
+    '''
+    paho client driven by an asyncio event loop through its socket callbacks, so no network
+    thread is needed. on_message only stores the raw payload in the channel of the topic.
+
+    mqtt_client: optional paho like client, e.g. a LoopbackClient, its messages may arrive
+                 on a foreign thread and are handed over to the loop
+    '''
+    def __init__(self, ip, port, name="", mqtt_client=None, loop=None):
+        self.ip = ip
+        self.port = port
+        self.loop = loop
+        self.channels = {}
+        self.listeners = {}
+        self.qos = {}
+        self.misc_task = None
+        self.connected = None
+
+        self.client = mqtt_client if mqtt_client is not None else mqtt.Client(name)
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+        self.client.on_socket_open = self.on_socket_open
+        self.client.on_socket_close = self.on_socket_close
+        self.client.on_socket_register_write = self.on_socket_register_write
+        self.client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    async def connect(self, timeout=5.0):
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+        self.connected = asyncio.Event()
+        self.client.connect(self.ip, self.port)
+        sock = self.client.socket() if hasattr(self.client, "socket") else None
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 2048)
+        await asyncio.wait_for(self.connected.wait(), timeout)
+
+    def subscribe(self, topic, qos=0, maxsize=QUEUE_SIZE, decode=decode):
+        '''
+        decode: turns a raw payload into the message, e.g. wire_format.decode_message to keep the capture time
+        '''
+        if topic not in self.channels:
+            self.channels[topic] = TopicChannel(topic, maxsize, decode)
+            self.qos[topic] = qos
+            if self.connected is not None and self.connected.is_set():
+                self.client.subscribe(topic, qos=qos)
+        return self.channels[topic]
+
+    def add_listener(self, topic, callback):
+        '''
+        callback(timestamp, message) runs on the loop for every message of a subscribed topic,
+        for consumers that must not miss messages between two latest() calls
+        '''
+        self.listeners.setdefault(topic, []).append(callback)
+
+    def publish(self, topic, message, qos=0):
+        self.client.publish(topic, json.dumps(message), qos=qos)
+
+    def latest(self, topic):
+        channel = self.channels.get(topic)
+        return channel.latest() if channel is not None else None
+
+    def seq(self, topic):
+        '''
+        Number of messages received on topic, changes exactly when latest(topic) does
+        '''
+        channel = self.channels.get(topic)
+        return channel.seq if channel is not None else 0
+
+    def timestamp(self, topic):
+        '''
+        Arrival time of the latest message on topic in the clock of the event loop (time.monotonic)
+        '''
+        channel = self.channels.get(topic)
+        return channel.timestamp if channel is not None else None
+
+    async def close(self):
+        self.client.disconnect()
+        if self.misc_task is not None:
+            self.misc_task.cancel()
+
+    def on_connect(self, client, userdata, flags, rc, *args):
+        for topic in self.channels:
+            self.client.subscribe(topic, qos=self.qos[topic])
+        self.set_threadsafe(self.connected.set)
+
+    def on_message(self, client, userdata, msg):
+        self.set_threadsafe(self.dispatch, msg.topic, msg.payload)
+
+    def dispatch(self, topic, payload):
+        timestamp = self.loop.time()
+        for subscription, channel in self.channels.items():
+            if mqtt.topic_matches_sub(subscription, topic):
+                channel.put(payload, timestamp)
+                for listener in self.listeners.get(subscription, []):
+                    listener(timestamp, channel.latest())
+
+    def set_threadsafe(self, callback, *args):
+        if self.on_loop_thread():
+            callback(*args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    def on_loop_thread(self):
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def on_socket_open(self, client, userdata, sock):
+        self.loop.add_reader(sock, client.loop_read)
+        self.misc_task = self.loop.create_task(self.misc_loop())
+
+    def on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+        if self.misc_task is not None:
+            self.misc_task.cancel()
+
+    def on_socket_register_write(self, client, userdata, sock):
+        # publish may be called from any thread, e.g. a mission loop or a detector
+        self.set_threadsafe(self.loop.add_writer, sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.set_threadsafe(self.loop.remove_writer, sock)
+
+    async def misc_loop(self):
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            try:
+                await asyncio.sleep(MISC_PERIOD)
+            except asyncio.CancelledError:
+                break
+
+
+class EventLoopThread(threading.Thread):
+    '''
+    One event loop for synchronous scripts, e.g. mission loops sleeping in timeHelper.
+    All AsyncMQTTClients created through it share the loop and its single thread,
+    see shared_loop for the one of the process.
+    '''
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.loop = asyncio.new_event_loop()
+        self.start()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def call(self, callback, *args):
+        '''
+        Run a plain function on the loop thread and return its result
+        '''
+        async def wrapper():
+            return callback(*args)
+        return self.submit(wrapper())
+
+    def client(self, ip, port, name="", topics=[], mqtt_client=None):
+        '''
+        Connected AsyncMQTTClient on this loop subscribed to topics
+        '''
+        async def create():
+            client = AsyncMQTTClient(ip, port, name, mqtt_client, self.loop)
+            for topic in topics:
+                client.subscribe(topic)
+            await client.connect()
+            return client
+        return self.submit(create())
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_shared_loop = None
+_shared_loop_lock = threading.Lock()
+
+
+def shared_loop():
+    '''
+    The EventLoopThread of the process, started on first use. Vicon poses, detections and
+    mission events of all MQTT wrappers are received on it.
+    '''
+    global _shared_loop
+    with _shared_loop_lock:
+        if _shared_loop is None:
+            _shared_loop = EventLoopThread()
+        return _shared_loop
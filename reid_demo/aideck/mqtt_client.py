@@ -1,34 +1,36 @@
-from threading import Thread
-import paho.mqtt.client as mqtt
 import json
 
-class MQTTClient(Thread):
-    def __init__(self, ip, port, name, topics = []):
-        Thread.__init__(self)
-        self.client = mqtt.Client(name)
-        self.topics = topics
-        self.client.on_message = self.on_message
-        self.client.on_connect = self.subscribe
-        self.client.connect(ip, port)
+from .mqtt_async import shared_loop
+from .publish_policy import PolicyPublisher
 
+class MQTTClient():
+    '''
+    Detector side MQTT wrapper, messages are received on the shared asyncio MQTT loop of the process
+    '''
+    def __init__(self, ip, port, name, topics = [], mqtt_client=None):
+        self.topics = topics
         self.topic_infos = {}
-
-        self.start()
-
-    def on_message(self, client, userdata, msg):
-        data = json.loads(msg.payload.decode())
-        self.topic_infos[msg.topic] = data
-                
-    def subscribe(self, a, b, c, d):
+        # mqtt_client replaces the paho client, e.g. by a LoopbackClient for offline runs
+        self.loop_thread = shared_loop()
+        self.async_client = self.loop_thread.client(ip, port, name, mqtt_client=mqtt_client)
+        self.loop_thread.call(self.subscribe)
+        self.client = self.async_client.client
+        # QoS, coalescing, rate cap and logging per topic, see publish_policy.POLICIES
+        self.publisher = PolicyPublisher(self.client)
+
+    def subscribe(self):
+        # runs on the loop, messages are decoded with wire_format.decode
         for topic in self.topics:
-            self.client.subscribe(topic, qos=2)
+            self.async_client.subscribe(topic, qos=2)
+            self.async_client.add_listener(topic, lambda timestamp, message, topic=topic: self.on_message(topic, message))
 
-    def publish(self, topic, message, qos=2):
-        print("Published", message, "on", topic)
-        self.client.publish(topic, json.dumps(message),qos=qos)
+    def on_message(self, topic, message):
+        self.topic_infos[topic] = message
 
-    def run(self):
-        self.client.loop_forever()
+    def publish(self, topic, message, qos=2):
+        # bytes are already encoded in the binary wire format
+        payload = message if isinstance(message, bytes) else json.dumps(message)
+        self.publisher.publish(topic, payload, qos=qos)
 
     def get_bb(self, topic):
         if topic not in self.topic_infos:
@@ -38,4 +40,7 @@ class MQTTClient(Thread):
         return res
 
     def close(self):
-        self.client.disconnect()
\ No newline at end of file
+        self.publisher.flush()
+        self.publisher.close()
+        # the loop is shared with the other clients of the process and keeps running
+        self.loop_thread.submit(self.async_client.close())
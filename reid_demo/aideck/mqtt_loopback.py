@@ -0,0 +1,114 @@
+import time
+from collections import defaultdict
+from queue import Queue
+from threading import Event, Lock, Thread
+
+# control packets exchanged between client and broker for one publish per QoS level
+# (PUBLISH / PUBLISH+PUBACK / PUBLISH+PUBREC+PUBREL+PUBCOMP)
+PACKETS_PER_QOS = {0: 1, 1: 2, 2: 4}
+
+
+class LoopbackMessage():
+    def __init__(self, topic, payload, qos, timestamp):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.timestamp = timestamp
+
+
+def topic_matches(subscription, topic):
+    sub_levels, topic_levels = subscription.split("/"), topic.split("/")
+    for i, level in enumerate(sub_levels):
+        if level == "#":
+            return True
+        if i >= len(topic_levels) or (level != "+" and level != topic_levels[i]):
+            return False
+    return len(sub_levels) == len(topic_levels)
+
+
+class LoopbackBroker(Thread):
+    '''
+    In-process stand-in for the MQTT broker. Messages are delivered to the subscribed
+    LoopbackClients on the broker thread, like paho delivers them on its network thread.
+    Records the publish -> delivery latency and the control packets per topic.
+    '''
+    def __init__(self):
+        Thread.__init__(self)
+        self.daemon = True
+        self.queue = Queue()
+        self.lock = Lock()
+        self.subscriptions = []
+        self.latencies = defaultdict(list)
+        self.packets = defaultdict(int)
+        self.published = defaultdict(int)
+        self.start()
+
+    def subscribe(self, client, topic):
+        with self.lock:
+            self.subscriptions.append((topic, client))
+
+    def unsubscribe_all(self, client):
+        with self.lock:
+            self.subscriptions = [(topic, c) for topic, c in self.subscriptions if c is not client]
+
+    def publish(self, topic, payload, qos):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        with self.lock:
+            self.published[topic] += 1
+            self.packets[topic] += PACKETS_PER_QOS[qos]
+        self.queue.put(LoopbackMessage(topic, payload, qos, time.time()))
+
+    def run(self):
+        while True:
+            msg = self.queue.get()
+            with self.lock:
+                clients = [client for topic, client in self.subscriptions if topic_matches(topic, msg.topic)]
+                self.packets[msg.topic] += len(clients) * PACKETS_PER_QOS[msg.qos]
+            for client in clients:
+                client.deliver(msg)
+            with self.lock:
+                self.latencies[msg.topic].append(time.time() - msg.timestamp)
+            self.queue.task_done()
+
+    def flush(self):
+        '''
+        Wait until all published messages were delivered
+        '''
+        self.queue.join()
+
+
+class LoopbackClient():
+    '''
+    Replaces paho.mqtt.client.Client for the MQTT wrappers of this repository, so
+    they can run against a LoopbackBroker without a network or a running broker
+    '''
+    def __init__(self, broker, client_id=""):
+        self.broker = broker
+        self.client_id = client_id
+        self.on_message = None
+        self.on_connect = None
+        self.disconnected = Event()
+
+    def connect(self, host=None, port=None, keepalive=60):
+        if self.on_connect is not None:
+            self.on_connect(self, None, {}, 0)
+        return 0
+
+    def subscribe(self, topic, qos=0):
+        self.broker.subscribe(self, topic)
+        return 0, 0
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.broker.publish(topic, payload, qos)
+
+    def deliver(self, msg):
+        if self.on_message is not None:
+            self.on_message(self, None, msg)
+
+    def loop_forever(self):
+        self.disconnected.wait()
+
+    def disconnect(self):
+        self.broker.unsubscribe_all(self)
+        self.disconnected.set()
@@ -0,0 +1,62 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+
+def create_detection_model(model_config, model_weights, size):
+    '''
+    Load a darknet model for CPU inference with a square input of the given size
+    '''
+    net = cv2.dnn.readNet(model_weights, model_config)
+    net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+    net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    model = cv2.dnn_DetectionModel(net)
+    model.setInputParams(size=(size, size), scale=1/255, swapRB=True, crop=False)
+    return model
+
+
+class MultiScaleDetector():
+    '''
+    Runs the same model at several input sizes on one frame.
+
+    Every scale owns its own network instance, so with parallel=True the blob creation and
+    forward pass of all scales run concurrently on a thread pool (OpenCV releases the GIL
+    during inference) instead of one after the other on a shared net.
+    '''
+    def __init__(self, model_config, model_weights, sizes, parallel=True):
+        self.sizes = list(sizes)
+        self.models = [create_detection_model(model_config, model_weights, size) for size in self.sizes]
+        self.executor = None
+        if parallel and len(self.models) > 1:
+            self.executor = ThreadPoolExecutor(max_workers=len(self.models), thread_name_prefix="multiscale")
+        # seconds of the last call per stage: "scale_<size>" for every scale and "total"
+        self.timings = {}
+
+    def _detect(self, model, frame, conf, nms):
+        start_time = time.perf_counter()
+        classes, scores, boxes = model.detect(frame, conf, nms)
+        return classes, scores, boxes, time.perf_counter() - start_time
+
+    def detect(self, frame, conf, nms):
+        '''
+        Detect on all scales
+
+        returns: list of (classes, scores, boxes) in the order of sizes
+        '''
+        start_time = time.perf_counter()
+        if self.executor is not None:
+            futures = [self.executor.submit(self._detect, model, frame, conf, nms) for model in self.models]
+            results = [future.result() for future in futures]
+        else:
+            results = [self._detect(model, frame, conf, nms) for model in self.models]
+
+        for size, result in zip(self.sizes, results):
+            self.timings["scale_{}".format(size)] = result[3]
+        self.timings["total"] = time.perf_counter() - start_time
+        return [result[:3] for result in results]
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
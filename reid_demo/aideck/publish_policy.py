@@ -0,0 +1,125 @@
+import time
+from fnmatch import fnmatch
+from threading import Condition, Thread
+
+
+class PublishPolicy():
+    '''
+    qos: QoS level of the topic, None keeps the level the caller asked for
+    coalesce: only the newest unsent message is transmitted, older ones are replaced
+    max_rate: Hz, upper bound for coalesced topics, None sends as fast as possible
+    log: print every published message
+    '''
+    def __init__(self, qos=None, coalesce=False, max_rate=None, log=True):
+        self.qos = qos
+        self.coalesce = coalesce
+        self.max_rate = max_rate
+        self.log = log
+
+
+# detections are superseded by the next frame: QoS 0, newest only, no logging.
+# Mission events are published once and must arrive.
+POLICIES = {
+    "pallet_bb": PublishPolicy(qos=0, coalesce=True, max_rate=30, log=False),
+    "palletBlock_bb": PublishPolicy(qos=0, coalesce=True, max_rate=30, log=False),
+    "*_true_bb": PublishPolicy(qos=0, coalesce=True, max_rate=10, log=False),
+    "*_continue": PublishPolicy(qos=2),
+    "detection_demand": PublishPolicy(qos=0, log=False),
+    "flight_time": PublishPolicy(qos=2),
+}
+DEFAULT_POLICY = PublishPolicy()
+
+
+def get_policy(topic, policies=POLICIES):
+    if topic in policies:
+        return policies[topic]
+    for pattern, policy in policies.items():
+        if fnmatch(topic, pattern):
+            return policy
+    return DEFAULT_POLICY
+
+
+class PolicyPublisher(Thread):
+    '''
+    Publishes through a paho like client following the policy of each topic. Messages within
+    the rate cap are published right away, coalesced messages above it are handed to this
+    thread, which sends the newest payload as soon as the rate cap of the topic allows it.
+    '''
+    def __init__(self, client, policies=POLICIES):
+        Thread.__init__(self)
+        self.daemon = True
+        self.client = client
+        self.policies = policies
+        # resolved policy per topic, the patterns are only matched once
+        self.topic_policies = {}
+        self.condition = Condition()
+        self.pending = {}
+        self.next_send = {}
+        self.sent = 0
+        self.coalesced = 0
+        self.cpu_time = 0
+        self.running = True
+        self.start()
+
+    def publish(self, topic, payload, qos=2):
+        policy = self.topic_policies.get(topic)
+        if policy is None:
+            policy = self.topic_policies[topic] = get_policy(topic, self.policies)
+        qos = policy.qos if policy.qos is not None else qos
+        if policy.log:
+            print("Published", payload, "on", topic)
+        if not policy.coalesce:
+            self.client.publish(topic, payload, qos=qos)
+            self.sent += 1
+            return
+        now = time.time()
+        with self.condition:
+            if topic in self.pending:
+                # the sender already waits for this topic, just replace the payload
+                self.coalesced += 1
+                self.pending[topic] = (payload, qos)
+                return
+            if self.next_send.get(topic, 0) > now:
+                # rate cap reached, the sender transmits the newest payload once it is allowed
+                self.pending[topic] = (payload, qos)
+                self.condition.notify()
+                return
+            self.reserve(topic, policy, now)
+        # within the rate cap the message is sent right away without waking the sender
+        self.client.publish(topic, payload, qos=qos)
+        self.sent += 1
+
+    def reserve(self, topic, policy, now):
+        if policy.max_rate is not None:
+            self.next_send[topic] = now + 1.0 / policy.max_rate
+
+    def run(self):
+        cpu_start = time.thread_time()
+        while self.running:
+            with self.condition:
+                now = time.time()
+                due = [topic for topic in self.pending if self.next_send.get(topic, 0) <= now]
+                if len(due) == 0:
+                    wait_time = min((self.next_send[topic] - now for topic in self.pending), default=None)
+                    self.condition.wait(wait_time)
+                    continue
+                messages = [(topic, self.pending.pop(topic)) for topic in due]
+                for topic in due:
+                    self.reserve(topic, self.topic_policies[topic], now)
+            for topic, (payload, qos) in messages:
+                self.client.publish(topic, payload, qos=qos)
+                self.sent += 1
+            self.cpu_time = time.thread_time() - cpu_start
+
+    def flush(self, timeout=1.0):
+        '''
+        Wait until all pending messages were sent
+        '''
+        deadline = time.time() + timeout
+        while len(self.pending) > 0 and time.time() < deadline:
+            time.sleep(0.005)
+
+    def close(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify()
@@ -0,0 +1,89 @@
+import glob
+import os
+import time
+from pathlib import Path
+
+import cv2
+
+
+def list_recording(folder):
+    '''
+    Images of a recordings/recording_* folder sorted by the time stamp in their file name
+
+    returns: list of (timestamp, path)
+    '''
+    frames = []
+    for path in glob.glob(os.path.join(folder, "*.jpg")):
+        try:
+            frames.append((float(Path(path).stem), path))
+        except ValueError:
+            continue
+    return sorted(frames)
+
+
+class ReplaySource():
+    '''
+    Plays a recording folder back like a cv2.VideoCapture, so it can be passed to the
+    Detector as video device.
+
+    With realtime=True the frames are released at their original time stamps, frames
+    the consumer was too slow for are skipped and counted as dropped. Otherwise every
+    frame is returned as fast as the consumer reads.
+    '''
+    def __init__(self, folder, realtime=False, fps=20):
+        self.frames = list_recording(folder)
+        if len(self.frames) == 0:
+            raise FileNotFoundError("No images found in {}".format(folder))
+        self.realtime = realtime
+        self.fps = fps
+        self.index = 0
+        self.dropped = 0
+        self.read_count = 0
+        self.last_timestamp = None
+        self.start_time = None
+
+        first = cv2.imread(self.frames[0][1])
+        self.height, self.width = first.shape[:2]
+
+    def read(self):
+        if self.index >= len(self.frames):
+            return False, None
+
+        if self.realtime:
+            if self.start_time is None:
+                self.start_time = time.time()
+            elapsed = time.time() - self.start_time
+            first_timestamp = self.frames[0][0]
+            # skip all frames which were already replaced by a newer one
+            while self.index + 1 < len(self.frames) and self.frames[self.index + 1][0] - first_timestamp <= elapsed:
+                self.index += 1
+                self.dropped += 1
+            delay = self.frames[self.index][0] - first_timestamp - elapsed
+            if delay > 0:
+                time.sleep(delay)
+
+        timestamp, path = self.frames[self.index]
+        self.index += 1
+        frame = cv2.imread(path)
+        if frame is None:
+            return False, None
+        self.read_count += 1
+        self.last_timestamp = timestamp
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return len(self.frames)
+        return 0
+
+    def isOpened(self):
+        return self.index < len(self.frames)
+
+    def release(self):
+        self.index = len(self.frames)
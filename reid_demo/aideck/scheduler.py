@@ -0,0 +1,51 @@
+import time
+
+DEMAND_TOPIC = "detection_demand"
+IDLE_RATE = 2.0 # Hz, inference rate far from a decision point
+LEAD_TIME = 0.4 # seconds before the decision point to return to full rate
+DEMAND_TIMEOUT = 15.0 # seconds without demand before falling back to full rate
+
+PALLET_PHASES = ["PALLET"]
+BLOCK_PHASES = ["BLOCK_SEARCH", "BLOCK"]
+
+
+class InferenceScheduler():
+    '''
+    Decides per frame whether the detector runs inference, based on the demand the mission
+    loop publishes on DEMAND_TOPIC: {"need_at": time stamp of the next decision, "phase": mode name}.
+
+    The detector runs at full rate from LEAD_TIME before need_at until the next demand arrives
+    and at IDLE_RATE while the drone is still flying or the phase does not use this detector.
+    Without a recent demand it always runs at full rate.
+    '''
+    def __init__(self, phases, idle_rate=IDLE_RATE, lead_time=LEAD_TIME, demand_timeout=DEMAND_TIMEOUT):
+        self.phases = phases
+        self.idle_period = 1.0 / idle_rate
+        self.lead_time = lead_time
+        self.demand_timeout = demand_timeout
+
+        self.need_at = None
+        self.phase = None
+        self.demand_time = None
+        self.last_run = 0
+        self.skipped = 0
+
+    def update(self, demand):
+        self.need_at = demand.get("need_at")
+        self.phase = demand.get("phase")
+        self.demand_time = time.time()
+
+    def full_rate(self, now):
+        if self.demand_time is None or now - self.demand_time > self.demand_timeout:
+            return True
+        if self.phase not in self.phases or self.need_at is None:
+            return False
+        return now >= self.need_at - self.lead_time
+
+    def should_run(self, now=None):
+        now = time.time() if now is None else now
+        if self.full_rate(now) or now - self.last_run >= self.idle_period:
+            self.last_run = now
+            return True
+        self.skipped += 1
+        return False
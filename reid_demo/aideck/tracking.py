@@ -0,0 +1,140 @@
+import cv2
+import numpy as np
+
+REDETECT_INTERVAL = 5 # frames between two full detections
+MIN_CONFIDENCE = 0.6 # share of features which have to be tracked successfully
+MIN_POINTS = 4
+IOU_THRESHOLD = 0.3
+MAX_CORNERS = 20
+
+LK_PARAMS = dict(winSize=(15, 15), maxLevel=2, criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+
+def iou(box_a, box_b):
+    '''
+    Intersection over union of two [x, y, w, h] boxes
+    '''
+    x1 = max(box_a[0], box_b[0])
+    y1 = max(box_a[1], box_b[1])
+    x2 = min(box_a[0] + box_a[2], box_b[0] + box_b[2])
+    y2 = min(box_a[1] + box_a[3], box_b[1] + box_b[3])
+    intersection = max(0, x2 - x1) * max(0, y2 - y1)
+    union = box_a[2] * box_a[3] + box_b[2] * box_b[3] - intersection
+    return intersection / union if union > 0 else 0
+
+
+class Track():
+    def __init__(self, track_id, box_result):
+        self.id = track_id
+        # [x, y, w, h, score] as float
+        self.box = [float(el) for el in box_result]
+        self.points = None
+        self.confidence = 1.0
+
+    def init_points(self, gray):
+        x, y, w, h = (int(round(el)) for el in self.box[:4])
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, gray.shape[1]), min(y + h, gray.shape[0])
+        self.points = None
+        if x1 - x0 < 3 or y1 - y0 < 3:
+            return
+        points = cv2.goodFeaturesToTrack(gray[y0:y1, x0:x1], maxCorners=MAX_CORNERS, qualityLevel=0.01, minDistance=3)
+        if points is not None:
+            self.points = (points + np.array([x0, y0], dtype=np.float32)).astype(np.float32)
+
+
+class DetectTrackPipeline():
+    '''
+    Detect-then-track: a full detection seeds one sparse optical flow tracker per box,
+    which follows the box over the next frames. A full detection is requested again after
+    redetect_interval frames or as soon as a tracker loses its features. Tracks are matched
+    to new detections by IoU, so the same block keeps its track id.
+
+    Usage per frame: if needs_detection(): update(frame, box_results) else: track(frame)
+    '''
+    def __init__(self, redetect_interval=REDETECT_INTERVAL, min_confidence=MIN_CONFIDENCE, iou_threshold=IOU_THRESHOLD):
+        self.redetect_interval = redetect_interval
+        self.min_confidence = min_confidence
+        self.iou_threshold = iou_threshold
+
+        self.tracks = []
+        self.next_id = 0
+        self.prev_gray = None
+        self.frames_since_detection = 0
+        self.lost = True
+
+    def needs_detection(self):
+        return self.lost or self.prev_gray is None or self.frames_since_detection >= self.redetect_interval
+
+    def update(self, frame, box_results):
+        '''
+        Feed a full detection, returns the tracks as list of (track id, [x, y, w, h, score])
+        '''
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        box_results = box_results if box_results is not None else []
+
+        # greedy IoU matching of the detections to the existing tracks
+        candidates = sorted(((iou(track.box, box), t, b) for t, track in enumerate(self.tracks) for b, box in enumerate(box_results)), reverse=True)
+        matched_tracks, matched_boxes = {}, set()
+        for overlap, t, b in candidates:
+            if overlap < self.iou_threshold:
+                break
+            if t in matched_tracks or b in matched_boxes:
+                continue
+            matched_tracks[t] = b
+            matched_boxes.add(b)
+
+        track_of_box = {b: self.tracks[t].id for t, b in matched_tracks.items()}
+        tracks = []
+        for b, box in enumerate(box_results):
+            if b in track_of_box:
+                track = Track(track_of_box[b], box)
+            else:
+                track = Track(self.next_id, box)
+                self.next_id += 1
+            track.init_points(gray)
+            tracks.append(track)
+
+        self.tracks = tracks
+        self.prev_gray = gray
+        self.frames_since_detection = 0
+        # nothing to track, keep detecting on every frame
+        self.lost = len(self.tracks) == 0
+        return self.results()
+
+    def track(self, frame):
+        '''
+        Follow the tracks into the given frame without running the detector
+        '''
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.frames_since_detection += 1
+
+        tracked = [track for track in self.tracks if track.points is not None]
+        if len(tracked) < len(self.tracks):
+            self.lost = True
+        if len(tracked) > 0:
+            # one optical flow call for the features of all tracks
+            points = np.concatenate([track.points for track in tracked])
+            new_points, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, points, None, **LK_PARAMS)
+            status = status.reshape(-1).astype(bool)
+            start = 0
+            for track in tracked:
+                end = start + len(track.points)
+                good = status[start:end]
+                track.confidence = float(np.mean(good))
+                if np.count_nonzero(good) < MIN_POINTS or track.confidence < self.min_confidence:
+                    self.lost = True
+                if np.count_nonzero(good) > 0:
+                    shift = np.median(new_points[start:end][good] - track.points[good], axis=0).reshape(-1)
+                    track.box[0] += float(shift[0])
+                    track.box[1] += float(shift[1])
+                    track.points = new_points[start:end][good].reshape(-1, 1, 2)
+                else:
+                    track.points = None
+                start = end
+
+        self.prev_gray = gray
+        return self.results()
+
+    def results(self):
+        return [(track.id, track.box) for track in self.tracks]
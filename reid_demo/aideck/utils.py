@@ -17,6 +17,9 @@ def colorBalance(img):
     print("Factors: {}".format(factor))
     return img_out, factor
 
+# lookup tables of colorCorrectBayer by factors
+_color_luts = {}
+
 def colorCorrectBayer(img_, factors=[1,1,1]):
     '''
     Color correction for the RGB Camera. It has a sensor with a Bayer pattern, which has
@@ -25,10 +28,41 @@ def colorCorrectBayer(img_, factors=[1,1,1]):
     '''
     # TODO: Apply an actual color correction without luminosity loss. -> histogram level
     # This is just an approximation
-    img = img_.copy()
+    key = tuple(factors)
+    if key not in _color_luts:
+        _color_luts[key] = createColorLUT(factors)
+    return applyColorLUT(img_, _color_luts[key])
+
+def createColorLUT(factors=[1,1,1], rgb=False):
+    '''
+    Precompute the per channel lookup table of colorCorrectBayer for fixed factors.
+    The factors are given in BGR order, rgb=True creates the table for RGB images.
+
+    returns: uint8 array of shape (1, 256, 3) as used by cv2.LUT
+    '''
+    values = np.arange(256, dtype=np.float64)
+    lut = np.empty((1, 256, 3), dtype=np.uint8)
     for i in range(3):
-        img[:,:,i] = np.clip(img[:,:,i]*factors[i],0,255)
-    return img
+        lut[0,:,i] = np.clip(values*factors[i],0,255)
+    if rgb:
+        lut = np.ascontiguousarray(lut[:,:,::-1])
+    return lut
+
+def applyColorLUT(img, lut, out=None):
+    '''
+    Color correct a 3 channel uint8 image with a table from createColorLUT in a single pass.
+    Pass out=img to correct the image in place.
+    '''
+    return cv2.LUT(img, lut, dst=out)
+
+def demosaicColorCorrect(bayer_img, lut, out=None, rgb=False):
+    '''
+    Demosaic a Bayer image and color correct it, replaces the chain
+    BayerBG2BGR -> colorCorrectBayer -> BGR2RGB. The lut has to be created with the same rgb flag.
+    '''
+    code = cv2.COLOR_BayerBG2RGB if rgb else cv2.COLOR_BayerBG2BGR
+    out = cv2.cvtColor(bayer_img, code, dst=out)
+    return cv2.LUT(out, lut, dst=out)
 
 def rx_bytes(size, client_socket):
     '''
@@ -39,6 +73,33 @@ def rx_bytes(size, client_socket):
         data.extend(client_socket.recv(size-len(data)))
     return data
 
+def rx_bytes_into(view, client_socket):
+    '''
+    Read len(view) bytes from the socket directly into the given memoryview
+    '''
+    size = len(view)
+    received = 0
+    while received < size:
+        count = client_socket.recv_into(view[received:], size-received)
+        if count == 0:
+            raise ConnectionError("Socket was closed by the AI-deck")
+        received += count
+    return view
+
+def rx_bytes_scatter(views, client_socket):
+    '''
+    Fill all given memoryviews in order from the socket, using one recvmsg_into call per read
+    '''
+    views = list(views)
+    while views:
+        count = client_socket.recvmsg_into(views)[0]
+        if count == 0:
+            raise ConnectionError("Socket was closed by the AI-deck")
+        while views and count >= len(views[0]):
+            count -= len(views.pop(0))
+        if count > 0:
+            views[0] = views[0][count:]
+
 def draw_scan_area(resized):
     color = [40, 220, 50]
     left_dist=0.1
@@ -88,20 +149,60 @@ def draw_crosshair(image, box, length=10, color=[40, 220, 50]):
     return image
 
 def detect_box(resized, model, conf, nms, color=(0, 225, 0)):
-    class_names = ['palletblock']
     classes, scores, boxes = model.detect(resized, conf, nms)
-    box_results = []
-    if len(boxes) > 0:
-        for (classid, score, box) in zip(classes, scores, boxes):
-            resized = draw_filled_rect(resized, box, str(round(100*score)), rect_color=color)
-            resized = draw_crosshair(resized, box)
-            box_results.append([*box, score*100])
-        # draw chosen bb
-        box = choose_most_left_bb(box_results)
-        resized = draw_crosshair(resized, box, color=[168, 50, 70])
-        return box_results, resized
-    else:
+    return draw_box_results(resized, classes, scores, boxes, color)
+
+def draw_box_results(resized, classes, scores, boxes, color=(0, 225, 0)):
+    """
+        Draw the output of a DetectionModel and convert it to [x, y, w, h, score] results
+    """
+    box_results = to_box_results(classes, scores, boxes)
+    if box_results is None:
         return None, resized
+    return box_results, draw_results(resized, box_results, color)
+
+def to_box_results(classes, scores, boxes):
+    """
+        Convert the output of a DetectionModel to [x, y, w, h, score] results without drawing
+    """
+    if len(boxes) == 0:
+        return None
+    return [[*box, score*100] for score, box in zip(scores, boxes)]
+
+def draw_results(resized, box_results, color=(0, 225, 0)):
+    """
+        args:
+            box_results : list of [x, y, w, h, score] as returned by to_box_results
+    """
+    return draw_overlay(resized, box_results, choose_most_left_bb(box_results), color)
+
+def draw_overlay(img, box_results, target_box=None, rect_color=(0, 225, 0), text_color=[10, 220, 10], alpha=0.05, fill=False):
+    """
+        Draw all boxes with score label and crosshair plus the crosshair of the chosen target
+        in a single pass onto img (in place). With fill=True every box area is alpha blended
+        with rect_color, the blending is restricted to the box ROIs.
+
+        args:
+            box_results : list of [x, y, w, h, score]
+            target_box : tuple(int, int, int, int) or None
+    """
+    height, width = img.shape[:2]
+    for box_result in box_results:
+        box = tuple(int(el) for el in box_result[:4])
+        if fill:
+            x0, y0 = max(box[0], 0), max(box[1], 0)
+            x1, y1 = min(box[0] + box[2], width), min(box[1] + box[3], height)
+            if x1 > x0 and y1 > y0:
+                roi = img[y0:y1, x0:x1]
+                color_roi = np.empty_like(roi)
+                color_roi[:] = rect_color
+                cv2.addWeighted(color_roi, alpha, roi, 1 - alpha, 0, dst=roi)
+        cv2.rectangle(img, box, color=rect_color, thickness=3)
+        cv2.putText(img, str(round(box_result[4])) + "%", (box[0] + box[2], box[1]), cv2.FONT_HERSHEY_SIMPLEX, 0.7, text_color, 3)
+        draw_crosshair(img, box)
+    if target_box is not None:
+        draw_crosshair(img, target_box, color=[168, 50, 70])
+    return img
     
 def draw_filled_rect(img_original, box, label, rect_color=(0, 225, 0), text_color=[10, 220, 10], alpha=0.05):
     img_rect_filled = img_original.copy()
@@ -139,7 +240,7 @@ def choose_middle_bb(pallet_offsets):
     if pallet_offsets is None:
         return None
     
-    offsets = [offset_x for offset_x, _, _, _, _ in pallet_offsets]
+    offsets = [offset_x for offset_x, _, _, _, _, *_ in pallet_offsets]
     offsets = sorted(offsets)
 
     return offsets[len(offsets) // 2]
@@ -149,7 +250,7 @@ def choose_closest_bb(pallet_offsets):
         return None
 
     best_bb, best_bb_score = None, 1000
-    for offset_x, offset_y, area, center_x, center_y in pallet_offsets:
+    for offset_x, offset_y, area, center_x, center_y, *_ in pallet_offsets:
         score = abs(offset_x)
         if score < best_bb_score:
             best_bb = (offset_x, offset_y, area, center_x, center_y)
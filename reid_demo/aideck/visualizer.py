@@ -0,0 +1,64 @@
+import time
+from threading import Thread
+
+import cv2
+
+from . import utils
+from .frame_queue import LatestFrameQueue
+
+SCALE_COLORS = [(0, 225, 0), (255, 0, 0)]
+
+
+class DetectionVisualizer(Thread):
+    '''
+    Renders the overlays of a headless Detector on its own thread at a reduced rate.
+    Frames are only copied when a render is due, all others are skipped right at submit.
+    '''
+    def __init__(self, window_name, rate=5.0, on_quit=None):
+        Thread.__init__(self)
+        self.daemon = True
+        self.window_name = window_name
+        self.period = 1.0 / rate
+        self.on_quit = on_quit
+        self.queue = LatestFrameQueue()
+        self.next_render_time = 0
+        self.rendered = 0
+        self.running = True
+        self.start()
+
+    def submit(self, frame, box_results):
+        '''
+        Hand over a frame with its detections per scale, returns False if it was skipped
+        '''
+        now = time.time()
+        if now < self.next_render_time:
+            return False
+        self.next_render_time = now + self.period
+        # the detector's frame may live in shared memory, draw on a private copy
+        self.queue.put((frame.copy(), box_results))
+        return True
+
+    def render(self, frame, box_results):
+        frame = utils.draw_crosshair(frame, (0,0,frame.shape[1], frame.shape[0]), length=20)
+        for results, color in zip(box_results, SCALE_COLORS):
+            if results is not None:
+                frame = utils.draw_results(frame, results, color)
+        return frame
+
+    def run(self):
+        while self.running:
+            item = self.queue.get(timeout=self.period)
+            if item is not None:
+                cv2.imshow(self.window_name, self.render(*item))
+                self.rendered += 1
+            k = cv2.waitKey(1)
+            if k == ord('q'):
+                self.running = False
+                if self.on_quit is not None:
+                    self.on_quit()
+        if self.rendered > 0:
+            cv2.destroyWindow(self.window_name)
+
+    def stop(self):
+        self.running = False
+        self.queue.close()
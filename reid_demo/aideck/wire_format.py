@@ -0,0 +1,86 @@
+import json
+import struct
+import time
+
+import numpy as np
+
+# Binary encoding of the detection and pose topics
+#   header <BBBBIdH: magic, version, kind, columns, seq, timestamp, rows
+#   body: rows x columns values, int32 for bounding boxes, float64 for poses
+# Payloads not starting with MAGIC are decoded as JSON, so publishers can be switched one by one.
+
+MAGIC = 0xB7 # never the first byte of a JSON document
+VERSION = 1
+HEADER = struct.Struct("<BBBBIdH")
+
+KIND_OFFSETS = 1 # pallet_bb, palletBlock_bb: [[offset_x, offset_y, area, center_x, center_y(, track_id)], ...]
+KIND_TRUE_BB = 2 # *_true_bb: {"type": "bb", "content": [[x, y, w, h, score], ...]}
+KIND_POSITION = 3 # Vicon position [x, y, z]
+KIND_ROTATION = 4 # Vicon rotation matrix [[...], [...], [...]]
+
+DTYPES = {
+    KIND_OFFSETS: np.dtype("<i4"),
+    KIND_TRUE_BB: np.dtype("<i4"),
+    KIND_POSITION: np.dtype("<f8"),
+    KIND_ROTATION: np.dtype("<f8"),
+}
+
+
+def encode(kind, rows, seq=0, timestamp=None):
+    '''
+    rows: 2d array like, for KIND_POSITION a flat vector
+    '''
+    values = np.asarray(rows, dtype=DTYPES[kind])
+    if values.ndim == 1:
+        values = values.reshape(1, -1)
+    if values.size == 0:
+        values = values.reshape(0, 0)
+    timestamp = time.time() if timestamp is None else timestamp
+    return HEADER.pack(MAGIC, VERSION, kind, values.shape[1], seq & 0xFFFFFFFF, timestamp, values.shape[0]) + values.tobytes()
+
+
+def encode_offsets(offsets, seq=0, timestamp=None):
+    return encode(KIND_OFFSETS, offsets, seq, timestamp)
+
+
+def encode_true_bb(bbs, seq=0, timestamp=None):
+    return encode(KIND_TRUE_BB, bbs, seq, timestamp)
+
+
+def encode_position(position, seq=0, timestamp=None):
+    return encode(KIND_POSITION, position, seq, timestamp)
+
+
+def encode_rotation(rotation, seq=0, timestamp=None):
+    return encode(KIND_ROTATION, rotation, seq, timestamp)
+
+
+def is_binary(payload):
+    return len(payload) >= HEADER.size and payload[0] == MAGIC
+
+
+def decode_message(payload):
+    '''
+    returns: (data, seq, timestamp), seq and timestamp are None for JSON payloads
+    '''
+    if not is_binary(payload):
+        if isinstance(payload, (bytes, bytearray)):
+            payload = payload.decode()
+        return json.loads(payload), None, None
+
+    _, version, kind, columns, seq, timestamp, count = HEADER.unpack_from(payload)
+    if version != VERSION or kind not in DTYPES:
+        raise ValueError("Unsupported wire format version {} kind {}".format(version, kind))
+    values = np.frombuffer(payload, dtype=DTYPES[kind], count=count * columns, offset=HEADER.size).reshape(count, columns)
+
+    if kind == KIND_POSITION:
+        data = values.reshape(-1).tolist()
+    elif kind == KIND_TRUE_BB:
+        data = {"type": "bb", "content": values.tolist()}
+    else:
+        data = values.tolist()
+    return data, seq, timestamp
+
+
+def decode(payload):
+    return decode_message(payload)[0]
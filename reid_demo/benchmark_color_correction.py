@@ -0,0 +1,51 @@
+import argparse
+import timeit
+
+import cv2
+import numpy as np
+
+from aideck import utils
+
+FACTORS = [1.8648577393897736, 1.2606252586922309, 1.4528872589128194]
+
+
+def legacy_color_correct(img_, factors):
+    '''
+    colorCorrectBayer before the lookup table
+    '''
+    img = img_.copy()
+    for i in range(3):
+        img[:,:,i] = np.clip(img[:,:,i]*factors[i],0,255)
+    return img
+
+
+def legacy_chain(bayer_img):
+    img = cv2.cvtColor(bayer_img, cv2.COLOR_BayerBG2BGR)
+    img = legacy_color_correct(img, FACTORS)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the color correction implementations on AI-deck sized frames")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    bayer_img = np.random.default_rng(0).integers(0, 256, (244, 324), dtype=np.uint8)
+    color_img = cv2.cvtColor(bayer_img, cv2.COLOR_BayerBG2BGR)
+    lut = utils.createColorLUT(FACTORS)
+    rgb_lut = utils.createColorLUT(FACTORS, rgb=True)
+    out = np.empty_like(color_img)
+
+    assert np.array_equal(legacy_color_correct(color_img, FACTORS), utils.applyColorLUT(color_img, lut))
+    assert np.array_equal(legacy_chain(bayer_img), utils.demosaicColorCorrect(bayer_img, rgb_lut, rgb=True))
+
+    cases = [
+        ("legacy colorCorrectBayer", lambda: legacy_color_correct(color_img, FACTORS)),
+        ("colorCorrectBayer (LUT)", lambda: utils.colorCorrectBayer(color_img, FACTORS)),
+        ("applyColorLUT out=", lambda: utils.applyColorLUT(color_img, lut, out=out)),
+        ("legacy demosaic+correct+RGB", lambda: legacy_chain(bayer_img)),
+        ("demosaicColorCorrect out=", lambda: utils.demosaicColorCorrect(bayer_img, rgb_lut, out=out, rgb=True)),
+    ]
+    for name, case in cases:
+        seconds = min(timeit.repeat(case, number=args.repeat, repeat=3)) / args.repeat
+        print("{:>30}: {:8.1f} us/frame".format(name, seconds * 1e6))
@@ -0,0 +1,58 @@
+import argparse
+import time
+
+import numpy as np
+
+from aideck.fake_aideck import FakeAIDeck
+from aideck.ImageConnector import Connector
+
+
+class LoadedConnector(Connector):
+    '''
+    Connector with an artificial processing load which measures the true frame age,
+    i.e. publish time - send time stamped into the image by the fake AI-deck
+    '''
+    def __init__(self, load, **kwargs):
+        self.load = load
+        self.true_ages = []
+        Connector.__init__(self, **kwargs)
+
+    def getImage(self, client_socket):
+        frmt, imgs = Connector.getImage(self, client_socket)
+        if imgs is not None:
+            # carry the send stamp over to the demosaiced image
+            imgs[-1].reshape(-1)[:8] = imgs[0].reshape(-1)[:8]
+        return frmt, imgs
+
+    def process_image(self, img, capture_time):
+        sent_time = img.reshape(-1)[:8].view(np.float64)[0]
+        time.sleep(self.load)
+        Connector.process_image(self, img, capture_time)
+        self.true_ages.append(time.time() - sent_time)
+
+
+def run(pipelined, frames, fps, load):
+    fake = FakeAIDeck(frames=frames, fps=fps, stamp=True)
+    fake.start()
+    connector = LoadedConnector(load, ip=fake.address[0], port=fake.address[1], device_numbers=[], pipelined=pipelined, frame_bus_name=None)
+    fake.join()
+    # give the connector time to work off its backlog
+    time.sleep(1.0)
+    connector.running = False
+
+    ages = np.array(connector.true_ages) * 1000
+    stats = connector.frame_age_stats() or {"dropped": 0}
+    return len(ages), stats["dropped"], np.percentile(ages, 50), np.percentile(ages, 95), np.max(ages), ages[-10:].mean()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Frame age of the serial vs. pipelined Connector under processing load")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--fps", type=float, default=20)
+    parser.add_argument("--load", type=float, default=0.03, help="additional processing time per frame in seconds")
+    args = parser.parse_args()
+
+    for pipelined in [False, True]:
+        published, dropped, p50, p95, max_age, last_age = run(pipelined, args.frames, args.fps, args.load)
+        print("{:>9}: published {:4d}, dropped {:4d}, age p50 {:7.1f} ms, p95 {:7.1f} ms, max {:7.1f} ms, last 10 {:7.1f} ms".format(
+            "pipelined" if pipelined else "serial", published, dropped, p50, p95, max_age, last_age))
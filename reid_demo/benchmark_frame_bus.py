@@ -0,0 +1,75 @@
+import argparse
+import time
+from multiprocessing import Process, Queue
+
+import numpy as np
+
+from aideck.frame_bus import FrameBusPublisher, FrameBusSubscriber, HEIGHT, WIDTH
+
+BUS_NAME = "aideck_frames_benchmark"
+
+
+def produce(frames, fps):
+    '''
+    Synthetic Connector: publishes frames carrying their sequence number in the first pixels
+    '''
+    bus = FrameBusPublisher(BUS_NAME, shape=(HEIGHT, WIDTH, 3))
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    # give the subscribers time to attach
+    time.sleep(1.0)
+    start_time = time.time()
+    for i in range(1, frames + 1):
+        delay = start_time + i / fps - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        frame = bus.next_frame()
+        frame[:] = noise
+        frame.reshape(-1)[:8] = np.frombuffer(np.int64(i).tobytes(), dtype=np.uint8)
+        bus.commit()
+    time.sleep(1.0)
+    bus.close()
+
+
+def consume(name, results):
+    # wait for the producer to create the bus
+    while True:
+        try:
+            bus = FrameBusSubscriber(BUS_NAME, timeout=2.0)
+            break
+        except FileNotFoundError:
+            time.sleep(0.05)
+    latencies, corrupt = [], 0
+    while True:
+        ret, frame = bus.read()
+        if not ret:
+            break
+        latencies.append(time.time() - bus.last_timestamp)
+        if frame.reshape(-1)[:8].view(np.int64)[0] != bus.last_seq:
+            corrupt += 1
+    received = len(latencies)
+    results.put((name, received, bus.missed, corrupt, np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000))
+    bus.release()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic producer feeding several frame bus subscribers")
+    parser.add_argument("--frames", type=int, default=400)
+    parser.add_argument("--fps", type=float, default=60)
+    parser.add_argument("--subscribers", type=int, default=2)
+    args = parser.parse_args()
+
+    results = Queue()
+    consumers = [Process(target=consume, args=("subscriber {}".format(i), results)) for i in range(args.subscribers)]
+    for consumer in consumers:
+        consumer.start()
+    producer = Process(target=produce, args=(args.frames, args.fps))
+    producer.start()
+
+    for _ in consumers:
+        name, received, missed, corrupt, p50, p99 = results.get()
+        print("{}: received {}/{} frames, missed {}, corrupt {}, latency p50 {:.2f} ms, p99 {:.2f} ms".format(
+            name, received, args.frames, missed, corrupt, p50, p99))
+    producer.join()
+    for consumer in consumers:
+        consumer.join()
@@ -0,0 +1,84 @@
+import argparse
+import socket
+import struct
+import time
+import tracemalloc
+from multiprocessing import Process
+
+import numpy as np
+
+from aideck import utils
+from aideck.fake_aideck import FakeAIDeck
+from aideck.frame_receiver import FrameReceiver
+
+
+def legacy_receive(client_socket):
+    '''
+    Receive path as used by Connector.getImage before the FrameReceiver
+    '''
+    packetInfoRaw = utils.rx_bytes(4, client_socket)
+    [length, routing, function] = struct.unpack('<HBB', packetInfoRaw)
+    imgHeader = utils.rx_bytes(length - 2, client_socket)
+    [magic, width, height, depth, format, size] = struct.unpack('<BHHBBI', imgHeader)
+
+    imgStream = bytearray()
+    while len(imgStream) < size:
+        packetInfoRaw = utils.rx_bytes(4, client_socket)
+        [length, dst, src] = struct.unpack('<HBB', packetInfoRaw)
+        chunk = utils.rx_bytes(length - 2, client_socket)
+        imgStream.extend(chunk)
+
+    bayer_img = np.frombuffer(imgStream, dtype=np.uint8)
+    bayer_img.shape = (height, width)
+    return bayer_img
+
+
+def ring_receive(receiver):
+    format, width, height, frame = receiver.receive()
+    return frame.reshape((height, width))
+
+
+def run(name, frames, trace):
+    # the fake AI-deck runs in its own process so its CPU time is not accounted to the receiver
+    fake = FakeAIDeck(frames=frames)
+    server = Process(target=fake.run)
+    server.start()
+
+    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    client_socket.connect(fake.address)
+    receiver = FrameReceiver(client_socket)
+
+    if trace:
+        tracemalloc.start()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    peak = 0
+    for _ in range(frames):
+        if trace:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        if name == "legacy":
+            img = legacy_receive(client_socket)
+        else:
+            img = ring_receive(receiver)
+        if trace:
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+        assert np.array_equal(img.ravel(), np.frombuffer(fake.image, dtype=np.uint8))
+    wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+    if trace:
+        tracemalloc.stop()
+
+    client_socket.close()
+    server.join()
+    return wall / frames, cpu / frames, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the legacy AI-deck receive path against the FrameReceiver ring")
+    parser.add_argument("--frames", type=int, default=500)
+    args = parser.parse_args()
+
+    for name in ["legacy", "ring"]:
+        wall, cpu, _ = run(name, args.frames, trace=False)
+        _, _, peak = run(name, min(args.frames, 50), trace=True)
+        print("{:>6}: {:7.3f} ms wall/frame, {:7.3f} ms CPU/frame, {:8d} B peak allocation/frame".format(
+            name, wall * 1000, cpu * 1000, peak))
@@ -0,0 +1,47 @@
+import argparse
+import timeit
+
+import numpy as np
+
+from aideck import utils
+
+
+def legacy_draw(img, box_results, color=(0, 225, 0)):
+    '''
+    Drawing of detect_box before the overlay renderer: one frame copy and blend per box
+    '''
+    for box_result in box_results:
+        box = tuple(int(el) for el in box_result[:4])
+        img = utils.draw_filled_rect(img, box, str(round(box_result[4])), rect_color=color)
+        img = utils.draw_crosshair(img, box)
+    box = utils.choose_most_left_bb(box_results)
+    return utils.draw_crosshair(img, box, color=[168, 50, 70])
+
+
+def random_boxes(count, rng):
+    boxes = []
+    for _ in range(count):
+        w, h = rng.integers(10, 80, 2)
+        x, y = rng.integers(0, 324 - w), rng.integers(0, 244 - h)
+        boxes.append([x, y, w, h, rng.uniform(30, 100)])
+    return boxes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per box frame copies against the single pass overlay renderer")
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (244, 324, 3), dtype=np.uint8)
+    for count in [1, 5, 20]:
+        box_results = random_boxes(count, rng)
+        target = utils.choose_most_left_bb(box_results)
+        cases = [
+            ("legacy", lambda: legacy_draw(frame.copy(), box_results)),
+            ("overlay", lambda: utils.draw_overlay(frame.copy(), box_results, target)),
+            ("overlay fill", lambda: utils.draw_overlay(frame.copy(), box_results, target, fill=True)),
+        ]
+        for name, case in cases:
+            seconds = min(timeit.repeat(case, number=args.repeat, repeat=3)) / args.repeat
+            print("{:2d} boxes {:>12}: {:8.1f} us/frame".format(count, name, seconds * 1e6))
@@ -0,0 +1,70 @@
+import argparse
+import contextlib
+import io
+import time
+from threading import Thread
+
+from aideck import MQTTClient, wire_format
+from aideck.mqtt_loopback import LoopbackBroker, LoopbackClient
+from aideck.publish_policy import POLICIES, PublishPolicy
+
+TOPIC = "palletBlock_bb"
+TRUE_BB_TOPIC = TOPIC + "_true_bb"
+# every publish as before: QoS 2, no coalescing, payload printed
+LEGACY_POLICIES = {"*": PublishPolicy(qos=2, log=True)}
+
+OFFSETS = [[-34, 12, 5280, 128, 134, 3], [51, 10, 4950, 213, 132, 4], [140, 14, 4620, 302, 136, 5]]
+TRUE_BBS = [[96, 101, 64, 82, 87], [181, 99, 66, 75, 91], [272, 104, 60, 77, 84]]
+
+
+def detector_loop(client, rate, duration, cpu_times):
+    '''
+    Publishes like Detector.publish_both/publish_true_bb at the given detection rate
+    '''
+    cpu_start = time.thread_time()
+    start_time = time.time()
+    seq = 0
+    while time.time() - start_time < duration:
+        seq += 1
+        delay = start_time + seq / rate - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        client.publish(TOPIC, wire_format.encode_offsets(OFFSETS, seq), qos=2)
+        client.publish(TRUE_BB_TOPIC, wire_format.encode_true_bb(TRUE_BBS, seq), qos=2)
+    cpu_times.append(time.thread_time() - cpu_start)
+
+
+def run(policies, rate, duration):
+    broker = LoopbackBroker()
+    subscriber = LoopbackClient(broker, "Mission Loop")
+    subscriber.subscribe(TOPIC)
+    client = MQTTClient(None, None, "Load Test Publisher", [], mqtt_client=LoopbackClient(broker))
+    client.publisher.policies = policies
+
+    cpu_times = []
+    # logging is part of the publisher cost, but keep it off the terminal
+    with contextlib.redirect_stdout(io.StringIO()):
+        detector = Thread(target=detector_loop, args=(client, rate, duration, cpu_times))
+        detector.start()
+        detector.join()
+        client.publisher.flush()
+    broker.flush()
+    client.close()
+
+    detector_cpu_ms = cpu_times[0] * 1000 / duration
+    sender_cpu_ms = client.publisher.cpu_time * 1000 / duration
+    packets = sum(broker.packets.values())
+    return sum(broker.published.values()), packets / duration, detector_cpu_ms, sender_cpu_ms, client.publisher.coalesced
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Broker packets and publisher CPU of the detection topics per publish policy")
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--rates", type=float, nargs="+", default=[20, 40, 60])
+    args = parser.parse_args()
+
+    for rate in args.rates:
+        for name, policies in [("legacy", LEGACY_POLICIES), ("policy", POLICIES)]:
+            published, packets_per_second, detector_cpu_ms, sender_cpu_ms, coalesced = run(policies, rate, args.duration)
+            print("{:4.0f} Hz {:>6}: {:4d} messages to broker, {:6.1f} control packets/s, coalesced {:4d}, CPU detector thread {:5.1f} ms/s, sender thread {:5.1f} ms/s".format(
+                rate, name, published, packets_per_second, coalesced, detector_cpu_ms, sender_cpu_ms))
@@ -0,0 +1,87 @@
+import argparse
+import glob
+import os
+import resource
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import video_creator
+
+
+def legacy_create_video(recording, video_folder, fps=100):
+    '''
+    The former video_creator: string sorted file names, every gap filled with copies of the last frame at 100 FPS
+    '''
+    images = sorted(glob.glob(os.path.join(recording, "*.jpg")))
+    size = cv2.imread(images[0]).shape[:2]
+    out = cv2.VideoWriter(os.path.join(video_folder, "legacy.mp4"), cv2.VideoWriter_fourcc(*'mp4v'), fps, (size[1], size[0]))
+    last_time = float(Path(images[0]).stem)
+    last_frame = cv2.imread(images[0])
+    total_count = 0
+    for img in images:
+        current_time = float(Path(img).stem)
+        delta_time = round(current_time - last_time, 2)
+        for _ in range(int(delta_time * fps) - 1):
+            out.write(last_frame)
+            total_count += 1
+        current_frame = cv2.imread(img)
+        out.write(current_frame)
+        last_time = current_time
+        last_frame = current_frame
+        total_count += 1
+    out.release()
+    return os.path.join(video_folder, "legacy.mp4"), total_count, len(images)
+
+
+def synthetic_recording(folder, count, rate, seed=0):
+    '''
+    AI deck sized images with the timestamps of a ~rate Hz stream with jitter and dropped frames as names
+    '''
+    rng = np.random.default_rng(seed)
+    intervals = rng.normal(1 / rate, 0.2 / rate, count).clip(0.3 / rate) * np.where(rng.random(count) < 0.05, 3, 1)
+    timestamps = 1690000000 + np.cumsum(intervals)
+    y, x = np.mgrid[:244, :324]
+    for i, timestamp in enumerate(timestamps):
+        image = np.dstack([(x + 3 * i) % 256, (y + 2 * i) % 256, (x + y + i) % 256]).astype(np.uint8)
+        cv2.imwrite(os.path.join(folder, "{}.jpg".format(repr(float(timestamp)))), image)
+
+
+def timed(function, *args):
+    start_time = time.time()
+    path, written, decoded = function(*args)
+    return time.time() - start_time, written, decoded, os.path.getsize(path), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_isolated(function, *args):
+    # fresh process each, so the peak memory belongs to one run
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(timed, function, *args).result()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="video_creator on a synthetic recording: legacy 100 FPS padding vs. streaming resampling")
+    parser.add_argument("--frames", type=int, default=10000)
+    parser.add_argument("--rate", type=float, default=30, help="Hz of the synthetic recording")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    try:
+        recording = os.path.join(folder, "recording_synthetic")
+        os.makedirs(recording)
+        synthetic_recording(recording, args.frames, args.rate)
+
+        print("{} images at ~{:.0f} Hz".format(args.frames, args.rate))
+        for name, function, function_args in [("legacy 100 fps", legacy_create_video, (recording, folder)),
+                                              ("streaming 25 fps", video_creator.create_video, (recording, folder, 25)),
+                                              ("streaming vfr", video_creator.create_video, (recording, folder, 25, True))]:
+            seconds, written, decoded, size, peak = run_isolated(function, *function_args)
+            print("  {:<17} {:6.1f} s, {:6d} frames written, {:6d} images decoded, {:6.1f} MB video, peak {:5.0f} MB".format(
+                name, seconds, written, decoded, size / 1e6, peak))
+    finally:
+        shutil.rmtree(folder)
@@ -0,0 +1,48 @@
+import argparse
+import json
+import time
+
+from aideck import wire_format
+
+MESSAGES = {
+    "palletBlock_bb": (wire_format.KIND_OFFSETS, [[-34, 12, 5280, 128, 134, 3], [51, 10, 4950, 213, 132, 4], [140, 14, 4620, 302, 136, 5]]),
+    "palletBlock_bb_true_bb": (wire_format.KIND_TRUE_BB, [[96, 101, 64, 82, 87], [181, 99, 66, 75, 91], [272, 104, 60, 77, 84]]),
+    "position": (wire_format.KIND_POSITION, [1532.2481689453125, -845.1234130859375, 512.90478515625]),
+    "rotation": (wire_format.KIND_ROTATION, [[0.9998, -0.0174, 0.0012], [0.0174, 0.9998, -0.0031], [-0.0011, 0.0031, 0.9999]]),
+}
+
+
+def json_message(kind, rows):
+    if kind == wire_format.KIND_TRUE_BB:
+        return {"type": "bb", "content": rows}
+    return rows
+
+
+def measure(encode, decode, repeats):
+    start_time = time.perf_counter()
+    for i in range(repeats):
+        payload = encode(i)
+    encode_time = (time.perf_counter() - start_time) / repeats
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        decode(payload)
+    decode_time = (time.perf_counter() - start_time) / repeats
+    return len(payload), encode_time * 1e6, decode_time * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Payload size and encode/decode cost of JSON vs. the binary wire format")
+    parser.add_argument("--repeats", type=int, default=20000)
+    args = parser.parse_args()
+
+    for topic, (kind, rows) in MESSAGES.items():
+        message = json_message(kind, rows)
+        results = {
+            "json": measure(lambda i: json.dumps(message).encode(), lambda p: json.loads(p.decode()), args.repeats),
+            # the fallback path every subscriber takes for JSON payloads
+            "json via decode": measure(lambda i: json.dumps(message).encode(), wire_format.decode, args.repeats),
+            "binary": measure(lambda i: wire_format.encode(kind, rows, i, 0.0), wire_format.decode, args.repeats),
+        }
+        assert wire_format.decode(wire_format.encode(kind, rows)) == message, "round trip changed " + topic
+        for name, (size, encode_us, decode_us) in results.items():
+            print("{:>24} {:>16}: {:4d} bytes, encode {:6.2f} us, decode {:6.2f} us".format(topic, name, size, encode_us, decode_us))
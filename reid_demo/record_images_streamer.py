@@ -22,6 +22,8 @@ class Connector(threading.Thread):
     def __init__(self):
         threading.Thread.__init__(self)
         self.factors = [1.8648577393897736, 1.2606252586922309, 1.4528872589128194]
+        self.lut = utils.createColorLUT(self.factors)
+        self.rgb_lut = utils.createColorLUT(self.factors, rgb=True)
 
         self.recording_folder_name = f"recording_{int(time.time())}"
         if not os.path.exists(os.path.join("recordings", self.recording_folder_name)):
@@ -60,11 +62,8 @@ class Connector(threading.Thread):
         frmt, imgs = self.getImage(self.client_socket)
 
         if imgs is not None and frmt == 0:
-            img = imgs[-1]
-            img = utils.colorCorrectBayer(img,self.factors)
-
-            # push image to virtual cam
-            img = cv2.cvtColor(img,cv2.COLOR_BGR2RGB)
+            # push color corrected RGB image to virtual cam
+            img = utils.demosaicColorCorrect(imgs[0], self.rgb_lut, rgb=True)
             for cam in self.cams:
                 cam.send(img)
 
@@ -107,12 +106,13 @@ class Connector(threading.Thread):
                 # if k == ord('b'):
                 #     _,self.factors = utils.colorBalance(color_img)
 
-                cv2.imshow('Color', utils.colorCorrectBayer(color_img,self.factors))
+                corrected_img = utils.applyColorLUT(color_img, self.lut)
+                cv2.imshow('Color', corrected_img)
                 
                 k=cv2.waitKey(1)
                 if k == ord('q'):
                     self.running = False
-                cv2.imwrite(os.path.join("recordings", self.recording_folder_name, f"{time.time()}.jpg"), utils.colorCorrectBayer(color_img,self.factors))
+                cv2.imwrite(os.path.join("recordings", self.recording_folder_name, f"{time.time()}.jpg"), corrected_img)
                 
                 imgs = [bayer_img,color_img]
 
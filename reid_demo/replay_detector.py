@@ -0,0 +1,83 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from aideck import Detector, MQTTClient
+from aideck.mqtt_loopback import LoopbackBroker, LoopbackClient
+from aideck.replay import ReplaySource
+
+
+def percentiles(values, scale=1000):
+    if len(values) == 0:
+        return None
+    values = np.array(values) * scale
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p90": float(np.percentile(values, 90)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(np.max(values)),
+        "mean": float(np.mean(values)),
+    }
+
+
+def replay(recording, model_config, model_weights, topic_name, realtime=False):
+    '''
+    Feed a recording through a headless Detector publishing to an in-process broker
+
+    returns: report dict with inference times in ms, frame counts, detections and publish latency
+    '''
+    broker = LoopbackBroker()
+    client = MQTTClient(None, None, "Replay Publisher", [], mqtt_client=LoopbackClient(broker))
+    source = ReplaySource(recording, realtime=realtime)
+    frame_stats = []
+
+    detector = Detector(model_config, model_weights, topic_name, "Replay Detector", video_device=source,
+                        headless=True, visualization_rate=0, client=client, frame_stats=frame_stats)
+    start_time = time.time()
+    detector.start()
+    detector.join()
+    duration = time.time() - start_time
+    client.publisher.flush()
+    broker.flush()
+    client.close()
+
+    inference_times = [inference for _, inference, _ in frame_stats]
+    detections = [count for _, _, count in frame_stats]
+    return {
+        "recording": recording,
+        "topic": topic_name,
+        "realtime": realtime,
+        "frames_total": len(source.frames),
+        "frames_processed": len(frame_stats),
+        "frames_dropped": source.dropped,
+        "duration_s": duration,
+        "fps": len(frame_stats) / duration if duration > 0 else 0,
+        "inference_ms": percentiles(inference_times),
+        "stages_ms": detector.timing_report(),
+        "detections_per_frame": {
+            "mean": float(np.mean(detections)) if len(detections) > 0 else 0,
+            "max": int(np.max(detections)) if len(detections) > 0 else 0,
+            "frames_with_detections": int(np.count_nonzero(detections)),
+        },
+        "publish_latency_ms": {topic: percentiles(latencies) for topic, latencies in broker.latencies.items()},
+        "published": dict(broker.published),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded flight through the Detector and report its performance")
+    parser.add_argument("recording", help="recordings/recording_* folder")
+    parser.add_argument("--config", default="aideck/models/yolov4-tiny.cfg")
+    parser.add_argument("--weights", default="aideck/models/yolov4-tiny_pallet_block_20-40.weights")
+    parser.add_argument("--topic", default="palletBlock_bb")
+    parser.add_argument("--realtime", action="store_true", help="release frames at their original time stamps")
+    parser.add_argument("--report", help="write the report as json to this file")
+    args = parser.parse_args()
+
+    report = replay(args.recording, args.config, args.weights, args.topic, args.realtime)
+    print(json.dumps(report, indent=4))
+    if args.report is not None:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=4)
@@ -1,13 +1,18 @@
 from aideck import Detector
+from aideck.frame_bus import FrameBusSubscriber
 import time
 
+# read the frames from the Connector's shared memory frame bus instead of the virtual cam
+USE_FRAME_BUS = False
+
 def main():
+    video_device = FrameBusSubscriber() if USE_FRAME_BUS else 1
     detector_palletBlock = Detector(
         "aideck/models/yolov4-tiny.cfg", 
         "aideck/models/yolov4-tiny_pallet_block_20-40.weights", 
         "palletBlock_bb", 
         "Bounding Box Publisher for pallet blocks",
-        video_device=1
+        video_device=video_device
         )
 
     detector_palletBlock.start()
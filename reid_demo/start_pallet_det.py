@@ -1,13 +1,18 @@
 from aideck import Detector
+from aideck.frame_bus import FrameBusSubscriber
 import time
 
+# read the frames from the Connector's shared memory frame bus instead of the virtual cam
+USE_FRAME_BUS = False
+
 def main():
+    video_device = FrameBusSubscriber() if USE_FRAME_BUS else 2
     detector_pallet = Detector(
         "aideck/models/yolov4-tiny.cfg", 
         "aideck/models/yolov4-tiny_pallet_0-20.weights", 
         "pallet_bb", 
         "Bounding Box Publisher for pallets", 
-        video_device=2)
+        video_device=video_device)
 
     detector_pallet.start()
 
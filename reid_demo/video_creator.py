@@ -1,61 +1,145 @@
-import cv2
+import argparse
 import glob
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
-
-FPS = 100
-
-if __name__ == "__main__":
-
-    recordings = glob.glob(os.path.join(
-        "reid_demo", "recordings", "recording_*"))
-
-    # print(recordings)
-
-    for recording in recordings:
-
-        print(recording)
-
-        images = glob.glob(os.path.join(recording, "*.jpg"))
-        images = sorted(images)
-
-        if not len(images) > 0:
-            continue
-
-        test_img = cv2.imread(images[0])
-
-        if test_img is None:
+import cv2
+import numpy as np
+
+FPS = 25 # output frame rate, the recording is resampled to it
+DECODE_THREADS = 4 # per recording
+PREFETCH = 32 # decoded frames waiting for the writer, bounds the memory
+RECORDINGS = os.path.join("reid_demo", "recordings", "recording_*")
+VIDEO_FOLDER = os.path.join("reid_demo", "videos")
+
+
+def list_images(recording):
+    '''
+    Images of a recording folder sorted by the time stamp in their file name, other files are skipped
+
+    returns: list of (timestamp, path)
+    '''
+    frames = []
+    for path in glob.glob(os.path.join(recording, "*.jpg")):
+        try:
+            frames.append((float(Path(path).stem), path))
+        except ValueError:
             continue
+    return sorted(frames)
+
+
+def resample(timestamps, fps):
+    '''
+    Index of the recorded frame nearest to every output frame at fps
+
+    timestamps: sorted (N,) array
+    returns: (M,) array of indices into timestamps
+    '''
+    count = int(round((timestamps[-1] - timestamps[0]) * fps)) + 1
+    times = timestamps[0] + np.arange(count) / fps
+    after = np.clip(np.searchsorted(timestamps, times), 1, len(timestamps) - 1)
+    before = after - 1
+    return np.where(times - timestamps[before] <= timestamps[after] - times, before, after) if len(timestamps) > 1 else np.zeros(count, dtype=int)
+
+
+def runs(indices):
+    '''
+    Consecutive equal indices combined, every frame is decoded once and written count times
+
+    returns: list of (index, count)
+    '''
+    starts = np.flatnonzero(np.diff(indices, prepend=-1))
+    counts = np.diff(np.append(starts, len(indices)))
+    return list(zip(indices[starts], counts))
+
+
+def decode(paths, threads=DECODE_THREADS, prefetch=PREFETCH):
+    '''
+    Yields the images of paths in order, up to prefetch are decoded ahead by a thread pool
+    '''
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pending = deque()
+        for path in paths:
+            pending.append(executor.submit(cv2.imread, path))
+            if len(pending) >= prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_timecodes(path, timestamps):
+    '''
+    Timestamps in the mkvmerge v2 format, e.g. mkvmerge -o out.mkv --timestamps 0:path video.mp4
+    '''
+    with open(path, "w") as file:
+        file.write("# timestamp format v2\n")
+        for timestamp in timestamps:
+            file.write("{:.3f}\n".format((timestamp - timestamps[0]) * 1000))
+
+
+def create_video(recording, video_folder=VIDEO_FOLDER, fps=FPS, vfr=False, threads=DECODE_THREADS):
+    '''
+    Encodes the images of one recording folder to <video_folder>/<folder name>.mp4. With vfr every
+    image is written once at the mean frame rate of the recording and the real timestamps are
+    written next to the video as <folder name>.txt, else the recording is resampled to fps.
+
+    returns: (video path, frames written, images decoded), or None without images
+    '''
+    frames = list_images(recording)
+    if len(frames) == 0:
+        return None
+    timestamps = np.array([timestamp for timestamp, _ in frames])
+    file_name = os.path.join(video_folder, os.path.split(os.path.normpath(recording))[-1])
+    if vfr:
+        duration = timestamps[-1] - timestamps[0]
+        fps = (len(timestamps) - 1) / duration if duration > 0 else FPS
+        frame_runs = [(index, 1) for index in range(len(frames))]
+        write_timecodes(file_name + ".txt", timestamps)
+    else:
+        frame_runs = runs(resample(timestamps, fps))
+
+    out = None
+    last_image = None
+    written = 0
+    for (index, count), image in zip(frame_runs, decode([frames[index][1] for index, _ in frame_runs], threads)):
+        if image is None:
+            print("Could not read", frames[index][1])
+            image = last_image
+            if image is None:
+                continue
+        if out is None:
+            height, width = image.shape[:2]
+            out = cv2.VideoWriter(file_name + ".mp4", cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        for _ in range(count):
+            out.write(image)
+        written += count
+        last_image = image
+    if out is None:
+        return None
+    out.release()
+    return file_name + ".mp4", written, len(frame_runs)
 
-        size = test_img.shape[:2]
-
-        fileName = os.path.split(recording)[-1]
-
-        out = cv2.VideoWriter(
-            os.path.join("reid_demo", "videos", f'{fileName}.mp4'), cv2.VideoWriter_fourcc(*'mp4v'), FPS, (size[1], size[0]))
-
-        last_time = float(Path(images[0]).stem)
-        last_frame = cv2.imread(images[0])
-
-        total_count = 0
 
-        for img in images:
-            current_time = float(Path(img).stem)
-            delta_time = round(current_time - last_time, 2)
-
-            repetitions = int(delta_time * FPS) - 1
-            for _ in range(repetitions):
-                out.write(last_frame)
-                total_count += 1
-
-            current_frame = cv2.imread(img)
-            out.write(current_frame)
-            last_time = current_time
-            last_frame = current_frame
-
-            total_count += 1
-
-        print("     ", total_count)
-
-        out.release()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Videos of the recording folders")
+    parser.add_argument("recordings", nargs="*", help="Recording folders, default " + RECORDINGS)
+    parser.add_argument("--output", default=VIDEO_FOLDER)
+    parser.add_argument("--fps", type=float, default=FPS, help="Output frame rate, the nearest image is shown at each frame")
+    parser.add_argument("--vfr", action="store_true", help="Every image once with its timestamps in a mkvmerge timecode file")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="Recordings encoded at the same time")
+    parser.add_argument("--threads", type=int, default=DECODE_THREADS, help="Decoding threads per recording")
+    args = parser.parse_args()
+
+    recordings = args.recordings or sorted(glob.glob(RECORDINGS))
+    os.makedirs(args.output, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=max(1, min(args.processes, len(recordings)))) as executor:
+        futures = [executor.submit(create_video, recording, args.output, args.fps, args.vfr, args.threads) for recording in recordings]
+        for recording, future in zip(recordings, futures):
+            result = future.result()
+            if result is None:
+                print(recording, "no images")
+                continue
+            print(recording)
+            print("     ", "{} frames, {} images".format(result[1], result[2]))
@@ -1,14 +1,14 @@
 #!/usr/bin/env python
-import paho.mqtt.client as mqtt
 from pycrazyswarm import Crazyswarm
 import numpy as np
 import json
-from threading import Thread
 import math
 import time
 
 import matplotlib.pyplot as plt
 
+from vicon_client import ViconClient
+
 HOVER_TIME = 5
 
 
@@ -97,53 +97,6 @@ class ViconObject():
 
         return pallet_waypoints, drone_angles
 
-class MQTTClient(Thread):
-    def __init__(self, ip, port, topics):
-        Thread.__init__(self)
-        self.client = mqtt.Client("Demo_runner")
-        self.client.connect(ip, port)
-        self.topics = topics
-        self.pos = {}
-        self.rot = {}
-        for topic in topics:
-            self.subscribe(topic)
-
-        self.start()
-
-    def on_message(self, client, userdata, msg):
-        data = json.loads(msg.payload.decode())
-        for topic in self.topics:
-            if topic in msg.topic:
-                if "_rot" in msg.topic:
-                    # rotation matrix data
-                    self.rot[topic] = data
-                else:
-                    # position data
-                    self.pos[topic] = data
-    
-    def subscribe(self, topic):
-        self.client.subscribe(topic)
-        self.client.on_message = self.on_message
-
-    def run(self):
-        self.client.loop_forever()
-
-    def get_position(self, name):
-        if name in self.pos:
-            return self.pos[name]
-        else:
-            return None
-
-    def get_rotation(self, name):
-        if name + "_rot" in self.rot:
-            return self.rot[name + "_rot"]
-        else:
-            return None
-
-    def close(self):
-        self.client.disconnect()
-
-
 def get_position(client, name):
     pos = client.get_position(name)
     if pos is not None:
@@ -156,7 +109,7 @@ def calculateFlightTime(pallet_pos, drone_pos, max_v=1):
     return (distance / max_v) + 2
 
 def main():
-    CLIENT = MQTTClient("localhost", 5000, [DRONE_NAME, TARGET_NAME, TARGET_NAME + "_rot"])
+    CLIENT = ViconClient("localhost", 5000, [DRONE_NAME, TARGET_NAME, TARGET_NAME + "_rot"])
 
     swarm = Crazyswarm()
     timeHelper = swarm.timeHelper
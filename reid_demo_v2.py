@@ -1,8 +1,9 @@
 #!/usr/bin/env python
 from pycrazyswarm import Crazyswarm
 from MQTTClient import MQTTClient
-from utils import choose_best_bb, choose_middle_bb, choose_closest_bb,  Mode
+from utils import choose_best_bb, choose_middle_bb, choose_closest_bb, choose_tracked_bb, get_track_id, Mode
 from Drone import Drone
+from mission_trace import MissionTrace
 import time
 
 LOG_TRACKING = True
@@ -12,6 +13,33 @@ STEP_FLIGHT_TIME = 1.5
 PALLET_OFFSET_TOPIC = "pallet_bb"
 PALLET_BLOCK_OFFSET_TOPIC = "palletBlock_bb"
 PALLET_BLOCK_CONTINUE_TOPIC = "move_to_next_block"
+DETECTION_DEMAND_TOPIC = "detection_demand"
+DEMAND_REFRESH_PERIOD = 1.0 # seconds between demands while streaming, well below scheduler.DEMAND_TIMEOUT
+MISSION_METRICS_TOPIC = "mission_metrics"
+STREAMING_CONTROL = True # BLOCK phase: stream setpoints at Drone.CONTROL_RATE instead of goTo steps
+
+def publish_detection_demand(client, need_at, mode):
+    """
+    Tell the detectors when the next detection is needed, so they only run at full rate near it
+    """
+    content = {
+        "need_at": need_at,
+        "phase": mode.name
+    }
+    client.publish_on_topic(DETECTION_DEMAND_TOPIC, content, qos=0)
+
+def publish_mission_metrics(client, drone, flight_duration, iterations_per_block):
+    """
+    Control iterations needed per block and detections rejected for being older than the last command
+    """
+    content = {
+        "flight_time": flight_duration,
+        "iterations_per_block": iterations_per_block,
+        "stale_rejected_client": client.stale.get(PALLET_BLOCK_OFFSET_TOPIC, 0),
+        "stale_rejected_drone": drone.stale_detections
+    }
+    print("Mission metrics:", content)
+    client.publish_on_topic(MISSION_METRICS_TOPIC, content, qos=2)
 
 def main():
     client = MQTTClient("localhost", 5001, [PALLET_OFFSET_TOPIC, PALLET_BLOCK_OFFSET_TOPIC, PALLET_BLOCK_CONTINUE_TOPIC])
@@ -28,46 +56,59 @@ def main():
     drone = Drone(cf, (0, 0), STARTING_HEIGHT)
     current_mode = Mode.PALLET
     blocks_passed = 0
+    # track id of the block the drone is approaching, keeps the choice stable between frames
+    target_track_id = None
+    # control iterations of every approached block
+    iterations_per_block = []
+    # last demand published while streaming
+    last_demand_time = 0
 
     x, y, _ = drone.get_position()
     angle = drone.get_yaw()
 
     flight_time = drone.move(x, y, STARTING_HEIGHT, angle, 3)
     last_command_time = time.time()
+    publish_detection_demand(client, last_command_time + flight_time, current_mode)
     timeHelper.sleep(flight_time)
 
+    trace = MissionTrace("reid_demo_v2")
     flight_start_time = time.time()
 
     while running:
+        trace.phase(current_mode)
 
         # we are looking for the pallet
         if current_mode == Mode.PALLET:
 
             # get pallet_offset (offset_x, offset_y, area, center_x, center_y)
-            pallet_offsets = client.get_bb(PALLET_OFFSET_TOPIC)
+            pallet_offsets, capture_time = client.get_bb(PALLET_OFFSET_TOPIC, with_capture_time=True)
             # choose best bb (Problem: Alternating choices)
             target_offset = choose_best_bb(pallet_offsets)
             # drone updates position, angle => flighs to position
             flight_time = drone.update_pallet(target_offset)
             last_command_time = time.time()
-            timeHelper.sleep(flight_time)
-            
-            # desired distance, height, and angle is reached
-            if drone.check_target_condition():
-                print("Found pallet and have reached desired position. Continueing to next stage...")
-                current_mode = Mode.BLOCK
-                # reset drone search settings
-                drone.reset_target_condition()
+            trace.iteration(flight=flight_time, detected=pallet_offsets is not None, capture_time=capture_time)
+            if flight_time is not None:
+                publish_detection_demand(client, last_command_time + flight_time, current_mode)
+                timeHelper.sleep(flight_time)
 
+                # desired distance, height, and angle is reached
+                if drone.check_target_condition():
+                    print("Found pallet and have reached desired position. Continueing to next stage...")
+                    current_mode = Mode.BLOCK
+                    # reset drone search settings
+                    drone.reset_target_condition()
+                    publish_detection_demand(client, last_command_time + flight_time, current_mode)
 
-        elif current_mode == Mode.BLOCK:
-
-            # check if new message is ready or the waiting time has been exceeded
-            while not client.message_ready[PALLET_BLOCK_OFFSET_TOPIC] and last_command_time + flight_time > time.time():
-                timeHelper.sleep(0.1)
 
+        elif current_mode == Mode.BLOCK:
 
-            pallet_block_offsets = client.get_bb(PALLET_BLOCK_OFFSET_TOPIC)
+            # wake up as soon as a new message arrives, at the latest when the movement is finished,
+            # detections captured before the last command was issued are skipped
+            remaining_time = max(last_command_time + flight_time - time.time(), 0)
+            wait_start = time.time()
+            _, pallet_block_offsets, capture_time = client.wait_for(PALLET_BLOCK_OFFSET_TOPIC, remaining_time, captured_after=drone.last_command_time)
+            wait_time = time.time() - wait_start
             # pallet_block_offsets = filter_pallet_bbs(pallet_block_offsets)
 
             # select the desired bounding box
@@ -76,14 +117,33 @@ def main():
             #     target_offset = choose_middle_bb(pallet_block_offsets)
             # else:
             if pallet_block_offsets is not None:
-                target_offset = choose_closest_bb(pallet_block_offsets)
-
-            flight_time = drone.update_block(target_offset)
+                target_offset = choose_tracked_bb(pallet_block_offsets, target_track_id)
+                if target_offset is None:
+                    target_offset = choose_closest_bb(pallet_block_offsets)
+                    target_track_id = get_track_id(target_offset)
+
+            if STREAMING_CONTROL:
+                flight_time = drone.update_block_streaming(target_offset, capture_time)
+            else:
+                flight_time = drone.update_block(target_offset, capture_time)
             last_command_time = time.time()
+            # the drone keeps flying while the next iteration waits for a detection
+            trace.iteration(wait=wait_time, flight=flight_time, detected=pallet_block_offsets is not None,
+                            capture_time=capture_time if pallet_block_offsets is not None else None)
+            if flight_time is not None and not drone.streaming:
+                publish_detection_demand(client, last_command_time + flight_time, current_mode)
+            elif flight_time is not None and last_command_time - last_demand_time >= DEMAND_REFRESH_PERIOD:
+                # while streaming the block detector is needed all the time, the demand is repeated
+                # so the pallet detector stays idle instead of falling back to full rate
+                publish_detection_demand(client, last_command_time, current_mode)
+                last_demand_time = last_command_time
             
             if client.get_bb(PALLET_BLOCK_CONTINUE_TOPIC) is not None:
                 print("Found block", str(blocks_passed), "moving to next...")
                 blocks_passed += 1
+                target_track_id = None
+                iterations_per_block.append(drone.block_iterations)
+                trace.event("block_done", block=blocks_passed, iterations=drone.block_iterations)
                 # reset drone search settings
                 drone.reset_target_condition()
                 if blocks_passed >= 3:
@@ -96,10 +156,12 @@ def main():
                         "content": flight_duration
                     }
                     client.publish_on_topic("flight_time", content, qos=2)
+                    publish_mission_metrics(client, drone, flight_duration, iterations_per_block)
                 else:
                     movement = [(0.44, -0.1, 3), (-1.05, -0.1, 5)]
                     flight_time = drone.move_sideways(*movement[blocks_passed-1])
                     last_command_time = time.time()
+                    publish_detection_demand(client, last_command_time + flight_time, current_mode)
                     timeHelper.sleep(flight_time)
 
 
@@ -109,22 +171,33 @@ def main():
 
         if flight_time is None:
             print("Found no pallet rtb...")
+            trace.event("rtb")
+            trace.phase("RTB")
             current_mode = Mode.PALLET
             drone.reset_target_condition()
             flight_time = drone.move(0, 0, STARTING_HEIGHT, 0, 4)
+            publish_detection_demand(client, None, Mode.FINISHED)
             timeHelper.sleep(flight_time)
             print("Nothing found. Press Enter to try again...")
             swarm.input.waitUntilButtonPressed()
+            trace.event("retry")
             flight_start_time = time.time()
             flight_time = 2
+            last_command_time = time.time()
+            publish_detection_demand(client, last_command_time, current_mode)
 
 
     # return to base
+    trace.phase(Mode.FINISHED)
+    publish_detection_demand(client, None, Mode.FINISHED)
     flight_time = drone.move(0, 0, STARTING_HEIGHT, 0, 5)
     timeHelper.sleep(flight_time)
     allcfs.land(targetHeight=0.05, duration=3.0)
     timeHelper.sleep(4)
 
+    trace.close(flight_time=flight_duration, iterations_per_block=iterations_per_block,
+                stale_rejected_client=client.stale.get(PALLET_BLOCK_OFFSET_TOPIC, 0), stale_rejected_drone=drone.stale_detections)
+    drone.close()
     client.close()
 
 if __name__ == "__main__":
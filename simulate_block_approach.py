@@ -0,0 +1,158 @@
+import argparse
+import contextlib
+import io
+
+import numpy as np
+
+import Drone as drone_module
+from Drone import Drone, CONTROL_RATE
+
+SIM_STEP = 0.01 # seconds
+DETECTION_RATE = 10 # Hz of the block detector
+DETECTION_LATENCY = 0.1 # seconds from capture to the message in the mission loop
+FOCAL_LENGTH = 280 # pixels, AI-deck camera 324x244
+BLOCK_SIZE = (0.15, 0.1) # m, width and height of a pallet block
+TARGET_AREA = 11000 # Detector IMAGE_CAPTURE_MIN_AREA, the image of the block is taken from here on
+POSITION_TIME_CONSTANT = 0.1 # seconds, tracking lag of the low level controller
+
+
+class SimClock():
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+
+class SimCrazyflie():
+    '''
+    Point mass following goTo trajectories or streamed cmdPosition setpoints with a first order lag
+    '''
+    def __init__(self, clock, position):
+        self.clock = clock
+        self.pos = np.array(position, dtype=float)
+        self.goal = self.pos.copy()
+        self.start = self.pos.copy()
+        self.start_time = 0
+        self.duration = 0
+        self.setpoint = None
+
+    def goTo(self, goal, yaw, duration):
+        self.start = self.pos.copy()
+        self.goal = np.array(goal, dtype=float)
+        self.start_time = self.clock.time()
+        self.duration = duration
+
+    def cmdPosition(self, pos, yaw=0):
+        self.setpoint = np.array(pos, dtype=float)
+
+    def notifySetpointsStop(self):
+        self.setpoint = None
+        self.goTo(self.pos, 0, 0)
+
+    def step(self, dt):
+        if self.setpoint is not None:
+            self.pos += (self.setpoint - self.pos) * min(1.0, dt / POSITION_TIME_CONSTANT)
+        elif self.duration > 0:
+            # constant velocity, a new goTo continues from the current position
+            progress = min(1.0, (self.clock.time() - self.start_time) / self.duration)
+            self.pos = self.start + (self.goal - self.start) * progress
+        else:
+            self.pos = self.goal.copy()
+
+    def position(self):
+        return self.pos.copy()
+
+    def yaw(self):
+        return 0.0
+
+
+def observe(drone_pos, block_pos, rng):
+    '''
+    Offsets the block detector would publish for the drone facing +x
+    '''
+    rel = np.array(block_pos) - drone_pos
+    distance = max(rel[0], 0.05)
+    offset_x = FOCAL_LENGTH * rel[1] / distance + rng.normal(0, 2)
+    offset_y = FOCAL_LENGTH * rel[2] / distance + rng.normal(0, 2)
+    area = (FOCAL_LENGTH * BLOCK_SIZE[0] / distance) * (FOCAL_LENGTH * BLOCK_SIZE[1] / distance) * rng.normal(1, 0.03)
+    return (int(offset_x), int(offset_y), int(area), int(162 + offset_x), int(122 - offset_y))
+
+
+def reached(drone_pos, block_pos):
+    offset_x, offset_y, area, _, _ = observe(drone_pos, block_pos, np.random.default_rng(0))
+    return area >= TARGET_AREA and abs(offset_x) <= 20 and abs(offset_y) <= 30
+
+
+def approach(streaming, start, block_pos, max_time, seed):
+    '''
+    Runs the BLOCK phase of reid_demo_v2 against the simulated drone and detector
+
+    returns: (seconds until the block image can be taken or None, control iterations)
+    '''
+    clock = SimClock()
+    cf = SimCrazyflie(clock, start)
+    drone_module.LOG_TRACKING = False
+    drone = Drone(cf, clock=clock.time)
+    for pid in (drone.block_pid_x, drone.block_pid_y, drone.block_pid_z):
+        pid.time_fn = clock.time
+        pid.reset()
+    rng = np.random.default_rng(seed)
+
+    pending = [] # detections on their way to the mission loop: (arrival, capture time, offsets)
+    next_capture = 0
+    latest, latest_taken = None, True
+    # the BLOCK phase starts hovering in front of the pallet
+    flight_time, last_command_time = 1.0, 0
+
+    while clock.now < max_time:
+        # wait like client.wait_for until a fresh detection arrives or the command is finished
+        deadline = last_command_time + flight_time
+        while True:
+            if clock.now >= next_capture:
+                pending.append((clock.now + DETECTION_LATENCY, clock.now, observe(cf.position(), block_pos, rng)))
+                next_capture += 1.0 / DETECTION_RATE
+            while len(pending) > 0 and pending[0][0] <= clock.now:
+                latest, latest_taken = pending.pop(0)[1:], False
+            if reached(cf.position(), block_pos):
+                return clock.now, drone.block_iterations
+            if not latest_taken and not drone.is_stale(latest[0]):
+                break
+            if clock.now >= deadline:
+                break
+            clock.now += SIM_STEP
+            cf.step(SIM_STEP)
+
+        target_offset, capture_time = None, None
+        if not latest_taken and not drone.is_stale(latest[0]):
+            capture_time, target_offset = latest
+        latest_taken = True
+        with contextlib.redirect_stdout(io.StringIO()):
+            if streaming:
+                flight_time = drone.update_block_streaming(target_offset, capture_time)
+            else:
+                flight_time = drone.update_block(target_offset, capture_time)
+        if flight_time is None:
+            return None, drone.block_iterations
+        last_command_time = clock.now
+    return None, drone.block_iterations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time to reach a pallet block in step mode vs. streaming control mode (simulated)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-time", type=float, default=300)
+    args = parser.parse_args()
+
+    block_pos = (1.0, 0.0, 0.4)
+    starts = [(0.0, 0.15, 0.45), (0.1, -0.1, 0.35), (0.0, 0.05, 0.5), (0.2, 0.12, 0.4), (-0.1, -0.15, 0.45)]
+    for name, streaming in [("step", False), ("streaming", True)]:
+        times, iterations = [], []
+        for run in range(args.runs):
+            duration, iters = approach(streaming, starts[run % len(starts)], block_pos, args.max_time, run)
+            times.append(duration)
+            iterations.append(iters)
+        reached_times = [t for t in times if t is not None]
+        print("{:>9}: reached {}/{}, time to target mean {:.1f} s, max {:.1f} s, control iterations mean {:.0f} ({} Hz setpoints)".format(
+            name, len(reached_times), args.runs, np.mean(reached_times) if reached_times else float("nan"),
+            np.max(reached_times) if reached_times else float("nan"), np.mean(iterations), CONTROL_RATE if streaming else "-"))
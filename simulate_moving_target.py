@@ -0,0 +1,157 @@
+import argparse
+import contextlib
+import io
+import math
+
+import numpy as np
+
+from simulate_block_approach import SimClock, SimCrazyflie
+from target_predictor import TargetPredictor
+from vicon_object import ViconObject
+
+SIM_STEP = 0.01 # seconds
+VICON_RATE = 100 # Hz
+VICON_POSITION_NOISE = 0.002 # m
+VICON_YAW_NOISE = 0.005 # rad
+PALLET_SIZE = (1.2, 0.8) # m, width and height like in reid_demo_moving
+PALLET_HEIGHT = 0.15 # m, z of the Vicon origin of the pallet
+# same as reid_demo_moving
+MIN_DISTANCE = 0.2
+HEIGHT_OFFSET = 0.35
+INTERCEPT_ITERATIONS = 3
+
+
+def calculateFlightTime(pallet_pos, drone_pos, max_v=1):
+    distance = np.linalg.norm([a - b for a,b in zip(pallet_pos, drone_pos)])
+    return (distance / max_v) + 2
+
+
+class MovingPallet():
+    '''
+    Drives along its x axis with constant speed and yaw rate, an arc or a straight line
+    '''
+    def __init__(self, speed, yaw_rate, start=(0, 0, PALLET_HEIGHT), yaw=0.3):
+        self.speed = speed
+        self.yaw_rate = yaw_rate
+        self.start = np.array(start, dtype=float)
+        self.yaw0 = yaw
+
+    def pose(self, t):
+        yaw = self.yaw0 + self.yaw_rate * t
+        if abs(self.yaw_rate) < 1e-9:
+            offset = self.speed * t * np.array([math.cos(yaw), math.sin(yaw), 0])
+        else:
+            radius = self.speed / self.yaw_rate
+            offset = radius * np.array([math.sin(yaw) - math.sin(self.yaw0), math.cos(self.yaw0) - math.cos(yaw), 0])
+        return self.start + offset, yaw
+
+
+def rotation(yaw):
+    return [[math.cos(yaw), -math.sin(yaw), 0], [math.sin(yaw), math.cos(yaw), 0], [0, 0, 1]]
+
+
+class SimViconClient():
+    '''
+    The reid_demo_moving MQTTClient interface with noisy poses of one object at VICON_RATE
+    '''
+    def __init__(self, pallet, rng):
+        self.pallet = pallet
+        self.rng = rng
+        self.seq = 0
+        self.position = None
+        self.rotation = None
+        self.listeners = []
+
+    def publish(self, t):
+        position, yaw = self.pallet.pose(t)
+        self.position = list((position + self.rng.normal(0, VICON_POSITION_NOISE, 3)) * 1000)
+        self.rotation = rotation(yaw + self.rng.normal(0, VICON_YAW_NOISE))
+        self.seq += 1
+        for listener in self.listeners:
+            listener(t, self.position)
+
+    def get_position(self, name):
+        return self.position
+
+    def get_rotation(self, name):
+        return self.rotation
+
+    def get_seq(self, name):
+        return self.seq, self.seq
+
+    def on_position(self, name, callback):
+        self.listeners.append(callback)
+
+
+def follow(predict, speed, yaw_rate, max_time, seed):
+    '''
+    Runs the following loop of reid_demo_moving around the simulated pallet
+
+    returns: (seconds until all waypoints were visited or None, mean distance of the drone to the
+              true position of its current waypoint, mean error of the estimated object speed)
+    '''
+    clock = SimClock()
+    rng = np.random.default_rng(seed)
+    pallet = MovingPallet(speed, yaw_rate)
+    client = SimViconClient(pallet, rng)
+    cf = SimCrazyflie(clock, (0.0, -1.5, 1.0))
+    next_vicon = 0.0
+    tracking_errors, speed_errors = [], []
+
+    vicon_object = ViconObject("PALLET", width=PALLET_SIZE[0], height=PALLET_SIZE[1], client=client, num_waypoints_per_side=3,
+                               min_distance=MIN_DISTANCE, height_offset=0.3, predictor=TargetPredictor() if predict else None, clock=clock.time)
+
+    def sleep(duration):
+        nonlocal next_vicon
+        end = clock.now + duration
+        while clock.now < end:
+            if clock.now >= next_vicon:
+                client.publish(clock.now)
+                next_vicon += 1.0 / VICON_RATE
+            clock.now += SIM_STEP
+            cf.step(SIM_STEP)
+            if vicon_object.waypoint_order:
+                # true position of the waypoint the drone is heading for
+                position, yaw = pallet.pose(clock.now)
+                waypoint = np.dot(rotation(yaw), vicon_object.waypoints[vicon_object.waypoint_order[0]]) + position
+                tracking_errors.append(np.linalg.norm(cf.position()[:2] - waypoint[:2]))
+
+    sleep(1.0)
+    vicon_object.order_waypoints(cf.position())
+    with contextlib.redirect_stdout(io.StringIO()):
+        while len(vicon_object.waypoint_order) > 0 and clock.now < max_time:
+            drone_pos = cf.position()
+            waypoint, angle = vicon_object.get_next_waypoint_live(cf_positon=cf.position(), min_distance=MIN_DISTANCE, height_offset=HEIGHT_OFFSET)
+            speed_estimate = vicon_object.estimate_speed()
+            true_velocity = np.array(pallet.pose(clock.now + 0.005)[0] - pallet.pose(clock.now - 0.005)[0]) / 0.01
+            speed_errors.append(np.linalg.norm(np.array(speed_estimate) - true_velocity) if np.ndim(speed_estimate) > 0 else np.linalg.norm(true_velocity))
+            flight_time = calculateFlightTime(waypoint, drone_pos, max_v=0.3)
+            if predict and len(vicon_object.waypoint_order) > 0:
+                for _ in range(INTERCEPT_ITERATIONS):
+                    waypoint, angle = vicon_object.predict_waypoint(flight_time)
+                    flight_time = calculateFlightTime(waypoint, drone_pos, max_v=0.3)
+
+            if predict or np.linalg.norm(speed_estimate) < (MIN_DISTANCE / flight_time):
+                cf.goTo(waypoint, math.radians(angle), flight_time)
+                sleep(flight_time * 0.4)
+            else:
+                # Object is moving to fast
+                sleep(1)
+
+    duration = clock.now if len(vicon_object.waypoint_order) == 0 else None
+    return duration, np.mean(tracking_errors), np.mean(speed_errors)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Following a moving pallet: finite difference speed vs. Kalman prediction (simulated)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-time", type=float, default=240)
+    args = parser.parse_args()
+
+    for speed, yaw_rate in [(0.0, 0.0), (0.05, 0.0), (0.1, 0.02), (0.2, 0.0)]:
+        for name, predict in [("difference", False), ("kalman", True)]:
+            results = [follow(predict, speed, yaw_rate, args.max_time, run) for run in range(args.runs)]
+            times = [duration for duration, _, _ in results if duration is not None]
+            print("pallet {:.2f} m/s {:.2f} rad/s {:>10}: completed {}/{}, loop time {:>6}, tracking error {:.2f} m, speed error {:.3f} m/s".format(
+                speed, yaw_rate, name, len(times), args.runs, "{:.1f} s".format(np.mean(times)) if times else "-",
+                np.mean([error for _, error, _ in results]), np.mean([error for _, _, error in results])))
@@ -0,0 +1,127 @@
+import argparse
+import glob
+import json
+import os
+
+import numpy as np
+
+from mission_trace import TRACE_FOLDER
+
+PERCENTILES = [50, 90, 99]
+PHASES = ["PALLET", "BLOCK_SEARCH", "BLOCK", "FINISHED", "RTB"]
+
+
+def load_trace(path):
+    '''
+    returns: the final flight record of a trace, rebuilt from the single lines if the flight was aborted
+    '''
+    records = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    for record in records:
+        if record["type"] == "flight":
+            record["complete"] = True
+            return record
+
+    flight = {"type": "flight", "complete": False, "phases": {}, "events": {},
+              "duration": records[-1]["t"] if len(records) > 0 else 0}
+    phase, phase_start = None, 0
+    for record in records:
+        if record["type"] == "phase":
+            if phase is not None:
+                flight["phases"][phase]["duration"] += record["t"] - phase_start
+            phase, phase_start = record["phase"], record["t"]
+            flight["phases"].setdefault(phase, {"duration": 0, "iterations": 0, "wait": 0, "flight": 0, "detections": 0, "detection_ages": []})
+        elif record["type"] == "iteration" and phase is not None:
+            stats = flight["phases"][phase]
+            stats["iterations"] += 1
+            stats["wait"] += record["wait"]
+            stats["flight"] += record["flight"] or 0
+            stats["detections"] += 1 if record["detected"] else 0
+            if record["detection_age"] is not None:
+                stats["detection_ages"].append(record["detection_age"])
+        elif record["type"] == "event":
+            flight["events"][record["event"]] = flight["events"].get(record["event"], 0) + 1
+    if phase is not None:
+        flight["phases"][phase]["duration"] += flight["duration"] - phase_start
+    return flight
+
+
+def percentiles(values):
+    if len(values) == 0:
+        return None
+    result = {"p{}".format(p): float(np.percentile(values, p)) for p in PERCENTILES}
+    result["n"] = len(values)
+    return result
+
+
+def summarize(flights):
+    '''
+    Percentiles across flights, detection ages over all single detections
+    '''
+    summary = {
+        "flights": len(flights),
+        "complete": sum(1 for flight in flights if flight["complete"]),
+        "duration": percentiles([flight["duration"] for flight in flights]),
+        "events": {},
+        "phases": {},
+    }
+    for flight in flights:
+        for event, count in flight["events"].items():
+            summary["events"][event] = summary["events"].get(event, 0) + count
+
+    names = [name for name in PHASES if any(name in flight["phases"] for flight in flights)]
+    names += sorted({name for flight in flights for name in flight["phases"]} - set(names))
+    for name in names:
+        stats = [flight["phases"][name] for flight in flights if name in flight["phases"]]
+        summary["phases"][name] = {
+            "duration": percentiles([s["duration"] for s in stats]),
+            "iterations": percentiles([s["iterations"] for s in stats]),
+            "wait": percentiles([s["wait"] for s in stats]),
+            "flight": percentiles([s["flight"] for s in stats]),
+            "wait_share": percentiles([s["wait"] / s["duration"] for s in stats if s["duration"] > 0]),
+            "detection_age": percentiles([age for s in stats for age in s["detection_ages"]]),
+        }
+    return summary
+
+
+def format_row(label, values, unit=""):
+    if values is None:
+        return "  {:<14} -".format(label)
+    return "  {:<14} ".format(label) + "  ".join("{} {:8.3f}{}".format(p, values[p], unit) for p in values if p != "n") + "  (n={})".format(values["n"])
+
+
+def print_summary(summary):
+    print("{} flights ({} complete)".format(summary["flights"], summary["complete"]))
+    print(format_row("mission", summary["duration"], " s"))
+    print("events:", ", ".join("{} {}".format(event, count) for event, count in sorted(summary["events"].items())) or "-")
+    for name, stats in summary["phases"].items():
+        print(name)
+        print(format_row("duration", stats["duration"], " s"))
+        print(format_row("iterations", stats["iterations"]))
+        print(format_row("waiting", stats["wait"], " s"))
+        print(format_row("flying", stats["flight"], " s"))
+        print(format_row("wait share", stats["wait_share"]))
+        print(format_row("detection age", stats["detection_age"], " s"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate mission traces of many flights into percentiles")
+    parser.add_argument("traces", nargs="*", help="trace files or glob patterns, default: all traces in " + TRACE_FOLDER)
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    patterns = args.traces if len(args.traces) > 0 else [os.path.join(TRACE_FOLDER, "*.jsonl")]
+    paths = sorted({path for pattern in patterns for path in glob.glob(pattern)})
+    if len(paths) == 0:
+        print("No traces found")
+        exit(1)
+
+    summary = summarize([load_trace(path) for path in paths])
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
@@ -0,0 +1,103 @@
+import math
+from threading import Lock
+
+import numpy as np
+
+# Constant velocity Kalman filter of a Vicon object, state [x, y, z, yaw, vx, vy, vz, yaw_rate]
+POSITION_NOISE = 0.005 # m, standard deviation of a Vicon position
+YAW_NOISE = 0.01 # rad
+ACCELERATION_NOISE = 0.05 # m/s^2, how fast the object may change its velocity, pallets are moved smoothly
+YAW_ACCELERATION_NOISE = 0.05 # rad/s^2
+INITIAL_VELOCITY = 0.5 # m/s, standard deviation of the unknown velocity at the first pose
+MAX_LEAD_TIME = 6.0 # seconds, predictions further ahead are clamped
+
+
+def wrap_angle(angle):
+    return (angle + math.pi) % (2 * math.pi) - math.pi
+
+
+def rotation_yaw(rotation):
+    rotation = np.asarray(rotation, dtype=float)
+    return math.atan2(rotation[1, 0], rotation[0, 0])
+
+
+class TargetPredictor():
+    '''
+    Estimates position, velocity, yaw and yaw rate of one object from timestamped poses and
+    predicts its pose at a future time, e.g. when a goTo towards it arrives. Updates may
+    come from another thread than the predictions.
+    '''
+    def __init__(self, position_noise=POSITION_NOISE, yaw_noise=YAW_NOISE,
+                 acceleration_noise=ACCELERATION_NOISE, yaw_acceleration_noise=YAW_ACCELERATION_NOISE):
+        self.state = None
+        self.covariance = None
+        self.time = None
+        self.measurement_noise = np.diag([position_noise**2] * 3 + [yaw_noise**2])
+        self.process_noise = np.array([acceleration_noise**2] * 3 + [yaw_acceleration_noise**2])
+        self.observation = np.hstack([np.eye(4), np.zeros((4, 4))])
+        self.updates = 0
+        self.lock = Lock()
+
+    def initialized(self):
+        return self.state is not None
+
+    def transition(self, dt):
+        F = np.eye(8)
+        F[:4, 4:] = dt * np.eye(4)
+        # white noise acceleration, per axis [[dt^3/3, dt^2/2], [dt^2/2, dt]] * q
+        Q = np.zeros((8, 8))
+        Q[:4, :4] = np.diag(self.process_noise * dt**3 / 3)
+        Q[:4, 4:] = Q[4:, :4] = np.diag(self.process_noise * dt**2 / 2)
+        Q[4:, 4:] = np.diag(self.process_noise * dt)
+        return F, Q
+
+    def update(self, timestamp, position, yaw):
+        '''
+        position: [x, y, z] in m, yaw in rad, poses older than the last one are ignored
+        '''
+        measurement = np.array([position[0], position[1], position[2], yaw], dtype=float)
+        with self.lock:
+            self.correct(timestamp, measurement)
+
+    def correct(self, timestamp, measurement):
+        if self.state is None:
+            self.state = np.concatenate([measurement, np.zeros(4)])
+            self.covariance = np.diag(np.concatenate([np.diag(self.measurement_noise), [INITIAL_VELOCITY**2] * 3 + [1.0]]))
+            self.time = timestamp
+            self.updates = 1
+            return
+        dt = timestamp - self.time
+        if dt < 0:
+            return
+        F, Q = self.transition(dt)
+        state = F @ self.state
+        covariance = F @ self.covariance @ F.T + Q
+
+        innovation = measurement - self.observation @ state
+        innovation[3] = wrap_angle(innovation[3])
+        S = self.observation @ covariance @ self.observation.T + self.measurement_noise
+        K = covariance @ self.observation.T @ np.linalg.inv(S)
+        self.state = state + K @ innovation
+        self.state[3] = wrap_angle(self.state[3])
+        self.covariance = (np.eye(8) - K @ self.observation) @ covariance
+        self.time = timestamp
+        self.updates += 1
+
+    def predict(self, timestamp):
+        '''
+        returns: (position [x, y, z], yaw) at timestamp, None before the first pose
+        '''
+        with self.lock:
+            if self.state is None:
+                return None
+            dt = min(max(timestamp - self.time, 0), MAX_LEAD_TIME)
+            position = self.state[:3] + self.state[4:7] * dt
+            return position, wrap_angle(self.state[3] + self.state[7] * dt)
+
+    def velocity(self):
+        with self.lock:
+            return None if self.state is None else list(self.state[4:7])
+
+    def yaw_rate(self):
+        with self.lock:
+            return None if self.state is None else self.state[7]
@@ -0,0 +1,232 @@
+import json
+import math
+import os
+import time
+from threading import Lock, Thread
+
+import numpy as np
+
+TELEMETRY_FOLDER = "telemetry"
+SAMPLE_RATE = 50 # Hz
+CAPACITY = 60 * 60 * SAMPLE_RATE # samples kept per source, one hour at the default rate
+VELOCITY_SPAN = 0.3 # seconds of samples fitted for a velocity estimate
+COLUMNS = ["x", "y", "z", "yaw"] # m, m, m, rad
+LATEST_BLOCK = 256 # rows searched at once for the newest sample
+
+
+def session_path(name, folder=TELEMETRY_FOLDER):
+    return os.path.join(folder, "{}_{}".format(time.strftime("%Y%m%d_%H%M%S"), name))
+
+
+def crazyflie_sampler(cf):
+    def sample():
+        x, y, z = cf.position()
+        return x, y, z, cf.yaw()
+    return sample
+
+
+def vicon_sampler(client, name):
+    '''
+    client: anything with latest(topic), positions on <name> in mm, rotation matrices on <name>_rot
+    '''
+    def sample():
+        pos = client.latest(name)
+        if pos is None:
+            return None
+        rot = client.latest(name + "_rot")
+        yaw = math.atan2(rot[1][0], rot[0][0]) if rot is not None else float("nan")
+        return pos[0] / 1000, pos[1] / 1000, pos[2] / 1000, yaw
+    return sample
+
+
+class Telemetry():
+    '''
+    Timestamped poses of several sources in a ring buffer, times (capacity,) and
+    values (capacity, sources, 4), count is the number of samples ever written.
+    Sources without a pose at a sample time have nan values.
+    '''
+    def __init__(self, names, times, values, count=0):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.times = times
+        self.values = values
+        self.capacity = len(times)
+        self.count = count
+        self.lock = Lock()
+
+    def segments(self):
+        '''
+        The ring buffer as up to two slices, each sorted by time, oldest first
+        '''
+        if self.count <= self.capacity:
+            return [(0, self.count)]
+        head = self.count % self.capacity
+        return [(head, self.capacity), (0, head)]
+
+    def snapshot(self, name, start=None, end=None):
+        # only the requested window is copied, the segments are searched by time
+        source = self.index[name]
+        times, values = [], []
+        with self.lock:
+            for first, last in self.segments():
+                segment = self.times[first:last]
+                a = first + (np.searchsorted(segment, start, side="left") if start is not None else 0)
+                b = first + (np.searchsorted(segment, end, side="right") if end is not None else len(segment))
+                times.append(np.array(self.times[a:b]))
+                values.append(np.array(self.values[a:b, source]))
+        times, values = np.concatenate(times), np.concatenate(values)
+        sampled = ~np.isnan(values[:, 0])
+        return times[sampled], values[sampled]
+
+    def window(self, name, start=None, end=None):
+        '''
+        returns: (times, (n, 4) poses) of name between start and end
+        '''
+        return self.snapshot(name, start, end)
+
+    def latest(self, name):
+        '''
+        returns: (time, pose) of the newest sample with a pose of name or (None, None)
+        '''
+        source = self.index[name]
+        with self.lock:
+            # newest first, in blocks so a source without recent samples is not searched row by row
+            for first, last in reversed(self.segments()):
+                for end in range(last, first, -LATEST_BLOCK):
+                    start = max(end - LATEST_BLOCK, first)
+                    sampled = np.flatnonzero(~np.isnan(self.values[start:end, source, 0]))
+                    if len(sampled) > 0:
+                        position = start + sampled[-1]
+                        return float(self.times[position]), np.array(self.values[position, source])
+        return None, None
+
+    def interpolate(self, name, timestamps):
+        '''
+        Linear interpolation of the poses at arbitrary timestamps, the yaw is unwrapped first.
+        Timestamps outside the recording return the first/last pose.
+
+        returns: (4,) pose for a scalar timestamp, (n, 4) poses for an array
+        '''
+        times, values = self.snapshot(name)
+        if len(times) == 0:
+            return None
+        values = values.copy()
+        values[:, 3] = np.unwrap(values[:, 3])
+        timestamps = np.asarray(timestamps, dtype=float)
+        poses = np.stack([np.interp(timestamps.reshape(-1), times, values[:, column]) for column in range(len(COLUMNS))], axis=-1)
+        poses[:, 3] = (poses[:, 3] + math.pi) % (2 * math.pi) - math.pi
+        return poses[0] if timestamps.ndim == 0 else poses
+
+    def velocity(self, name, at=None, span=VELOCITY_SPAN):
+        '''
+        Least squares slope of the positions in the span seconds up to at (default: the newest sample),
+        less sensitive to noise and jitter of the sample times than the difference of two poses
+
+        returns: [vx, vy, vz] in m/s, None with fewer than two samples
+        '''
+        if at is None:
+            at, _ = self.latest(name)
+            if at is None:
+                return None
+        times, values = self.snapshot(name, at - span, at)
+        if len(times) < 2 or times[-1] == times[0]:
+            return None
+        return list(np.polyfit(times - times[-1], values[:, :3], 1)[0])
+
+
+class TelemetryRecorder(Telemetry, Thread):
+    '''
+    Samples every source at rate Hz on its own thread. With path the ring buffer is a
+    memory mapped file in that folder, so long sessions do not grow the memory and the
+    recording survives a crash. Read it back with load(path).
+    '''
+    def __init__(self, sources, rate=SAMPLE_RATE, capacity=CAPACITY, path=None):
+        '''
+        sources: {name: function returning (x, y, z, yaw) or None}
+        '''
+        names = list(sources)
+        if path is None:
+            times = np.full(capacity, np.nan)
+            values = np.full((capacity, len(names), len(COLUMNS)), np.nan)
+        else:
+            if not os.path.exists(path):
+                os.makedirs(path)
+            with open(os.path.join(path, "sources.json"), "w") as f:
+                json.dump({"names": names, "columns": COLUMNS, "rate": rate}, f)
+            times = np.lib.format.open_memmap(os.path.join(path, "times.npy"), mode="w+", dtype=np.float64, shape=(capacity,))
+            values = np.lib.format.open_memmap(os.path.join(path, "values.npy"), mode="w+", dtype=np.float64, shape=(capacity, len(names), len(COLUMNS)))
+            times[:] = np.nan
+            values[:] = np.nan
+        Telemetry.__init__(self, names, times, values)
+        Thread.__init__(self)
+        self.daemon = True
+        self.samplers = [sources[name] for name in names]
+        self.rate = rate
+        self.path = path
+        self.overruns = 0
+        self.running = False
+
+    @classmethod
+    def for_swarm(cls, allcfs, client=None, vicon_names=(), **kwargs):
+        '''
+        Every Crazyflie of the swarm as cf<id> and the given Vicon objects from an MQTT client
+        '''
+        sources = {"cf" + str(cf.id): crazyflie_sampler(cf) for cf in allcfs.crazyflies}
+        for name in vicon_names:
+            if name in sources:
+                raise ValueError("Telemetry source " + name + " is already recorded from the swarm")
+            sources[name] = vicon_sampler(client, name)
+        return cls(sources, **kwargs)
+
+    def sample(self):
+        row = np.full((len(self.samplers), len(COLUMNS)), np.nan)
+        for i, sampler in enumerate(self.samplers):
+            pose = sampler()
+            if pose is not None:
+                row[i] = pose
+        position = self.count % self.capacity
+        with self.lock:
+            self.values[position] = row
+            self.times[position] = time.time()
+            self.count += 1
+
+    def run(self):
+        period = 1.0 / self.rate
+        next_sample = time.perf_counter()
+        while self.running:
+            self.sample()
+            next_sample += period
+            delay = next_sample - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # sampling took longer than the period, skip the missed ticks
+                self.overruns += 1
+                next_sample = time.perf_counter()
+
+    def start(self):
+        self.running = True
+        Thread.start(self)
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.is_alive():
+            self.join()
+        if isinstance(self.times, np.memmap):
+            self.times.flush()
+            self.values.flush()
+
+
+def load(path):
+    '''
+    Telemetry recorded with TelemetryRecorder(path=path), memory mapped read only
+    '''
+    with open(os.path.join(path, "sources.json")) as f:
+        names = json.load(f)["names"]
+    times = np.load(os.path.join(path, "times.npy"), mmap_mode="r")
+    values = np.load(os.path.join(path, "values.npy"), mmap_mode="r")
+    written = int(np.count_nonzero(~np.isnan(times)))
+    # a full ring buffer continues after its oldest sample
+    count = written if written < len(times) else len(times) + int(np.nanargmin(times))
+    return Telemetry(names, times, values, count)
@@ -1,10 +1,6 @@
 from enum import Enum
-import os
-import csv
 from simple_pid import PID
 
-LOGGING_FOLDER = "logs"
-
 class Mode(Enum):
     PALLET = 1
     BLOCK_SEARCH = 2
@@ -12,28 +8,6 @@ class Mode(Enum):
     FINISHED = 4
 
 
-class LOGGER():
-    def __init__(self, fileName):
-        self.writer, self.file = self.create_file(fileName)
-
-    def create_file(self, fileName):
-        path = os.path.join(LOGGING_FOLDER, fileName)
-        if not os.path.exists(path):
-            file = open(path, "w")
-            writer = csv.writer(file)
-            writer.writerow(["Position in x (m)", "Position in y (m)", "Position in z (m)", "Angle (deg)", "Flight time (sec)"])
-        else:
-            file = open(path, "a")
-            writer = csv.writer(file)
-
-        return writer, file
-
-    def close(self):
-        self.file.close()
-
-    def log_drone_values(self, pos_x, pos_y, height, angle, time=-1):
-        self.writer.writerow([pos_x, pos_y, height, angle, time])
-
 # def filter_pallet_bbs(pallet_offsets):
 #     if pallet_offsets is None:
 #         return None
@@ -53,11 +27,11 @@ def choose_best_bb(pallet_offsets):
     if pallet_offsets is None:
         return None
     best_bb, best_bb_score = None, 0
-    for offset_x, offset_y, area, center_x, center_y in pallet_offsets:
+    for offset_x, offset_y, area, center_x, center_y, *track in pallet_offsets:
 
         score = area
         if score > best_bb_score:
-            best_bb = (offset_x, offset_y, area, center_x, center_y)
+            best_bb = (offset_x, offset_y, area, center_x, center_y, *track)
             best_bb_score = score
 
     return best_bb
@@ -66,10 +40,10 @@ def choose_most_left_bb(pallet_offsets):
     if pallet_offsets is None:
         return None
     best_bb, best_bb_score = None, 1000
-    for offset_x, offset_y, area, center_x, center_y in pallet_offsets:
+    for offset_x, offset_y, area, center_x, center_y, *track in pallet_offsets:
         score = center_x
         if score < best_bb_score:
-            best_bb = (offset_x, offset_y, area, center_x, center_y)
+            best_bb = (offset_x, offset_y, area, center_x, center_y, *track)
             best_bb_score = score
 
     return best_bb
@@ -78,7 +52,7 @@ def choose_middle_bb(pallet_offsets):
     if pallet_offsets is None:
         return None
     
-    offsets = [center_x for _, _, _, center_x, _ in pallet_offsets]
+    offsets = [center_x for _, _, _, center_x, _, *_ in pallet_offsets]
     offsets = sorted(offsets)
 
     return pallet_offsets[len(offsets) // 2]
@@ -88,10 +62,29 @@ def choose_closest_bb(pallet_offsets):
         return None
 
     best_bb, best_bb_score = None, 1000
-    for offset_x, offset_y, area, center_x, center_y in pallet_offsets:
+    for offset_x, offset_y, area, center_x, center_y, *track in pallet_offsets:
         score = abs(offset_x)
         if score < best_bb_score:
-            best_bb = (offset_x, offset_y, area, center_x, center_y)
+            best_bb = (offset_x, offset_y, area, center_x, center_y, *track)
             best_bb_score = score
 
-    return best_bb
\ No newline at end of file
+    return best_bb
+
+def get_track_id(bb):
+    '''
+    Track id of a block bounding box (sixth element), None for untracked boxes
+    '''
+    if bb is None or len(bb) < 6:
+        return None
+    return bb[5]
+
+def choose_tracked_bb(pallet_offsets, track_id):
+    '''
+    Bounding box of the block with the given track id, None if it was not detected
+    '''
+    if pallet_offsets is None or track_id is None:
+        return None
+    for bb in pallet_offsets:
+        if get_track_id(bb) == track_id:
+            return tuple(bb)
+    return None
\ No newline at end of file
@@ -0,0 +1,28 @@
+from reid_demo.aideck.mqtt_async import shared_loop
+
+
+class ViconClient():
+    '''
+    Vicon poses from the shared asyncio MQTT loop, positions on <name> and rotation
+    matrices on <name>_rot. Messages are only decoded when they are read.
+    '''
+    def __init__(self, ip, port, topics, name="Demo_runner"):
+        self.topics = topics
+        self.loop_thread = shared_loop()
+        self.client = self.loop_thread.client(ip, port, name, topics)
+
+    def get_position(self, name):
+        return self.client.latest(name)
+
+    def get_rotation(self, name):
+        return self.client.latest(name + "_rot")
+
+    def get_seq(self, name):
+        return self.client.seq(name), self.client.seq(name + "_rot")
+
+    def on_position(self, name, callback):
+        self.loop_thread.call(self.client.add_listener, name, callback)
+
+    def close(self):
+        # the loop is shared with the other clients of the process and keeps running
+        self.loop_thread.submit(self.client.close())
@@ -0,0 +1,138 @@
+import math
+import time
+
+import numpy as np
+
+import waypoints as waypoint_engine
+from target_predictor import rotation_yaw
+
+HOVER_TIME = 2
+
+
+class ViconObject():
+    def __init__(self, name, width, height, client, min_distance=0.4, height_offset=0.5, num_waypoints_per_side=3, telemetry=None,
+                 predictor=None, clock=time.monotonic):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.client = client
+        # recorded Vicon poses, velocities are fitted over several samples if available
+        self.telemetry = telemetry
+        # pose filter to lead a moving object, every Vicon position updates it
+        self.predictor = predictor
+        if predictor is not None:
+            client.on_position(name, self.update_predictor)
+        # clock of the pose timestamps, the asyncio MQTT layer stamps messages with time.monotonic
+        self.clock = clock
+        self.num_waypoints_per_side = num_waypoints_per_side
+    
+        self.timer = None
+        self.waypoint_order = None
+
+        self.dtime = 0
+        self.last_position = None
+        self.waypoints = self.calculate_waypoints(min_distance, height_offset)
+        # drone yaw per waypoint relative to the object angle, facing the side of the object
+        self.drone_offsets = waypoint_engine.facing_offsets(self.waypoints)
+        # world frame waypoints and object angle of the last pose, keyed by its MQTT sequence numbers
+        self.cache_key = None
+        self.cache = None
+
+    def estimate_speed(self):
+        if self.predictor is not None and self.predictor.initialized():
+            return self.predictor.velocity()
+        if self.telemetry is not None:
+            speed = self.telemetry.velocity(self.name)
+            return speed if speed is not None else 0
+        if self.last_position is None:
+            self.last_position = self.get_position()
+            self.dtime = self.clock()
+            return 0
+        else:
+            dtime = self.clock() - self.dtime
+            speed = [(compA - compB) / dtime for compA, compB in zip(self.get_position(), self.last_position)]
+            self.last_position = self.get_position()
+            self.dtime = self.clock()
+            return speed
+        
+    def get_rotation_matrix(self):
+        rot = self.client.get_rotation(self.name)
+        if rot is not None:
+            return np.matrix(rot)
+        else:
+            return None
+
+    def get_position(self):
+        pos = self.client.get_position(self.name)
+        if pos is not None:
+            return [val / 1000 for val in np.array(pos)]
+        else:
+            return None
+
+    def calculate_waypoints(self, min_dist, height_dist):
+        return waypoint_engine.object_waypoints(self.width, self.height, min_dist, height_dist, self.num_waypoints_per_side)
+
+    def world_waypoints(self):
+        '''
+        returns: ((N, 3) waypoints in the world frame, object angle), recalculated only for a new pose
+        '''
+        key = self.client.get_seq(self.name) if hasattr(self.client, "get_seq") else None
+        if key is None or key != self.cache_key:
+            rotation_matrix = np.asarray(self.get_rotation_matrix())
+            self.cache = (waypoint_engine.transform(self.waypoints, rotation_matrix, self.get_position()),
+                          waypoint_engine.object_angle(rotation_matrix))
+            self.cache_key = key
+        return self.cache
+
+    def update_predictor(self, timestamp, position):
+        '''
+        position: Vicon position in mm received at timestamp, the yaw is taken from the latest rotation
+        '''
+        rotation = self.get_rotation_matrix()
+        if position is None or rotation is None:
+            return
+        self.predictor.update(timestamp, [val / 1000 for val in position], rotation_yaw(rotation))
+
+    def predict_waypoint(self, lead_time):
+        '''
+        Current waypoint and drone angle like get_next_waypoint_live, but where the object will
+        be in lead_time seconds. Without a predictor the current ones.
+        '''
+        drone_offset = self.drone_offsets[self.waypoint_order[0]]
+        if self.predictor is None or not self.predictor.initialized():
+            world_waypoints, object_angle = self.world_waypoints()
+            return [round(el,2) for el in world_waypoints[self.waypoint_order[0]]], (object_angle + drone_offset) % 360
+        position, yaw = self.predictor.predict(self.clock() + lead_time)
+        rotation_matrix = np.asarray(self.get_rotation_matrix())
+        # turn the current orientation by the predicted change of yaw, roll and pitch stay
+        turn = yaw - rotation_yaw(rotation_matrix)
+        yaw_rotation = np.array([[math.cos(turn), -math.sin(turn), 0], [math.sin(turn), math.cos(turn), 0], [0, 0, 1]])
+        rotation_matrix = yaw_rotation @ rotation_matrix
+        index = self.waypoint_order[0]
+        waypoint = waypoint_engine.transform(self.waypoints[index:index + 1], rotation_matrix, position)[0]
+        return [round(el,2) for el in waypoint], (waypoint_engine.object_angle(rotation_matrix) + drone_offset) % 360
+
+    def order_waypoints(self, cf_positon):
+        world_waypoints, _ = self.world_waypoints()
+        # start with the nearest waypoint, continue in order and jump back to the beginning at the end
+        self.waypoint_order = waypoint_engine.nearest_order(world_waypoints, cf_positon).tolist()
+
+    def get_next_waypoint_live(self, cf_positon, min_distance=0.4, height_offset=0.5):
+        if self.waypoint_order is None:
+            self.order_waypoints(cf_positon)
+
+        world_waypoints, object_angle = self.world_waypoints()
+        waypoint_pos = world_waypoints[self.waypoint_order[0]]
+        drone_angle = object_angle + self.drone_offsets[self.waypoint_order[0]]
+
+        # remove goal if hover time is exceeded
+        if np.linalg.norm(np.array(cf_positon)[:2] - waypoint_pos[:2]) < min_distance:
+            if self.timer is None:
+                self.timer = self.clock()
+            elif self.clock() - self.timer > HOVER_TIME-0.5:
+                self.waypoint_order.pop(0)
+                self.timer = None
+                if len(self.waypoint_order) > 0 :
+                    print("New waypoint: " + str(self.waypoint_order[0]))
+
+        return [round(el,2) for el in waypoint_pos], drone_angle % 360
@@ -0,0 +1,74 @@
+import numpy as np
+
+# Waypoints around rectangular objects as (N, 3) arrays, all objects are transformed with one matmul
+
+
+def object_waypoints(width, height, min_dist, height_dist, num_waypoints_per_side=3):
+    '''
+    Waypoints in the object frame, num_waypoints_per_side + 2 on the right side (y < 0) from
+    front to back followed by the same number on the left side from back to front
+
+    returns: (2 * (num_waypoints_per_side + 2), 3) array
+    '''
+    x_offset = width / (num_waypoints_per_side - 1)
+    x = -width / 2 + np.arange(-1, num_waypoints_per_side + 1) * x_offset
+    waypoints = []
+    for val in [-1, 1]: # left and right
+        side = np.empty((len(x), 3))
+        side[:, 0] = -val * x
+        side[:, 1] = val * (height / 2 + min_dist)
+        side[:, 2] = height_dist
+        waypoints.append(side)
+    return np.concatenate(waypoints)
+
+
+def facing_offsets(waypoints):
+    '''
+    Drone yaw relative to object_angle per waypoint in degrees, so that the drone looks perpendicular
+    onto the side of the object it is on, i.e. along -y of the object frame on the left side and
+    along +y on the right side. object_angle is the object x axis yaw - 90.
+
+    waypoints: (N, 3) in the object frame
+    returns: (N,) array
+    '''
+    waypoints = np.asarray(waypoints, dtype=float)
+    return np.degrees(np.arctan2(-waypoints[:, 1], 0)) + 90
+
+
+def transform(waypoints, rotations, positions=None):
+    '''
+    waypoints: (N, 3) in the object frame
+    rotations: (3, 3) or (M, 3, 3) rotation matrices
+    positions: (3,) or (M, 3) object positions, None only rotates
+
+    returns: (N, 3) or (M, N, 3) waypoints in the world frame
+    '''
+    rotations = np.asarray(rotations, dtype=float)
+    world = np.matmul(waypoints, np.swapaxes(rotations, -1, -2))
+    if positions is not None:
+        world += np.asarray(positions, dtype=float)[..., np.newaxis, :]
+    return world
+
+
+def object_angle(rotations):
+    '''
+    Yaw in degrees of the line from the front to the back of each object plus 90, with
+    front and back at -/+ width / 2 on the object x axis
+
+    returns: float or (M,) array
+    '''
+    rotations = np.asarray(rotations, dtype=float)
+    return np.degrees(np.arctan2(-rotations[..., 1, 0], -rotations[..., 0, 0])) + 90
+
+
+def nearest_order(world_waypoints, position):
+    '''
+    Indices of all waypoints starting with the one nearest to position, continuing in
+    order and jumping back to the beginning at the end
+
+    returns: (N,) array, or (M, N) for (M, N, 3) waypoints
+    '''
+    distances = np.linalg.norm(world_waypoints - np.asarray(position, dtype=float), axis=-1)
+    shortest_index = np.argmin(distances, axis=-1)
+    count = world_waypoints.shape[-2]
+    return (np.arange(count) + np.asarray(shortest_index)[..., np.newaxis]) % count